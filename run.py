@@ -1,20 +1,79 @@
-from src.OCRServer.OCRServer import OCRServer
-from configparser import ConfigParser
 from configparser import ConfigParser
 
-from src.OCRServer.OCRServer import OCRServer
+from src.StartupReport.StartupReport import StartupReport
 
 
 def create_ocr_server():
+    startup = StartupReport()
+
+    # Import the server here, so that spawned OCR worker processes re-importing this module skip Flask
+    with startup.phase('import'):
+        from src.OCRServer.OCRServer import OCRServer
+
     # Read configurations
     app_config = read_config()
-
+    startup.mark('config')
 
     # Create an instance of OCRServer with configurable parameters
     ocr_server_instance = OCRServer(
         debug=app_config.getboolean('flask', 'DEBUG'),
         host=app_config.get('flask', 'HOST'),
-        ssl_context=(app_config.get('flask', 'SSL_CERTIFICATE'), app_config.get('flask', 'SSL_PRIVATE_KEY'))
+        ssl_context=(app_config.get('flask', 'SSL_CERTIFICATE'), app_config.get('flask', 'SSL_PRIVATE_KEY')),
+        cache_size=app_config.getint('cache', 'MAX_ENTRIES', fallback=1024),
+        cache_directory=app_config.get('cache', 'DIRECTORY', fallback=None),
+        cache_max_disk_bytes=app_config.getint('cache', 'MAX_DISK_BYTES', fallback=256 * 1024 * 1024),
+        ocr_workers=app_config.getint('ocr', 'WORKERS', fallback=None),
+        ocr_job_timeout=app_config.getfloat('ocr', 'JOB_TIMEOUT', fallback=60),
+        ocr_max_jobs_per_worker=app_config.getint('ocr', 'MAX_JOBS_PER_WORKER', fallback=None),
+        ocr_max_pools=app_config.getint('ocr', 'MAX_POOLS', fallback=4),
+        ocr_config_workers=app_config.getint('ocr', 'CONFIG_WORKERS', fallback=None),
+        spool_threshold=app_config.getint('upload', 'SPOOL_THRESHOLD', fallback=8 * 1024 * 1024),
+        max_upload_bytes=app_config.getint('upload', 'MAX_BYTES', fallback=64 * 1024 * 1024),
+        near_duplicates=app_config.getboolean('near_duplicates', 'ENABLED', fallback=False),
+        near_duplicate_hash_size=app_config.getint('near_duplicates', 'HASH_SIZE', fallback=16),
+        near_duplicate_max_distance=app_config.getint('near_duplicates', 'MAX_DISTANCE', fallback=10),
+        batch_workers=app_config.getint('batch', 'WORKERS', fallback=None),
+        batch_max_in_flight=app_config.getint('batch', 'MAX_IN_FLIGHT', fallback=None),
+        batch_max_members=app_config.getint('batch', 'MAX_MEMBERS', fallback=1000),
+        batch_max_uncompressed_bytes=app_config.getint('batch', 'MAX_UNCOMPRESSED_BYTES', fallback=1024 * 1024 * 1024),
+        job_max_queued=app_config.getint('jobs', 'MAX_QUEUED', fallback=64),
+        job_workers=app_config.getint('jobs', 'WORKERS', fallback=None),
+        job_result_ttl=app_config.getint('jobs', 'RESULT_TTL', fallback=24 * 60 * 60),
+        preprocess_profile=app_config.get('preprocess', 'PROFILE', fallback='default'),
+        detect_regions=app_config.getboolean('ocr', 'DETECT_REGIONS', fallback=False),
+        deskew=app_config.getboolean('preprocess', 'DESKEW', fallback=False),
+        target_dpi=app_config.getint('preprocess', 'TARGET_DPI', fallback=None),
+        quality_tiered=app_config.getboolean('quality', 'TIERED', fallback=False),
+        quality_min_confidence=app_config.getfloat('quality', 'MIN_CONFIDENCE', fallback=80.0),
+        quality_min_coverage=app_config.getfloat('quality', 'MIN_COVERAGE', fallback=0.6),
+        quality_fast_scale=app_config.getfloat('quality', 'FAST_SCALE', fallback=0.5),
+        quality_enhanced_profile=app_config.get('quality', 'ENHANCED_PROFILE', fallback='photo'),
+        quality_enhanced_oem=app_config.getint('quality', 'ENHANCED_OEM', fallback=None),
+        log_capacity=app_config.getint('log', 'CAPACITY', fallback=1000),
+        log_headers=app_config.getboolean('log', 'INCLUDE_HEADERS', fallback=False),
+        log_file=app_config.get('log', 'FILE', fallback=None),
+        log_max_bytes=app_config.getint('log', 'MAX_BYTES', fallback=10 * 1024 * 1024),
+        log_backup_count=app_config.getint('log', 'BACKUP_COUNT', fallback=5),
+        log_page_size=app_config.getint('log', 'PAGE_SIZE', fallback=50),
+        port=app_config.getint('flask', 'PORT', fallback=5000),
+        server_mode=app_config.get('server', 'MODE', fallback='development'),
+        server_workers=app_config.getint('server', 'WORKERS', fallback=None),
+        worker_concurrency=app_config.getint('server', 'WORKER_CONCURRENCY', fallback=16),
+        graceful_timeout=app_config.getfloat('server', 'GRACEFUL_TIMEOUT', fallback=30),
+        archive_directory=app_config.get('archive', 'DIRECTORY', fallback=None),
+        archive_window=app_config.getint('archive', 'WINDOW_SECONDS', fallback=3600),
+        archive_max_queued=app_config.getint('archive', 'MAX_QUEUED', fallback=256),
+        archive_max_queued_bytes=app_config.getint('archive', 'MAX_QUEUED_BYTES', fallback=256 * 1024 * 1024),
+        archive_policy=app_config.get('archive', 'POLICY', fallback='drop'),
+        archive_block_timeout=app_config.getfloat('archive', 'BLOCK_TIMEOUT', fallback=5),
+        archive_index=app_config.getboolean('archive', 'INDEX', fallback=True),
+        default_deadline=app_config.getfloat('limits', 'DEFAULT_DEADLINE', fallback=60),
+        max_deadline=app_config.getfloat('limits', 'MAX_DEADLINE', fallback=300),
+        min_deadline=app_config.getfloat('limits', 'MIN_DEADLINE', fallback=0.05),
+        client_max_concurrency=app_config.getint('limits', 'CLIENT_MAX_CONCURRENCY', fallback=8),
+        warm_up=app_config.getboolean('server', 'WARM_UP', fallback=True),
+        startup_target=app_config.getfloat('server', 'STARTUP_TARGET', fallback=None),
+        startup_report=startup
     )
 
     # Run the server
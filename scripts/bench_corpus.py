@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import random
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = (
+    "invoice total amount date account number customer address payment due balance order "
+    "quantity price tax receipt reference shipping delivery service description item subtotal "
+    "signature page report summary office street city postal code phone email contract period"
+).split()
+
+FONT_SIZES = (12, 16, 24, 36)
+DPIS = (150, 200, 300)
+NOISE_LEVELS = (0.0, 8.0, 20.0)
+ROTATIONS = (0.0, 1.5, -3.0)
+
+
+def random_text(rng, lines=4, words_per_line=6):
+    """Build a few lines of random dictionary words."""
+    return "\n".join(" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines))
+
+
+def render_sample(text, font_size, dpi, noise, rotation, seed, image_format='PNG'):
+    """
+    Render text to an encoded image.
+
+    Parameters:
+    - text (str): Ground-truth text.
+    - font_size (int): Font size in points at 300 DPI.
+    - dpi (int): Effective resolution; the page is rendered at 300 DPI and rescaled.
+    - noise (float): Standard deviation of additive Gaussian noise.
+    - rotation (float): Rotation in degrees, counter-clockwise.
+    - seed (int): Seed of the noise generator.
+    - image_format (str): PIL format of the encoded image.
+
+    Returns:
+    - bytes: Encoded image.
+    """
+    font = ImageFont.load_default(size=font_size * 300 // 72)
+    left, top, right, bottom = ImageDraw.Draw(Image.new('L', (1, 1))).multiline_textbbox((0, 0), text, font=font)
+    margin = font.size
+    page = Image.new('L', (right - left + 2 * margin, bottom - top + 2 * margin), 255)
+    ImageDraw.Draw(page).multiline_text((margin - left, margin - top), text, font=font, fill=0)
+
+    if dpi != 300:
+        page = page.resize((max(1, page.width * dpi // 300), max(1, page.height * dpi // 300)), Image.LANCZOS)
+    if rotation:
+        page = page.rotate(rotation, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if noise:
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise, pixels.shape)
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    encoded = io.BytesIO()
+    page.convert('RGB').save(encoded, image_format)
+    return encoded.getvalue()
+
+
+def generate_corpus(seed=0, samples_per_setting=1, font_sizes=FONT_SIZES, dpis=DPIS, noise_levels=NOISE_LEVELS,
+                    rotations=ROTATIONS):
+    """
+    Generate a reproducible synthetic corpus covering every combination of settings.
+
+    Parameters:
+    - seed (int): Seed that fixes the text and noise of every sample.
+    - samples_per_setting (int): Samples rendered per combination of settings.
+
+    Returns:
+    - list: Dicts with name, image (encoded bytes), text and the settings used.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for font_size in font_sizes:
+        for dpi in dpis:
+            for noise in noise_levels:
+                for rotation in rotations:
+                    for _ in range(samples_per_setting):
+                        index = len(corpus)
+                        text = random_text(rng)
+                        corpus.append({
+                            "name": f"sample_{index:05d}_{font_size}pt_{dpi}dpi_n{noise:g}_r{rotation:g}.png",
+                            "image": render_sample(text, font_size, dpi, noise, rotation, seed + index),
+                            "text": text,
+                            "font_size": font_size,
+                            "dpi": dpi,
+                            "noise": noise,
+                            "rotation": rotation,
+                        })
+    return corpus
+
+
+def write_corpus(corpus, directory):
+    """Write corpus images and a manifest.json with the ground truth to a directory."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for sample in corpus:
+        (directory / sample["name"]).write_bytes(sample["image"])
+        manifest.append({key: value for key, value in sample.items() if key != "image"})
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+
+def read_corpus(directory):
+    """Read a corpus written by write_corpus."""
+    directory = Path(directory)
+    corpus = json.loads((directory / "manifest.json").read_text())
+    for sample in corpus:
+        sample["image"] = (directory / sample["name"]).read_bytes()
+    return corpus
+
+
+if __name__ == "__main__":
+    output_directory = os.environ.get("OCR_BENCH_CORPUS", "bench_corpus")
+    write_corpus(generate_corpus(), output_directory)
+    print(f"Corpus written to {output_directory}")
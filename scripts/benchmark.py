@@ -0,0 +1,243 @@
+import argparse
+import difflib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+PROJECT_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_PATH))
+sys.path.insert(0, str(PROJECT_PATH / 'scripts'))
+
+from bench_corpus import generate_corpus, read_corpus, write_corpus
+from src.ImageProcessor.ImageProcessor import ImageProcessor
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Metrics where a larger value is better; every other compared metric is a latency
+HIGHER_IS_BETTER = ("throughput_per_s", "accuracy")
+
+
+def percentile(samples, fraction):
+    """Return a percentile of a list of samples using linear interpolation."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, elapsed):
+    """Summarize per-item latencies in seconds into throughput and millisecond percentiles."""
+    return {
+        "count": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def similarity(expected, actual):
+    """Return the similarity of two texts in [0, 1], ignoring differences in whitespace."""
+    return difflib.SequenceMatcher(None, " ".join(expected.split()), " ".join(actual.split())).ratio()
+
+
+def measure(items, func, repeat=1):
+    """
+    Run a function over every item and time each call.
+
+    Parameters:
+    - items (list): Arguments passed to func one at a time.
+    - func (callable): Function under test.
+    - repeat (int): Number of passes over the items.
+
+    Returns:
+    - tuple: Summary dict and the results of the last pass.
+    """
+    latencies = []
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = []
+        for item in items:
+            call_started = time.perf_counter()
+            results.append(func(item))
+            latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started), results
+
+
+def accuracy(corpus, texts):
+    """Return the mean similarity of OCR output to the ground truth, overall and per setting."""
+    scores = [similarity(sample["text"], text) for sample, text in zip(corpus, texts)]
+    by_setting = {}
+    for setting in ("font_size", "dpi", "noise", "rotation"):
+        groups = {}
+        for sample, score in zip(corpus, scores):
+            groups.setdefault(str(sample[setting]), []).append(score)
+        by_setting[setting] = {value: round(statistics.mean(group), 4) for value, group in groups.items()}
+    return round(statistics.mean(scores), 4) if scores else 0.0, by_setting
+
+
+def tesseract_available():
+    """Return True if the tesseract binary can be run."""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def bench_stages(corpus, repeat):
+    """Benchmark decode, preprocessing and OCR of the ImageProcessor separately."""
+    processor = ImageProcessor()
+    images = [sample["image"] for sample in corpus]
+    results = {}
+
+    results["decode"], _ = measure(images, ImageProcessor._load_image, repeat)
+    # Copy the result, since preprocessed images live in per-thread scratch buffers
+    results["preprocess"], preprocessed = measure(images, lambda image: processor._preprocess_image(image).copy(),
+                                                  repeat)
+
+    if not tesseract_available():
+        logging.warning("tesseract is not installed; skipping the OCR stages")
+        return results
+
+    results["ocr"], texts = measure(preprocessed, processor._extract_text, repeat)
+    results["ocr"]["accuracy"], results["ocr"]["accuracy_by_setting"] = accuracy(corpus, texts)
+    return results
+
+
+def bench_end_to_end(corpus, repeat, ocr_workers):
+    """Benchmark the /process_image route through the Flask test client with the result cache disabled."""
+    from src.OCRServer.OCRServer import OCRServer
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='ocr_bench_') as server_directory:
+        # The server archives every upload below its working directory
+        os.chdir(server_directory)
+        try:
+            server = OCRServer(cache_size=0, cache_directory=None, ocr_workers=ocr_workers)
+            server.app.config['WTF_CSRF_ENABLED'] = False
+            client = server.app.test_client()
+
+            def post(sample):
+                response = client.post('/process_image', content_type='multipart/form-data',
+                                       data={'image': (BytesIO(sample["image"]), sample["name"])})
+                return response.get_json() or {}
+
+            try:
+                summary, responses = measure(corpus, post, repeat)
+            finally:
+                if server.ocr_engine is not None:
+                    server.ocr_engine.shutdown()
+        finally:
+            os.chdir(working_directory)
+
+    summary["errors"] = sum(1 for response in responses if response.get("status") != "success")
+    summary["accuracy"], summary["accuracy_by_setting"] = accuracy(
+        corpus, [response.get("extracted_text") or "" for response in responses])
+    return summary
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare benchmark results with a saved baseline.
+
+    Parameters:
+    - results (dict): Current results.
+    - baseline (dict): Results of an earlier run.
+    - tolerance (float): Allowed relative change before a metric counts as a regression.
+
+    Returns:
+    - list: Description of every regression found.
+    """
+    regressions = []
+    for stage, metrics in baseline.get("stages", {}).items():
+        current = results["stages"].get(stage)
+        if current is None:
+            continue
+        for metric, previous in metrics.items():
+            value = current.get(metric)
+            if not isinstance(previous, (int, float)) or not isinstance(value, (int, float)) or metric == "count":
+                continue
+            if metric in HIGHER_IS_BETTER:
+                regressed = value < previous * (1 - tolerance)
+            elif metric == "errors":
+                regressed = value > previous
+            else:
+                regressed = value > previous * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{stage}.{metric}: {previous} -> {value}")
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR pipeline on a synthetic corpus.")
+    parser.add_argument('--corpus', help="Directory of a corpus written by bench_corpus.py; generated if omitted")
+    parser.add_argument('--save-corpus', help="Write the generated corpus to this directory")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated corpus")
+    parser.add_argument('--samples', type=int, default=1, help="Samples per combination of settings")
+    parser.add_argument('--repeat', type=int, default=1, help="Passes over the corpus per stage")
+    parser.add_argument('--ocr-workers', type=int, default=0,
+                        help="OCR worker processes for the end-to-end run; 0 runs OCR in-process")
+    parser.add_argument('--skip-end-to-end', action='store_true', help="Only benchmark the individual stages")
+    parser.add_argument('--output', default='benchmark_results.json', help="File that receives the results")
+    parser.add_argument('--baseline', help="Results file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed relative slowdown or accuracy loss before failing")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    if arguments.corpus:
+        corpus = read_corpus(arguments.corpus)
+    else:
+        corpus = generate_corpus(seed=arguments.seed, samples_per_setting=arguments.samples)
+        if arguments.save_corpus:
+            write_corpus(corpus, arguments.save_corpus)
+    logging.info(f"Benchmarking {len(corpus)} images")
+
+    stages = bench_stages(corpus, arguments.repeat)
+    if not arguments.skip_end_to_end:
+        stages["process_image"] = bench_end_to_end(corpus, arguments.repeat, arguments.ocr_workers)
+
+    results = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"images": len(corpus), "seed": arguments.seed, "source": arguments.corpus or "generated"},
+        "stages": stages,
+    }
+    Path(arguments.output).write_text(json.dumps(results, indent=2))
+
+    for stage, summary in stages.items():
+        line = (f"{stage:>14}: {summary['throughput_per_s']:>9.2f}/s  p50 {summary['p50_ms']:.2f} ms  "
+                f"p95 {summary['p95_ms']:.2f} ms  p99 {summary['p99_ms']:.2f} ms")
+        if "accuracy" in summary:
+            line += f"  accuracy {summary['accuracy']:.3f}"
+        logging.info(line)
+    logging.info(f"Results written to {arguments.output}")
+
+    if arguments.baseline:
+        regressions = compare(results, json.loads(Path(arguments.baseline).read_text()), arguments.tolerance)
+        for regression in regressions:
+            logging.error(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logging.info("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
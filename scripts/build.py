@@ -38,6 +38,7 @@ User={username}
 Group={group}
 ExecStart=sudo -u {username} -g {group} {venv_path / 'bin' / 'python'} {project_path / 'run.py'}
 WorkingDirectory={project_path}
+ExecReload=/bin/kill -HUP $MAINPID
 
 [Install]
 WantedBy=multi-user.target
@@ -0,0 +1,361 @@
+import argparse
+import html
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_PATH))
+sys.path.insert(0, str(PROJECT_PATH / 'scripts'))
+
+from bench_corpus import generate_corpus, read_corpus
+from benchmark import summarize
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+# One access log line per request would drown the report
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+ENDPOINTS = ('process_image', 'demo')
+# Hidden CSRF field rendered by the demo form, and the text area of the demo result page
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+RESULT_PATTERN = re.compile(r'<textarea id="resultTextArea"[^>]*>(.*?)</textarea>', re.S)
+# Status codes of requests turned away by admission control rather than failed
+REJECTED_STATUSES = (429, 503)
+
+
+def encode_multipart(fields, files):
+    """
+    Encode form fields and files as a multipart/form-data body.
+
+    Parameters:
+    - fields (dict): Form field names and string values.
+    - files (dict): File field names mapped to (filename, bytes).
+
+    Returns:
+    - tuple: (body bytes, Content-Type header value)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Session:
+
+    """
+    Session: One simulated browser, with its own cookies and CSRF token.
+
+    The token is read from the demo form on first use and sent with every POST, so requests
+    pass the server's CSRF protection like those of a real client.
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.csrf_token = None
+
+    def csrf(self):
+        """Return the session's CSRF token, fetching the demo form once."""
+        if self.csrf_token is None:
+            with self.opener.open(f"{self.base_url}/demo", timeout=self.timeout) as response:
+                match = CSRF_PATTERN.search(response.read().decode('utf-8', 'replace'))
+            self.csrf_token = match.group(1) if match else ''
+        return self.csrf_token
+
+    def post(self, endpoint, sample):
+        """
+        Upload an image to an endpoint.
+
+        Parameters:
+        - endpoint (str): 'process_image' or 'demo'.
+        - sample (dict): Corpus sample with name and image.
+
+        Returns:
+        - tuple: (HTTP status, extracted text or None)
+        """
+        body, content_type = encode_multipart({'csrf_token': self.csrf()}, {'image': (sample["name"], sample["image"])})
+        request = urllib.request.Request(f"{self.base_url}/{endpoint}", data=body, method='POST',
+                                         headers={'Content-Type': content_type})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status = response.status
+                payload = response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+        if endpoint == 'demo':
+            match = RESULT_PATTERN.search(payload)
+            return status, html.unescape(match.group(1)) if match else None
+        try:
+            return status, json.loads(payload).get("extracted_text")
+        except ValueError:
+            return status, None
+
+
+def parse_mix(value):
+    """Parse an endpoint mix such as 'process_image=4,demo=1' into a dict of weights."""
+    mix = {}
+    for part in value.split(','):
+        endpoint, _, weight = part.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {endpoint}")
+        try:
+            mix[endpoint] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in mix: {part}") from None
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one endpoint with a positive weight")
+    return mix
+
+
+def parse_rates(value):
+    """Parse comma-separated arrival rates in requests per second."""
+    try:
+        rates = [float(rate) for rate in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid rates: {value}") from None
+    if any(rate <= 0 for rate in rates):
+        raise argparse.ArgumentTypeError("Rates must be positive")
+    return rates
+
+
+def start_server(arguments, server_directory):
+    """
+    Start an OCRServer on a free local port, served by Werkzeug's threaded server like the development mode.
+
+    Parameters:
+    - arguments (Namespace): Parsed command line.
+    - server_directory (str): Working directory of the server, which archives every upload below it.
+
+    Returns:
+    - tuple: (OCRServer, WSGI server, base URL)
+    """
+    from werkzeug.serving import make_server
+    from src.OCRServer.OCRServer import OCRServer
+
+    os.chdir(server_directory)
+    # Without the cache every request runs OCR, so results of concurrent requests can be told apart
+    server = OCRServer(cache_size=1024 if arguments.cache else 0, cache_directory=None if arguments.cache else '',
+                       ocr_workers=arguments.ocr_workers, client_max_concurrency=arguments.client_max_concurrency,
+                       warm_up=False)
+    server.warm_up()
+    http_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, name='loadtest-server', daemon=True).start()
+    return server, http_server, f"http://127.0.0.1:{http_server.server_port}"
+
+
+def reference_texts(base_url, corpus, timeout):
+    """
+    OCR every image once, one request at a time, as the expected result under load.
+
+    Returns:
+    - dict: Extracted text by sample name.
+    """
+    session = Session(base_url, timeout)
+    references = {}
+    for sample in corpus:
+        status, text = session.post('process_image', sample)
+        if status != 200 or text is None or text.startswith("Error processing image"):
+            raise RuntimeError(f"Reference request for {sample['name']} failed with status {status}: {text}")
+        references[sample["name"]] = text
+    return references
+
+
+def run_phase(base_url, corpus, references, rate, duration, mix, concurrency, timeout, rng):
+    """
+    Send requests at a fixed arrival rate and classify every response.
+
+    Arrivals are open-loop: requests are scheduled at fixed intervals whether or not earlier
+    ones have finished, and latency counts from the scheduled time, so a slow server shows up
+    as growing latency instead of a lower request rate.
+
+    Parameters:
+    - base_url (str): Server URL.
+    - corpus (list): Samples to upload.
+    - references (dict): Expected text by sample name.
+    - rate (float): Requests per second.
+    - duration (float): Seconds requests are scheduled for.
+    - mix (dict): Endpoint weights.
+    - concurrency (int): Most requests in flight; further arrivals wait for a free connection.
+    - timeout (float): Seconds before a request is abandoned.
+    - rng (random.Random): Chooses endpoints and images.
+
+    Returns:
+    - dict: Summary per endpoint.
+    """
+    local = threading.local()
+    records = []
+    lock = threading.Lock()
+
+    def send(endpoint, sample, scheduled):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = Session(base_url, timeout)
+        try:
+            status, text = session.post(endpoint, sample)
+        except Exception as e:
+            status, text = 0, f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - scheduled
+
+        if status == 200 and text is not None and not text.startswith("Error processing image"):
+            outcome = "ok" if text.strip() == references[sample["name"]].strip() else "mismatch"
+        elif status in REJECTED_STATUSES:
+            outcome = "rejected"
+        else:
+            outcome = "error"
+        with lock:
+            records.append({"endpoint": endpoint, "sample": sample["name"], "status": status, "latency": latency,
+                            "outcome": outcome, "text": text})
+
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    total = max(1, int(round(rate * duration)))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='loadtest') as executor:
+        for index in range(total):
+            scheduled = started + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, rng.choices(endpoints, weights)[0], rng.choice(corpus), scheduled)
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    for endpoint in endpoints:
+        results = [record for record in records if record["endpoint"] == endpoint]
+        if not results:
+            continue
+        outcomes = Counter(record["outcome"] for record in results)
+        summary[endpoint] = summarize([record["latency"] for record in results if record["outcome"] == "ok"], elapsed)
+        summary[endpoint].update({
+            "sent": len(results),
+            "errors": outcomes["error"],
+            "error_rate": round(outcomes["error"] / len(results), 4),
+            "rejected": outcomes["rejected"],
+            "mismatches": outcomes["mismatch"],
+            "status_codes": dict(Counter(str(record["status"]) for record in results)),
+            "mismatch_examples": [
+                {"sample": record["sample"], "expected": references[record["sample"]][:200],
+                 "actual": (record["text"] or "")[:200]}
+                for record in results if record["outcome"] == "mismatch"
+            ][:5],
+        })
+    return summary
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Load-test the OCR server end to end at fixed arrival rates.")
+    parser.add_argument('--url', help="Base URL of a running server; a local server is started if omitted")
+    parser.add_argument('--corpus', help="Directory of a corpus written by bench_corpus.py; generated if omitted")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated corpus and of the request mix")
+    parser.add_argument('--images', type=int, default=24, help="Distinct images sent, taken from the corpus")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('process_image=4,demo=1'),
+                        help="Endpoint weights, for example 'process_image=4,demo=1'")
+    parser.add_argument('--rates', type=parse_rates, default=parse_rates('2,5'),
+                        help="Comma-separated arrival rates in requests per second, one phase each")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per phase")
+    parser.add_argument('--concurrency', type=int, default=32, help="Most requests in flight at once")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds before a request is abandoned")
+    parser.add_argument('--ocr-workers', type=int, default=None,
+                        help="OCR worker processes of the local server; 0 runs OCR in the request threads")
+    parser.add_argument('--client-max-concurrency', type=int, default=0,
+                        help="Per-client request limit of the local server; every load request comes from one "
+                             "address, so it is off by default")
+    parser.add_argument('--cache', action='store_true',
+                        help="Keep the local server's result cache, so repeated images are served from it")
+    parser.add_argument('--max-error-rate', type=float, default=0.0,
+                        help="Highest error rate per endpoint and phase before failing")
+    parser.add_argument('--output', default='loadtest_results.json', help="File that receives the results")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    if arguments.corpus:
+        corpus = read_corpus(arguments.corpus)
+    else:
+        corpus = generate_corpus(seed=arguments.seed)
+    corpus = random.Random(arguments.seed).sample(corpus, min(arguments.images, len(corpus)))
+    output = Path(arguments.output).resolve()
+
+    working_directory = os.getcwd()
+    server = http_server = None
+    with tempfile.TemporaryDirectory(prefix='ocr_loadtest_') as server_directory:
+        try:
+            if arguments.url:
+                base_url = arguments.url.rstrip('/')
+            else:
+                server, http_server, base_url = start_server(arguments, server_directory)
+            logging.info(f"Load-testing {base_url} with {len(corpus)} images")
+
+            references = reference_texts(base_url, corpus, arguments.timeout)
+            rng = random.Random(arguments.seed)
+            phases = []
+            for rate in arguments.rates:
+                summary = run_phase(base_url, corpus, references, rate, arguments.duration, arguments.mix,
+                                    arguments.concurrency, arguments.timeout, rng)
+                phases.append({"rate_per_s": rate, "endpoints": summary})
+                for endpoint, result in summary.items():
+                    logging.info(f"{rate:>6g}/s {endpoint:>14}: {result['throughput_per_s']:>7.2f}/s  "
+                                 f"p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+                                 f"p99 {result['p99_ms']:.1f} ms  errors {result['error_rate']:.1%}  "
+                                 f"rejected {result['rejected']}  mismatches {result['mismatches']}")
+            server_status = server.status if server is not None else None
+        finally:
+            if http_server is not None:
+                http_server.shutdown()
+            if server is not None:
+                server.shutdown()
+            os.chdir(working_directory)
+
+    results = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "target": arguments.url or "local",
+        "images": len(corpus),
+        "mix": arguments.mix,
+        "duration_s": arguments.duration,
+        "concurrency": arguments.concurrency,
+        "server_status": server_status,
+        "phases": phases,
+    }
+    output.write_text(json.dumps(results, indent=2))
+    logging.info(f"Results written to {output}")
+
+    failures = []
+    for phase in phases:
+        for endpoint, result in phase["endpoints"].items():
+            if result["mismatches"]:
+                failures.append(f"{result['mismatches']} results of {endpoint} at {phase['rate_per_s']:g}/s "
+                                f"differ from the same image processed alone")
+            if result["error_rate"] > arguments.max_error_rate:
+                failures.append(f"{endpoint} at {phase['rate_per_s']:g}/s failed {result['error_rate']:.1%} "
+                                f"of requests")
+    for failure in failures:
+        logging.error(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_PATH))
+
+from src.ArchiveIndex.ArchiveIndex import ArchiveIndex
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the upload archive index from the archives on disk.")
+    parser.add_argument('archive_directory', nargs='?', default='tmp_post',
+                        help="Directory holding the monthly archive folders")
+    parser.add_argument('--database', help="Index database, defaults to archive_index.sqlite3 in the archive directory")
+    arguments = parser.parse_args()
+
+    if not os.path.isdir(arguments.archive_directory):
+        logging.error(f"Archive directory not found: {arguments.archive_directory}")
+        sys.exit(1)
+
+    database = arguments.database or os.path.join(arguments.archive_directory, 'archive_index.sqlite3')
+    started = time.perf_counter()
+    indexed = ArchiveIndex(database, arguments.archive_directory).rebuild()
+    logging.info(f"Indexed {indexed} uploads into {database} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
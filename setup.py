@@ -13,6 +13,7 @@ setup(
         'pytesseract==0.3.10',
         'slugify==0.0.1',
     ],
+    extras_require={'tesserocr': ['tesserocr']},
     entry_points={
         'console_scripts': [
             'OCRService = run:create_ocr_server',
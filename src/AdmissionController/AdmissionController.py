@@ -0,0 +1,199 @@
+import math
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+
+    """
+    AdmissionRejected: Raised when a request is turned away before any work is done for it.
+
+    Attributes:
+        - reason (str): 'client_limit' when the client already has too many requests in flight,
+          'deadline_too_short' when the request's deadline is below the minimum, 'deadline_expired'
+          when it passed before the request was admitted, and 'deadline' when the estimated wait
+          for a worker exceeds the time left.
+        - retry_after (int): Suggested number of seconds before the client retries, or None when
+          retrying the same request cannot help.
+    """
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+
+    """
+    AdmissionTicket: Slot held by an admitted request until it is released.
+
+    Releasing more than once has no further effect, so a ticket can be released both from an
+    error path and from the response's close callback.
+    """
+
+    __slots__ = ('controller', 'client', 'started', '_released')
+
+    def __init__(self, controller, client):
+        self.controller = controller
+        self.client = client
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self, record=True):
+        """
+        Give the slot back.
+
+        Parameters:
+        - record (bool): Count the time the request held the slot towards the average service time.
+
+        Returns:
+        - None
+        """
+        self.controller._release(self, record)
+
+
+class AdmissionController:
+
+    """
+    AdmissionController: Per-client concurrency limits and deadline-aware admission of requests.
+
+    Every admitted request holds a slot until it is released. A client that already holds
+    max_per_client slots is rejected, so one client cannot occupy every OCR worker while
+    others wait. A request whose deadline would pass before a worker is likely to be free is
+    rejected straight away instead of timing out after queueing: the expected wait is the
+    number of requests ahead of it beyond the capacity, times the recent average service
+    time, divided by the capacity. A deadline shorter than min_deadline, or one that has
+    already passed, is rejected first with its own reason, since that is not a sign of load.
+
+    Methods:
+        - admit(client: str, deadline: Deadline = None) -> AdmissionTicket:
+            Admit a request of a client, or raise AdmissionRejected.
+
+        - check_deadline(deadline: Deadline) -> None:
+            Raise AdmissionRejected if a deadline is too short or has already passed.
+
+        - estimated_wait() -> float:
+            Seconds a newly admitted request is expected to wait for a worker.
+
+        - in_flight(client: str = None) -> int:
+            Admitted requests not released yet, of one client or in total.
+
+    Private Methods:
+        - _release(ticket: AdmissionTicket, record: bool) -> None:
+            Give back the slot of a ticket.
+
+    Example Usage:
+        admission = AdmissionController(capacity=4, max_per_client=8, min_deadline=0.05)
+        ticket = admission.admit(request.remote_addr, Deadline(10))
+        try:
+            ...
+        finally:
+            ticket.release()
+    """
+
+    def __init__(self, capacity, max_per_client=None, average_seconds=1.0, min_deadline=0.0):
+        """
+        Initialize the controller.
+
+        Parameters:
+        - capacity (int): Requests served at once, usually the number of OCR workers.
+        - max_per_client (int): Requests a single client may have in flight, or None for no limit.
+        - average_seconds (float): Service time assumed until requests have been measured.
+        - min_deadline (float): Shortest deadline in seconds a request may set.
+        """
+        self.capacity = max(1, capacity)
+        self.max_per_client = max_per_client
+        self.min_deadline = min_deadline
+        self._average_seconds = average_seconds
+        self._in_flight = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def admit(self, client, deadline=None):
+        """
+        Admit a request of a client, or raise AdmissionRejected.
+
+        Parameters:
+        - client (str): Identity of the client, such as its address.
+        - deadline (Deadline): Deadline of the request, or None to skip the wait estimate.
+
+        Returns:
+        - AdmissionTicket: Slot to release once the response has been sent.
+        """
+        if deadline is not None:
+            self.check_deadline(deadline)
+
+        with self._lock:
+            if self.max_per_client and self._clients.get(client, 0) >= self.max_per_client:
+                raise AdmissionRejected(f"Too many concurrent requests from {client}, at most {self.max_per_client}",
+                                        'client_limit', max(1, math.ceil(self._average_seconds)))
+
+            if deadline is not None:
+                # Only a real wait for a worker is a reason to turn the request away as busy
+                wait = self._wait()
+                remaining = deadline.remaining()
+                if wait > 0 and wait >= remaining:
+                    raise AdmissionRejected(
+                        f"Server busy: estimated wait of {wait:.1f} s exceeds the deadline of {deadline.seconds:g} s",
+                        'deadline', max(1, math.ceil(wait - remaining)))
+
+            self._in_flight += 1
+            self._clients[client] = self._clients.get(client, 0) + 1
+        return AdmissionTicket(self, client)
+
+    def check_deadline(self, deadline):
+        """
+        Raise AdmissionRejected if a deadline is too short to be met or has already passed.
+
+        Parameters:
+        - deadline (Deadline): Deadline of the request.
+
+        Returns:
+        - None
+        """
+        if deadline.seconds < self.min_deadline:
+            raise AdmissionRejected(f"Deadline of {deadline.seconds:g} s is too short; "
+                                    f"the minimum is {self.min_deadline:g} s", 'deadline_too_short', None)
+        if deadline.expired():
+            raise AdmissionRejected(f"Deadline of {deadline.seconds:g} s is too short; "
+                                    f"it passed before the request was admitted", 'deadline_expired', None)
+
+    def estimated_wait(self):
+        """Seconds a newly admitted request is expected to wait for a worker."""
+        with self._lock:
+            return self._wait()
+
+    def in_flight(self, client=None):
+        """
+        Admitted requests not released yet.
+
+        Parameters:
+        - client (str): Count only this client's requests.
+
+        Returns:
+        - int: Number of requests holding a slot.
+        """
+        with self._lock:
+            return self._in_flight if client is None else self._clients.get(client, 0)
+
+    def _wait(self):
+        """Expected wait for a worker, with the lock held."""
+        ahead = self._in_flight - self.capacity + 1
+        return ahead * self._average_seconds / self.capacity if ahead > 0 else 0.0
+
+    def _release(self, ticket, record):
+        """Give back the slot of a ticket, once."""
+        with self._lock:
+            if ticket._released:
+                return
+            ticket._released = True
+            self._in_flight -= 1
+            remaining = self._clients.get(ticket.client, 0) - 1
+            if remaining > 0:
+                self._clients[ticket.client] = remaining
+            else:
+                self._clients.pop(ticket.client, None)
+            if record:
+                duration = time.monotonic() - ticket.started
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * duration
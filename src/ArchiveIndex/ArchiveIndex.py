@@ -0,0 +1,285 @@
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zipfile
+import zlib
+from datetime import datetime
+
+# Local file header: signature, version, flags, method, time, date, crc, sizes, name and extra lengths
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+
+# Entry folders of the batching writer: <received>_<md5>[_<token>]
+_ENTRY_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}-\d{6})_([0-9a-f]{32})(?:_([A-Za-z0-9]+))?$')
+# Archives written one per request by earlier versions: <received>_<md5>_<token>.zip
+_LEGACY_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})_([0-9a-f]{32})_(.+)\.zip$')
+
+
+class ArchiveIndex:
+
+    """
+    ArchiveIndex: SQLite index of archived uploads, by content hash, token and time.
+
+    Every archived upload is one row with its hash, token, time of receipt and archive,
+    plus the position of its image and OCR result inside that archive: the offset of the
+    member's local header, its sizes, compression method and CRC. Lookups by hash, token or
+    date range are B-tree index scans, and a member is read with one seek into its archive
+    without parsing the archive's central directory. The index is shared by all worker
+    processes and can be rebuilt offline from the archives themselves, including the
+    one-archive-per-request layout of earlier versions.
+
+    Methods:
+        - add(archive_path: str, uploads: list) -> None:
+            Index uploads written to an archive.
+
+        - find(hash_value: str = None, token: str = None, start: float = None, end: float = None, limit: int = 100) -> list:
+            Return indexed uploads matching all given criteria, newest first.
+
+        - read(upload: dict, member: str = 'image') -> bytes:
+            Read the image or the OCR result of an indexed upload from its archive.
+
+        - rebuild() -> int:
+            Re-create the index from the archives under the archive directory.
+
+    Private Methods:
+        - _index_archive(connection: sqlite3.Connection, archive_path: str) -> int:
+            Index every upload found in one archive.
+
+        - _insert(connection: sqlite3.Connection, archive: str, uploads: list) -> int:
+            Insert uploads of an archive, replacing earlier rows of the same entries.
+
+    Example Usage:
+        index = ArchiveIndex('tmp_post/archive_index.sqlite3', 'tmp_post')
+        for upload in index.find(hash_value='9e107d9d372bb6826bd81d3542a419d6'):
+            image = index.read(upload)
+    """
+
+    def __init__(self, database_path, archive_directory):
+        """
+        Initialize the index, creating the database if needed.
+
+        Parameters:
+        - database_path (str): Path of the SQLite database file.
+        - archive_directory (str): Directory holding the archives; archive paths are stored relative to it.
+        """
+        self.database_path = database_path
+        self.archive_directory = archive_directory
+        self._local = threading.local()
+
+        directory = os.path.dirname(database_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "id INTEGER PRIMARY KEY, hash TEXT NOT NULL, token TEXT, received REAL NOT NULL, filename TEXT, "
+                "archive TEXT NOT NULL, entry TEXT NOT NULL, UNIQUE (archive, entry))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS uploads_hash ON uploads (hash, received)")
+            connection.execute("CREATE INDEX IF NOT EXISTS uploads_token ON uploads (token)")
+            connection.execute("CREATE INDEX IF NOT EXISTS uploads_received ON uploads (received)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS members ("
+                "upload_id INTEGER NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, offset INTEGER NOT NULL, "
+                "compressed_size INTEGER NOT NULL, size INTEGER NOT NULL, method INTEGER NOT NULL, "
+                "crc INTEGER NOT NULL, PRIMARY KEY (upload_id, kind))"
+            )
+
+    def add(self, archive_path, uploads):
+        """
+        Index uploads written to an archive.
+
+        Parameters:
+        - archive_path (str): Path of the archive file.
+        - uploads (list): Dicts with 'hash', 'token', 'received' (seconds since the epoch),
+          'filename', 'entry' (folder inside the archive) and 'members', mapping 'image' and
+          'result' to the ZipInfo of each member written.
+
+        Returns:
+        - None
+        """
+        archive = os.path.relpath(archive_path, self.archive_directory)
+        with self._connection() as connection:
+            self._insert(connection, archive, uploads)
+
+    def find(self, hash_value=None, token=None, start=None, end=None, limit=100):
+        """
+        Return indexed uploads matching all given criteria, newest first.
+
+        Parameters:
+        - hash_value (str): MD5 hex digest of the upload contents.
+        - token (str): Token the upload was archived under.
+        - start (float): Earliest time of receipt, in seconds since the epoch.
+        - end (float): Time of receipt before which uploads must have arrived.
+        - limit (int): Most uploads returned.
+
+        Returns:
+        - list: Dicts with hash, token, received, filename, archive and entry, and the
+          'image' and 'result' member locations, or None for members that were not archived.
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (("hash = ?", hash_value), ("token = ?", token),
+                                 ("received >= ?", start), ("received < ?", end)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = self._connection()
+        rows = connection.execute(
+            f"SELECT id, hash, token, received, filename, archive, entry FROM uploads {where} "
+            f"ORDER BY received DESC LIMIT ?",
+            parameters + [limit]
+        ).fetchall()
+
+        uploads = {}
+        for upload_id, hash_value, token, received, filename, archive, entry in rows:
+            uploads[upload_id] = {"hash": hash_value, "token": token, "received": received, "filename": filename,
+                                  "archive": archive, "entry": entry, "image": None, "result": None}
+        if uploads:
+            members = connection.execute(
+                f"SELECT upload_id, kind, name, offset, compressed_size, size, method, crc FROM members "
+                f"WHERE upload_id IN ({', '.join('?' * len(uploads))})",
+                list(uploads)
+            ).fetchall()
+            for upload_id, kind, name, offset, compressed_size, size, method, crc in members:
+                uploads[upload_id][kind] = {"name": name, "offset": offset, "compressed_size": compressed_size,
+                                            "size": size, "method": method, "crc": crc}
+        return list(uploads.values())
+
+    def read(self, upload, member='image'):
+        """
+        Read the image or the OCR result of an indexed upload from its archive.
+
+        Parameters:
+        - upload (dict): Upload returned by find().
+        - member (str): 'image' or 'result'.
+
+        Returns:
+        - bytes: Uncompressed member contents.
+        """
+        location = upload[member]
+        if location is None:
+            raise KeyError(f"No {member} archived for upload {upload['entry']}")
+
+        with open(os.path.join(self.archive_directory, upload['archive']), 'rb') as archive:
+            archive.seek(location['offset'])
+            header = archive.read(_LOCAL_HEADER.size)
+            if len(header) != _LOCAL_HEADER.size or not header.startswith(_LOCAL_SIGNATURE):
+                raise ValueError(f"Archive index is out of date for {upload['archive']}; rebuild it")
+            fields = _LOCAL_HEADER.unpack(header)
+            archive.seek(fields[9] + fields[10], os.SEEK_CUR)
+            data = archive.read(location['compressed_size'])
+
+        if location['method'] == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+        elif location['method'] != zipfile.ZIP_STORED:
+            raise ValueError(f"Unsupported compression method: {location['method']}")
+        if zlib.crc32(data) != location['crc']:
+            raise ValueError(f"CRC mismatch reading {location['name']} from {upload['archive']}")
+        return data
+
+    def rebuild(self):
+        """
+        Re-create the index from the archives under the archive directory.
+
+        Unreadable archives are reported and skipped.
+
+        Returns:
+        - int: Number of uploads indexed.
+        """
+        archives = []
+        for directory, _, filenames in os.walk(self.archive_directory):
+            archives.extend(os.path.join(directory, filename) for filename in sorted(filenames)
+                            if filename.endswith('.zip'))
+
+        indexed = 0
+        with self._connection() as connection:
+            connection.execute("DELETE FROM members")
+            connection.execute("DELETE FROM uploads")
+            for archive_path in sorted(archives):
+                try:
+                    indexed += self._index_archive(connection, archive_path)
+                except (OSError, zipfile.BadZipFile) as e:
+                    print(f"Error indexing archive {archive_path}: {e}")
+        return indexed
+
+    def _index_archive(self, connection, archive_path):
+        """Index every upload found in one archive, using only its central directory."""
+        archive = os.path.relpath(archive_path, self.archive_directory)
+        with zipfile.ZipFile(archive_path) as zip_file:
+            infos = zip_file.infolist()
+
+            legacy = _LEGACY_PATTERN.match(os.path.basename(archive_path))
+            if legacy is not None:
+                names = zip_file.namelist()
+                filename = zip_file.read('original_filename.txt').decode('utf-8', 'replace') \
+                    if 'original_filename.txt' in names else None
+                uploads = [{
+                    "hash": legacy.group(2),
+                    "token": legacy.group(3),
+                    "received": datetime.strptime(legacy.group(1), '%Y-%m-%d_%H-%M-%S').timestamp(),
+                    "filename": filename,
+                    "entry": os.path.basename(archive_path),
+                    "members": {},
+                }]
+                return self._insert(connection, archive, uploads)
+
+        uploads = {}
+        for info in infos:
+            folder, _, name = info.filename.partition('/')
+            match = _ENTRY_PATTERN.match(folder)
+            if match is None or not name:
+                continue
+            upload = uploads.get(folder)
+            if upload is None:
+                upload = uploads[folder] = {
+                    "hash": match.group(2),
+                    "token": match.group(3),
+                    "received": datetime.strptime(match.group(1), '%Y-%m-%d_%H-%M-%S-%f').timestamp(),
+                    "filename": None,
+                    "entry": folder,
+                    "members": {},
+                }
+            if name == 'result.json':
+                upload["members"]["result"] = info
+            else:
+                upload["filename"] = name
+                upload["members"]["image"] = info
+        return self._insert(connection, archive, list(uploads.values()))
+
+    @staticmethod
+    def _insert(connection, archive, uploads):
+        """Insert uploads of an archive, replacing earlier rows of the same entries."""
+        for upload in uploads:
+            connection.execute(
+                "DELETE FROM members WHERE upload_id IN (SELECT id FROM uploads WHERE archive = ? AND entry = ?)",
+                (archive, upload["entry"])
+            )
+            upload_id = connection.execute(
+                "INSERT OR REPLACE INTO uploads (hash, token, received, filename, archive, entry) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (upload["hash"], upload["token"], upload["received"], upload["filename"], archive, upload["entry"])
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO members (upload_id, kind, name, offset, compressed_size, size, method, crc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(upload_id, kind, info.filename, info.header_offset, info.compress_size, info.file_size,
+                  info.compress_type, info.CRC) for kind, info in upload["members"].items()]
+            )
+        return len(uploads)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
@@ -0,0 +1,443 @@
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+# Formats that are already compressed gain nothing from deflate
+_COMPRESSED_SIGNATURES = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'GIF8',  # GIF
+    b'%PDF',  # PDF
+)
+
+_STOP = object()
+
+
+class ArchiveEntry:
+
+    """
+    ArchiveEntry: An upload waiting to be archived together with its OCR result.
+
+    Attributes:
+        - timestamp (float): Time the upload was received, in seconds since the epoch.
+        - filename (str): Sanitized original file name.
+        - hash_value (str): MD5 hex digest of the upload contents.
+        - data (bytes-like): Upload contents when held in memory, otherwise None.
+        - path (str): File owned by the writer that holds the upload contents, otherwise None.
+        - result (dict): OCR result stored next to the image.
+        - token (str): Token the upload is archived and indexed under, or None.
+    """
+
+    __slots__ = ('timestamp', 'filename', 'hash_value', 'data', 'path', 'result', 'token')
+
+    def __init__(self, timestamp, filename, hash_value, data=None, path=None, result=None, token=None):
+        self.timestamp = timestamp
+        self.filename = filename
+        self.hash_value = hash_value
+        self.data = data
+        self.path = path
+        self.result = result
+        self.token = token
+
+    @property
+    def folder(self):
+        """Folder of the entry inside its archive."""
+        stamp = datetime.fromtimestamp(self.timestamp).strftime('%Y-%m-%d_%H-%M-%S-%f')
+        if self.token:
+            return f"{stamp}_{self.hash_value}_{self.token}"
+        return f"{stamp}_{self.hash_value}"
+
+    @property
+    def memory_bytes(self):
+        """Bytes of upload contents the entry holds in memory."""
+        return len(self.data) if self.data is not None else 0
+
+    def discard(self):
+        """Remove the file owned by the entry, if any."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class ArchiveWriter:
+
+    """
+    ArchiveWriter: Background writer that batches uploads into append-only ZIP archives.
+
+    Requests only queue the upload and its OCR result; a writer thread appends queued entries
+    in batches to one archive per time window and process. The archive of the current window
+    stays open, so a batch only appends its members instead of re-reading and rewriting the
+    central directory; the file is flushed after every batch and the central directory is
+    written when the window changes, when the writer has been idle for idle_close seconds,
+    and on close. Indexed members are read through their local headers, so they stay
+    readable even if the process dies before that. JPEG, PNG, GIF and PDF payloads are stored
+    without recompression. The queue holds at most max_queued entries and max_queued_bytes
+    of in-memory upload data; when either is reached, the 'drop' policy discards the entry
+    and the 'block' policy waits up to block_timeout seconds for room before dropping it.
+    With an ArchiveIndex, every written batch is indexed by hash, token and time.
+
+    Methods:
+        - submit(upload: UploadBuffer, filename: str, result: dict = None, token: str = None) -> bool:
+            Queue an upload and its OCR result for archiving.
+
+        - flush(timeout: float = None) -> bool:
+            Wait until every queued entry has been written.
+
+        - close(timeout: float = None) -> None:
+            Write the remaining entries and stop the writer thread.
+
+        - stats() -> dict:
+            Return written, dropped and failed counters together with the queue depth.
+
+    Private Methods:
+        - _work() -> None:
+            Writer thread loop: collect batches and append them to their archives.
+
+        - _write_batch(entries: list) -> None:
+            Append entries to the archives of their time windows.
+
+        - _open_window(archive_path: str) -> zipfile.ZipFile:
+            Return the open archive of a time window, closing the previous window's archive.
+
+        - _close_window() -> None:
+            Write the central directory of the open archive and close it.
+
+        - _write_entry(archive: zipfile.ZipFile, entry: ArchiveEntry) -> dict:
+            Write an upload and its result into an open archive and return its index record.
+
+        - _archive_path(timestamp: float) -> str:
+            Archive file of the time window a timestamp falls in.
+
+    Example Usage:
+        writer = ArchiveWriter('tmp_post', window_seconds=3600, max_queued=256, policy='drop')
+        writer.submit(upload, 'scan.png', {'extracted_text': text})
+        writer.close()
+    """
+
+    def __init__(self, archive_directory, window_seconds=3600, max_queued=256, policy='drop', block_timeout=5,
+                 batch_size=64, metrics=None, stage_seconds=None, index=None, max_queued_bytes=256 * 1024 * 1024,
+                 idle_close=5):
+        """
+        Initialize the writer. The writer thread is started on first submit.
+
+        Parameters:
+        - archive_directory (str): Directory that receives the monthly archive folders.
+        - window_seconds (int): Length of the time window covered by one archive.
+        - max_queued (int): Maximum number of entries waiting to be written.
+        - policy (str): 'drop' to discard entries when the queue is full, 'block' to wait for room.
+        - block_timeout (float): Seconds the 'block' policy waits before dropping an entry.
+        - batch_size (int): Maximum number of entries appended to an archive at once.
+        - metrics (MetricsRegistry): Registry that also receives the archive counters, shared across processes.
+        - stage_seconds (Histogram): Histogram labelled by stage that receives the archive write latency.
+        - index (ArchiveIndex): Index that receives the location of every written upload.
+        - max_queued_bytes (int): Maximum bytes of in-memory upload data waiting to be written; spooled uploads wait on disk.
+        - idle_close (float): Seconds without new entries after which the open archive is completed.
+        """
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown archive queue policy: {policy}")
+
+        self.archive_directory = archive_directory
+        self.window_seconds = window_seconds
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes
+        self.idle_close = idle_close
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.stage_seconds = stage_seconds
+        self.index = index
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._queued_bytes = 0
+        # Archive of the current time window, used by the writer thread only
+        self._window_path = None
+        self._window_file = None
+        self._window_archive = None
+        self._thread = None
+        self._thread_pid = None
+        self._counters = {"written": 0, "dropped": 0, "failed": 0}
+        self._events = None
+        if metrics is not None:
+            self._events = metrics.counter('ocr_archive_entries_total', 'Uploads written to or dropped from the archive.',
+                                           label='outcome', values=tuple(self._counters))
+
+    def submit(self, upload, filename, result=None, token=None):
+        """
+        Queue an upload and its OCR result for archiving.
+
+        A spooled upload's file is handed over to the writer, so the caller's cleanup no
+        longer removes it.
+
+        Parameters:
+        - upload (UploadBuffer): Upload to archive.
+        - filename (str): Sanitized name stored in the archive.
+        - result (dict): JSON-serializable OCR result stored next to the image.
+        - token (str): Alphanumeric token to archive and index the upload under.
+
+        Returns:
+        - bool: True if the entry was queued, False if it was dropped.
+        """
+        self._ensure_thread()
+
+        entry = ArchiveEntry(time.time(), filename, upload.hash_value, data=upload.data, result=result, token=token)
+        if upload.data is None and upload.path:
+            entry.path = f"{upload.path}.archive"
+            try:
+                os.replace(upload.path, entry.path)
+            except OSError as e:
+                print(f"Error handing upload to the archive writer: {e}")
+                self._count("failed")
+                return False
+            upload.path = None
+
+        started = time.monotonic()
+        queued = self._reserve(entry.memory_bytes)
+        if queued:
+            try:
+                if self.policy == 'block':
+                    # Both limits share one wait of block_timeout seconds
+                    self._queue.put(entry, timeout=max(0.0, self.block_timeout - (time.monotonic() - started)))
+                else:
+                    self._queue.put_nowait(entry)
+            except queue.Full:
+                self._release(entry.memory_bytes)
+                queued = False
+
+        if not queued:
+            entry.discard()
+            self._count("dropped")
+        return queued
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued entry has been written.
+
+        Parameters:
+        - timeout (float): Seconds to wait, or None to wait indefinitely.
+
+        Returns:
+        - bool: True if the queue was drained in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Write the remaining entries and stop the writer thread.
+
+        Parameters:
+        - timeout (float): Seconds to wait for the writer, or None to wait indefinitely.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            thread = self._thread if self._thread_pid == os.getpid() else None
+            self._thread = None
+            self._thread_pid = None
+
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self):
+        """
+        Return written, dropped and failed counters together with the queue depth.
+
+        Returns:
+        - dict: Archive counters.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        if self._events is not None:
+            stats.update({outcome: int(self._events.value(outcome)) for outcome in self._counters})
+        stats["queued"] = self._queue.qsize()
+        stats["queued_bytes"] = self._queued_bytes
+        return stats
+
+    def _reserve(self, size):
+        """Count an entry's in-memory bytes as queued if they fit, waiting for room under the 'block' policy."""
+        with self._room:
+            if not self._fits(size):
+                if self.policy != 'block' or not self._room.wait_for(lambda: self._fits(size), self.block_timeout):
+                    return False
+            self._queued_bytes += size
+            return True
+
+    def _fits(self, size):
+        """Return True if an entry's in-memory bytes fit in the queue, with the lock held."""
+        # An entry larger than the whole budget is still accepted into an empty queue
+        return (self.max_queued_bytes is None or not self._queued_bytes
+                or self._queued_bytes + size <= self.max_queued_bytes)
+
+    def _release(self, size):
+        """Give back queued bytes once their entry has been written or dropped."""
+        with self._room:
+            self._queued_bytes -= size
+            self._room.notify_all()
+
+    def _count(self, outcome, amount=1):
+        """Increase a counter and its shared metric."""
+        with self._lock:
+            self._counters[outcome] += amount
+        if self._events is not None and amount:
+            self._events.inc(amount, outcome)
+
+    def _ensure_thread(self):
+        """Start the writer thread in this process if it is not running yet."""
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._work, name='ocr-archive', daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def _work(self):
+        """Writer thread loop: collect batches and append them to their archives."""
+        while True:
+            try:
+                # While an archive is open, an idle writer completes it instead of waiting indefinitely
+                entries = [self._queue.get(timeout=self.idle_close if self._window_archive is not None else None)]
+            except queue.Empty:
+                self._close_window()
+                continue
+            while len(entries) < self.batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(entry is _STOP for entry in entries)
+            entries = [entry for entry in entries if entry is not _STOP]
+            size = sum(entry.memory_bytes for entry in entries)
+            try:
+                self._write_batch(entries)
+                if stop:
+                    self._close_window()
+            finally:
+                self._release(size)
+                for _ in range(len(entries) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, entries):
+        """Append entries to the archives of their time windows."""
+        windows = {}
+        for entry in entries:
+            windows.setdefault(self._archive_path(entry.timestamp), []).append(entry)
+
+        for archive_path, window_entries in windows.items():
+            started = time.perf_counter()
+            records = []
+            try:
+                archive = self._open_window(archive_path)
+                for entry in window_entries:
+                    records.append(self._write_entry(archive, entry))
+                self._window_file.flush()
+            except Exception as e:
+                print(f"Error writing upload archive {archive_path}: {e}")
+                # Complete the archive with the members written so far; the next batch reopens it
+                self._close_window()
+            finally:
+                for entry in window_entries:
+                    entry.discard()
+            written = len(records)
+
+            # Index once the batch is flushed, so every recorded local header is already in the file
+            if self.index is not None and records:
+                try:
+                    self.index.add(archive_path, records)
+                except Exception as e:
+                    print(f"Error indexing upload archive {archive_path}: {e}")
+
+            self._count("written", written)
+            self._count("failed", len(window_entries) - written)
+            if self.stage_seconds is not None and written:
+                self.stage_seconds.observe((time.perf_counter() - started) / written, 'archive')
+
+    def _open_window(self, archive_path):
+        """Return the open archive of a time window, closing the previous window's archive."""
+        if self._window_path == archive_path and self._window_archive is not None:
+            return self._window_archive
+
+        self._close_window()
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        self._window_file = open(archive_path, 'r+b' if os.path.exists(archive_path) else 'w+b')
+        try:
+            self._window_archive = zipfile.ZipFile(self._window_file, 'a', compression=zipfile.ZIP_DEFLATED)
+        except Exception:
+            self._window_file.close()
+            self._window_file = None
+            raise
+        self._window_path = archive_path
+        return self._window_archive
+
+    def _close_window(self):
+        """Write the central directory of the open archive and close it."""
+        archive, file = self._window_archive, self._window_file
+        self._window_path = self._window_archive = self._window_file = None
+        try:
+            if archive is not None:
+                archive.close()
+        except Exception as e:
+            print(f"Error completing upload archive: {e}")
+        finally:
+            if file is not None:
+                file.close()
+
+    @staticmethod
+    def _write_entry(archive, entry):
+        """Write an upload and its result into an open archive and return its index record."""
+        stamp = datetime.fromtimestamp(entry.timestamp)
+        folder = entry.folder
+
+        if entry.data is not None:
+            header = bytes(entry.data[:8])
+        else:
+            with open(entry.path, 'rb') as payload:
+                header = payload.read(8)
+        compression = zipfile.ZIP_STORED if header.startswith(_COMPRESSED_SIGNATURES) else zipfile.ZIP_DEFLATED
+
+        image_name = f"{folder}/{entry.filename}"
+        if entry.data is not None:
+            archive.writestr(image_name, entry.data, compress_type=compression)
+        else:
+            archive.write(entry.path, image_name, compress_type=compression)
+
+        metadata = {
+            "original_filename": entry.filename,
+            "hash_value": entry.hash_value,
+            "received": stamp.isoformat(),
+            "result": entry.result,
+        }
+        result_name = f"{folder}/result.json"
+        archive.writestr(result_name, json.dumps(metadata))
+
+        return {
+            "hash": entry.hash_value,
+            "token": entry.token,
+            "received": entry.timestamp,
+            "filename": entry.filename,
+            "entry": folder,
+            "members": {"image": archive.getinfo(image_name), "result": archive.getinfo(result_name)},
+        }
+
+    def _archive_path(self, timestamp):
+        """Archive file of the time window a timestamp falls in, one per process."""
+        window_start = datetime.fromtimestamp(timestamp - timestamp % self.window_seconds)
+        return os.path.join(self.archive_directory, window_start.strftime("%Y-%m"),
+                            f"{window_start.strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}.zip")
@@ -0,0 +1,86 @@
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of time before its work is done."""
+
+
+class Deadline:
+
+    """
+    Deadline: Point in time by which a request must be answered.
+
+    The deadline is kept in seconds since the epoch rather than on the monotonic clock of
+    one process, so it can be handed to OCR worker processes along with a job and still
+    mean the same instant there.
+
+    Methods:
+        - remaining() -> float:
+            Seconds left, never negative.
+
+        - expired() -> bool:
+            Return True once the deadline has passed.
+
+        - check(stage: str, margin: float = 0.0) -> None:
+            Raise DeadlineExceeded if the deadline has passed before a stage starts.
+
+        - timeout(limit: float = None) -> float:
+            Seconds a blocking call may wait, at most limit, raising if none are left.
+
+    Example Usage:
+        deadline = Deadline(10)
+        deadline.check('OCR')
+        text = engine.extract_text(image, expires=deadline.expires)
+    """
+
+    __slots__ = ('seconds', 'expires')
+
+    def __init__(self, seconds, start=None):
+        """
+        Start a deadline.
+
+        Parameters:
+        - seconds (float): Seconds from the start until the deadline.
+        - start (float): Time the deadline counts from, in seconds since the epoch, defaults to now.
+        """
+        if seconds <= 0:
+            raise ValueError("Deadline must be a positive number of seconds")
+        self.seconds = seconds
+        self.expires = (time.time() if start is None else start) + seconds
+
+    def remaining(self):
+        """Seconds left, never negative."""
+        return max(0.0, self.expires - time.time())
+
+    def expired(self):
+        """Return True once the deadline has passed."""
+        return time.time() >= self.expires
+
+    def check(self, stage, margin=0.0):
+        """
+        Raise DeadlineExceeded if the deadline has passed before a stage starts.
+
+        Parameters:
+        - stage (str): Name of the stage, for the error message.
+        - margin (float): Seconds before the deadline that already count as past it, to absorb timer jitter.
+
+        Returns:
+        - None
+        """
+        if self.expires - time.time() <= margin:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g} s exceeded before {stage}")
+
+    def timeout(self, limit=None):
+        """
+        Seconds a blocking call may wait, at most limit, raising if none are left.
+
+        Parameters:
+        - limit (float): Longest wait regardless of the deadline, or None.
+
+        Returns:
+        - float: Seconds to wait.
+        """
+        remaining = self.remaining()
+        if not remaining:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g} s exceeded")
+        return min(remaining, limit) if limit else remaining
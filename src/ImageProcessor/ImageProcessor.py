@@ -1,5 +1,30 @@
-import cv2
-import pytesseract
+import mmap
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from src.Deadline.Deadline import DeadlineExceeded
+from src.LazyModule.LazyModule import LazyModule
+from src.OCRConfig.OCRConfig import OCRConfig
+from src.PreprocessPipeline.PreprocessPipeline import PreprocessPipeline
+from src.QualityLadder.QualityLadder import QualityLadder
+from src.SkewCorrector.SkewCorrector import SkewCorrector
+from src.TextRegionDetector.TextRegionDetector import TextRegionDetector
+from src.WordBoxes.WordBoxes import WordBoxes
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+pytesseract = LazyModule('pytesseract')
+
+# JPEG start-of-frame markers, whose segment holds the image size
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Reduction factors libjpeg can apply while decoding, with their OpenCV flags
+_REDUCED_DECODES = ((8, 'IMREAD_REDUCED_GRAYSCALE_8'), (4, 'IMREAD_REDUCED_GRAYSCALE_4'),
+                    (2, 'IMREAD_REDUCED_GRAYSCALE_2'))
+# OCR that timed out this close to the deadline was stopped by it
+_DEADLINE_MARGIN = 0.1
 
 
 class ImageProcessor:
@@ -7,62 +32,391 @@ class ImageProcessor:
     """
     ImageProcessor: Class for processing images and extracting text using Optical Character Recognition (OCR).
 
+    Images can be given as a file path or as the encoded file contents (bytes-like), which
+    are decoded in memory without touching the disk. Every pipeline starts with grayscale
+    conversion, so images are decoded straight to grayscale. With a target DPI, oversized
+    images are brought down to the pixel size of a page at that resolution: JPEGs are scaled
+    by 1/2, 1/4 or 1/8 in the DCT domain while decoding, and the rest of the way by an
+    aspect-preserving resize. Preprocessing is a PreprocessPipeline;
+    callers may pass their own pipeline per image and a report dict that receives the
+    milliseconds spent in each preprocessing stage. With region detection enabled only the
+    detected text blocks are recognized, concurrently, and their text is joined in reading
+    order; images without detected blocks fall back to full-frame OCR. With words=True the
+    same single OCR pass returns WordBoxes holding every word's box and confidence instead
+    of plain text. An OCRConfig selects another language, segmentation mode, engine mode or
+    character whitelist for a single image. With deskew enabled a SkewCorrector straightens
+    skewed, sideways and upside-down pages before the pipeline runs, and the report receives
+    the applied rotation. In tiered mode a QualityLadder first reads a cheap, downscaled copy
+    and escalates to more expensive tiers only when word confidence or coverage is too low;
+    the report names the tier whose result was kept. A Deadline limits how long OCR may run:
+    tesseract is stopped when it passes, and DeadlineExceeded is raised.
+
     Methods:
-        - process_and_extract_text(image_path: str) -> str:
-            Process the image and extract text.
+        - process_and_extract_text(image_source: str or bytes) -> str:
+            Process the image and extract text, in tiered mode if it is the default.
+
+        - extract_text(image_source: str or bytes, pipeline: PreprocessPipeline = None, detect_regions: bool = None, report: dict = None, reuse_result: callable = None, words: bool = False, config: OCRConfig = None, deskew: bool = None, tiered: bool = None, deadline: Deadline = None) -> str or WordBoxes:
+            Process the image and extract text, raising on failure.
+
+        - extract_page_text(page: np.ndarray, pipeline: PreprocessPipeline = None, detect_regions: bool = None, report: dict = None, words: bool = False, config: OCRConfig = None, deskew: bool = None, tiered: bool = None, deadline: Deadline = None) -> str or WordBoxes:
+            Process an already decoded page and extract text, raising on failure.
+
+        - settings(pipeline: PreprocessPipeline = None, detect_regions: bool = None, words: bool = False, config: OCRConfig = None, deskew: bool = None, tiered: bool = None) -> dict:
+            OCR settings that influence the extracted text.
+
+        - warm_up() -> None:
+            Load the imaging libraries and the OCR model before the first image arrives.
 
     Private Methods:
-        - _preprocess_image(image_path: str) -> np.ndarray:
+        - _load_image(image_source: str or bytes, max_side: int = None) -> np.ndarray:
+            Decode an image to grayscale from a file path or from encoded bytes, no larger than max_side.
+
+        - _decode_flags(data: bytes-like, max_side: int) -> int:
+            Cheapest OpenCV decode flags that keep the image at least max_side pixels long.
+
+        - _jpeg_size(data: bytes-like) -> tuple:
+            Width and height from a JPEG's start-of-frame segment.
+
+        - _preprocess_image(image_source: str or bytes, pipeline: PreprocessPipeline = None, report: dict = None, deskew: bool = None) -> np.ndarray:
             Preprocess the image for better OCR recognition.
 
+        - _preprocess_array(image: np.ndarray, pipeline: PreprocessPipeline = None, report: dict = None, deskew: bool = None) -> np.ndarray:
+            Preprocess a decoded BGR or grayscale image for better OCR recognition.
+
         - _extract_text(preprocessed_image: np.ndarray) -> str:
             Extract text from a preprocessed image using pytesseract.
+
+        - _extract_tiered(image: np.ndarray, pipeline: PreprocessPipeline, detect_regions: bool, report: dict, reuse_result: callable, words: bool, config: OCRConfig, deskew: bool, deadline: Deadline) -> str or WordBoxes:
+            Run the tiers of the quality ladder on a decoded image until one is good enough.
+
+        - _recognize(preprocessed_image: np.ndarray, detect_regions: bool, report: dict, words: bool, config: OCRConfig, deadline: Deadline) -> str or WordBoxes:
+            Run OCR on the whole image or on its detected text regions.
+
+        - _run_ocr(preprocessed_image: np.ndarray, words: bool = False, config: OCRConfig = None, deadline: Deadline = None) -> str or WordBoxes:
+            Run OCR on a preprocessed image, raising on failure.
+
+        - _run_ocr_many(preprocessed_images: list, words: bool = False, config: OCRConfig = None, deadline: Deadline = None) -> list:
+            Run OCR on several preprocessed images concurrently, raising on failure.
     """
 
-    def process_and_extract_text(self, image_path):
+    def __init__(self, lang='eng', engine=None, pipeline=None, detect_regions=False, region_detector=None,
+                 stage_seconds=None, deskew=False, skew_corrector=None, tiered=False, quality_ladder=None,
+                 target_dpi=None, page_inches=11.7):
+        """
+        Initialize the image processor.
+
+        Parameters:
+        - lang (str): Tesseract language used for OCR.
+        - engine (OCREngine): Worker pool that runs OCR, or None to call pytesseract in-process.
+        - pipeline (PreprocessPipeline): Default preprocessing pipeline.
+        - detect_regions (bool): Recognize only detected text regions by default.
+        - region_detector (TextRegionDetector): Detector used for region OCR.
+        - stage_seconds (Histogram): Histogram labelled by stage that receives decode, preprocess and ocr latencies.
+        - deskew (bool): Straighten skewed and rotated pages before preprocessing by default.
+        - skew_corrector (SkewCorrector): Corrector used for deskewing.
+        - tiered (bool): Escalate through the quality ladder by default instead of a single full OCR pass.
+        - quality_ladder (QualityLadder): Tiers and thresholds of tiered mode.
+        - target_dpi (int): Resolution images are decoded at, or None to keep the full resolution.
+        - page_inches (float): Longest side of a page in inches, used to turn target_dpi into pixels;
+          the default fits A4 and US letter.
+        """
+        self.engine = engine
+        self.lang = engine.lang if engine is not None else lang
+        self.config = engine.config if engine is not None else OCRConfig(self.lang)
+        self.pipeline = pipeline or PreprocessPipeline()
+        self.detect_regions = detect_regions
+        self.region_detector = region_detector or TextRegionDetector()
+        self.stage_seconds = stage_seconds
+        self.deskew = deskew
+        self.skew_corrector = skew_corrector or SkewCorrector()
+        self.tiered = tiered
+        self.quality_ladder = quality_ladder or QualityLadder()
+        # Longest side of a decoded image, assuming the page fills the frame
+        self.max_decode_side = round(target_dpi * page_inches) if target_dpi else None
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def settings(self, pipeline=None, detect_regions=None, words=False, config=None, deskew=None, tiered=None):
+        """
+        OCR settings that influence the extracted text.
+
+        Parameters:
+        - pipeline (PreprocessPipeline): Pipeline used instead of the default one.
+        - detect_regions (bool): Overrides the default region detection mode.
+        - words (bool): Word boxes are extracted instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deskew (bool): Overrides the default deskew mode.
+        - tiered (bool): Overrides the default tiered mode.
+
+        Returns:
+        - dict: Settings used to key cached results.
+        """
+        settings = (config or self.config).settings()
+        settings["pipeline"] = (pipeline or self.pipeline).stages
+        if self.detect_regions if detect_regions is None else detect_regions:
+            settings["detect_regions"] = True
+        if words:
+            settings["words"] = True
+        if self.deskew if deskew is None else deskew:
+            settings["deskew"] = True
+        if self.tiered if tiered is None else tiered:
+            settings["quality"] = self.quality_ladder.settings()
+        if self.max_decode_side:
+            # Text read from a reduced-resolution decode differs from a full-resolution one
+            settings["max_decode_side"] = self.max_decode_side
+        return settings
+
+    def process_and_extract_text(self, image_source):
         """
         Process the image and extract text.
 
         Parameters:
-        - image_path (str): Path to the image file.
+        - image_source (str or bytes): Path to the image file, or its encoded contents.
 
         Returns:
         - str: Extracted text from the image.
         """
-        preprocessed_image = self._preprocess_image(image_path)
-
         try:
-            return self._extract_text(preprocessed_image)
+            return self.extract_text(image_source)
 
         except Exception as e:
             # Handle general exceptions
             return f"Error processing image: {e}"
 
+    def extract_text(self, image_source, pipeline=None, detect_regions=None, report=None, reuse_result=None,
+                     words=False, config=None, deskew=None, tiered=None, deadline=None):
+        """
+        Process the image and extract text, raising on failure.
+
+        Parameters:
+        - image_source (str or bytes): Path to the image file, or its encoded contents.
+        - pipeline (PreprocessPipeline): Pipeline used instead of the default one.
+        - detect_regions (bool): Overrides the default region detection mode.
+        - report (dict): If given, filled with preprocessing timings, the applied rotation, the number of
+          regions and, in tiered mode, the tiers tried.
+        - reuse_result (callable): Called with the preprocessed image before OCR; a returned text
+          other than None is used instead of running OCR.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deskew (bool): Overrides the default deskew mode.
+        - tiered (bool): Overrides the default tiered mode.
+        - deadline (Deadline): Deadline of the request; DeadlineExceeded is raised once it has passed.
 
-    def _preprocess_image(self, image_path):
+        Returns:
+        - str or WordBoxes: Extracted text from the image, or its words.
+        """
+        if self.tiered if tiered is None else tiered:
+            with self._time_stage('decode'):
+                image = self._load_image(image_source, self.max_decode_side)
+            if image is None:
+                raise ValueError("Unable to read image")
+            return self._extract_tiered(image, pipeline, detect_regions, report, reuse_result, words, config, deskew,
+                                        deadline)
+
+        preprocessed_image = self._preprocess_image(image_source, pipeline, report, deskew)
+        if preprocessed_image is None:
+            raise ValueError("Unable to read image")
+
+        if reuse_result is not None:
+            reused_text = reuse_result(preprocessed_image)
+            if reused_text is not None:
+                return reused_text
+
+        if deadline is not None:
+            deadline.check('OCR')
+        with self._time_stage('ocr'):
+            return self._recognize(preprocessed_image, detect_regions, report, words, config, deadline)
+
+    def extract_page_text(self, page, pipeline=None, detect_regions=None, report=None, words=False, config=None,
+                          deskew=None, tiered=None, deadline=None):
+        """
+        Process an already decoded page and extract text, raising on failure.
+
+        Parameters:
+        - page (np.ndarray): Decoded BGR or grayscale page.
+        - pipeline (PreprocessPipeline): Pipeline used instead of the default one.
+        - detect_regions (bool): Overrides the default region detection mode.
+        - report (dict): If given, filled with preprocessing timings, the applied rotation, the number of
+          regions and, in tiered mode, the tiers tried.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deskew (bool): Overrides the default deskew mode.
+        - tiered (bool): Overrides the default tiered mode.
+        - deadline (Deadline): Deadline of the request; DeadlineExceeded is raised once it has passed.
+
+        Returns:
+        - str or WordBoxes: Extracted text from the page, or its words.
+        """
+        if deadline is not None:
+            deadline.check('preprocessing')
+        if self.tiered if tiered is None else tiered:
+            return self._extract_tiered(page, pipeline, detect_regions, report, None, words, config, deskew, deadline)
+
+        preprocessed_image = self._preprocess_array(page, pipeline, report, deskew)
+        if preprocessed_image is None:
+            raise ValueError("Unable to preprocess page")
+
+        if deadline is not None:
+            deadline.check('OCR')
+        with self._time_stage('ocr'):
+            return self._recognize(preprocessed_image, detect_regions, report, words, config, deadline)
+
+    def warm_up(self):
+        """
+        Load the imaging libraries and the OCR model before the first image arrives.
+
+        A blank page runs through the default pipeline and OCR, outside the latency
+        histograms. With an OCR engine every worker process is started and runs one job.
+
+        Returns:
+        - None
+        """
+        page = np.full((64, 256, 3), 255, dtype=np.uint8)
+        preprocessed_image = self.pipeline.run(page)
+        if self.engine is not None:
+            self.engine.warm_up(preprocessed_image)
+        else:
+            pytesseract.image_to_string(preprocessed_image, lang=self.lang)
+
+    @staticmethod
+    def _load_image(image_source, max_side=None):
+        """
+        Decode an image to grayscale from a file path or from encoded bytes.
+
+        Parameters:
+        - image_source (str or bytes): Path to the image file, or its encoded contents.
+        - max_side (int): Longest side of the decoded image in pixels, or None for the full resolution.
+
+        Returns:
+        - np.ndarray: Decoded grayscale image, or None if it cannot be decoded.
+        """
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            # Decode straight from the request buffer without copying it
+            flags = ImageProcessor._decode_flags(image_source, max_side)
+            image = cv2.imdecode(np.frombuffer(image_source, dtype=np.uint8), flags)
+        else:
+            flags = cv2.IMREAD_GRAYSCALE
+            if max_side:
+                try:
+                    # Only the JPEG header is paged in to read the image size
+                    with open(image_source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        flags = ImageProcessor._decode_flags(data, max_side)
+                except (OSError, ValueError):
+                    pass
+            image = cv2.imread(image_source, flags)
+
+        if image is None or not max_side or max(image.shape[:2]) <= max_side:
+            return image
+
+        scale = max_side / max(image.shape[:2])
+        size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+        # Below a factor of 2, left over after JPEG scaling, bilinear is close to area averaging and far cheaper
+        return cv2.resize(image, size, interpolation=cv2.INTER_LINEAR if scale > 0.5 else cv2.INTER_AREA)
+
+    @staticmethod
+    def _decode_flags(data, max_side):
+        """
+        Cheapest OpenCV decode flags that keep the image at least max_side pixels long.
+
+        Parameters:
+        - data (bytes-like): Encoded image.
+        - max_side (int): Longest side wanted after decoding, or None for the full resolution.
+
+        Returns:
+        - int: IMREAD_REDUCED_GRAYSCALE_* for JPEGs large enough to be scaled while decoding,
+          otherwise IMREAD_GRAYSCALE.
+        """
+        size = ImageProcessor._jpeg_size(data) if max_side else None
+        if size is not None:
+            for factor, flag in _REDUCED_DECODES:
+                if max(size) // factor >= max_side:
+                    return getattr(cv2, flag)
+        return cv2.IMREAD_GRAYSCALE
+
+    @staticmethod
+    def _jpeg_size(data):
+        """
+        Width and height from a JPEG's start-of-frame segment.
+
+        Parameters:
+        - data (bytes-like): Encoded image.
+
+        Returns:
+        - tuple: (width, height), or None if the data is not a readable JPEG.
+        """
+        if bytes(data[:3]) != b'\xff\xd8\xff':
+            return None
+
+        position = 2
+        while position + 9 <= len(data):
+            if data[position] != 0xFF:
+                return None
+            marker = data[position + 1]
+            if marker == 0xFF:
+                # Fill byte before a marker
+                position += 1
+                continue
+            if marker in _JPEG_SOF_MARKERS:
+                height, width = struct.unpack_from('>HH', data, position + 5)
+                return width, height
+            # Skip the segment: its length counts itself but not the marker
+            position += 2 + struct.unpack_from('>H', data, position + 2)[0]
+        return None
+
+    def _preprocess_image(self, image_source, pipeline=None, report=None, deskew=None):
         """
         Preprocess the image for better OCR recognition.
 
         Parameters:
-        - image_path (str): Path to the image file.
+        - image_source (str or bytes): Path to the image file, or its encoded contents.
+        - pipeline (PreprocessPipeline): Pipeline used instead of the default one.
+        - report (dict): If given, filled with per-stage preprocessing timings and the applied rotation.
+        - deskew (bool): Overrides the default deskew mode.
 
         Returns:
         - np.ndarray: Preprocessed image as a NumPy array.
         """
-        try:
-            # Read the image using OpenCV
-            image = cv2.imread(image_path)
+        # Read the image using OpenCV
+        with self._time_stage('decode'):
+            image = self._load_image(image_source, self.max_decode_side)
 
-            # Convert the image to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self._preprocess_array(image, pipeline, report, deskew)
 
-            # Apply GaussianBlur to reduce noise and improve OCR
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    def _preprocess_array(self, image, pipeline=None, report=None, deskew=None):
+        """
+        Preprocess a decoded image for better OCR recognition.
+
+        The default pipeline converts to grayscale, applies a 5x5 Gaussian blur to reduce
+        noise and thresholds with Otsu's method to improve text visibility. Deskewing runs
+        first, on the grayscale page, because a quarter turn changes the page's shape.
 
-            # Apply thresholding to improve text visibility
-            _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        Parameters:
+        - image (np.ndarray): Decoded BGR or grayscale image.
+        - pipeline (PreprocessPipeline): Pipeline used instead of the default one.
+        - report (dict): If given, filled with per-stage preprocessing timings and, when deskewing,
+          the applied rotation in degrees counter-clockwise.
+        - deskew (bool): Overrides the default deskew mode.
 
-            return thresh
+        Returns:
+        - np.ndarray: Preprocessed image as a NumPy array, valid until the next image is
+          preprocessed on the same thread.
+        """
+        try:
+            timings = {} if report is not None else None
+            with self._time_stage('preprocess'):
+                if self.deskew if deskew is None else deskew:
+                    started = time.perf_counter()
+                    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                    image, orientation, skew = self.skew_corrector.correct(gray)
+                    if report is not None:
+                        timings["deskew"] = round((time.perf_counter() - started) * 1000, 3)
+                        report["rotation"] = {"orientation": orientation, "skew": skew}
+                preprocessed_image = (pipeline or self.pipeline).run(image, timings)
+            if report is not None:
+                report["preprocessing_ms"] = timings
+
+            return preprocessed_image
         except Exception as e:
             print(f"Error preprocessing image for OCR: {str(e)}")
             return None
@@ -78,11 +432,198 @@ class ImageProcessor:
         - str: Extracted text from the image.
         """
         try:
-            # Use pytesseract to extract text
-            extracted_text = pytesseract.image_to_string(preprocessed_image, lang='eng')
-            return extracted_text
+            return self._run_ocr(preprocessed_image)
         except Exception as e:
             print(f"Error extracting text from image: {str(e)}")
             return "Error extracting text"
 
+    def _time_stage(self, stage):
+        """Return a context manager that records the latency of a stage, if a histogram is configured."""
+        if self.stage_seconds is None:
+            return nullcontext()
+        return self.stage_seconds.time(stage)
+
+    def _extract_tiered(self, image, pipeline=None, detect_regions=None, report=None, reuse_result=None, words=False,
+                        config=None, deskew=None, deadline=None):
+        """
+        Run the tiers of the quality ladder on a decoded image until one is good enough.
+
+        Every tier recognizes words, whose confidences and boxes decide whether to escalate.
+        When less time is left before the deadline than the last tier took, the ladder stops
+        and keeps that tier's result rather than starting a more expensive one.
+
+        Parameters:
+        - image (np.ndarray): Decoded BGR or grayscale image.
+        - pipeline (PreprocessPipeline): Pipeline of tiers that do not bring their own.
+        - detect_regions (bool): Overrides the default region detection mode.
+        - report (dict): If given, filled with the details of the kept tier and a 'quality' entry
+          naming it and listing every tier tried.
+        - reuse_result (callable): Called with the first tier's preprocessed image; a returned text
+          other than None is used instead of running OCR.
+        - words (bool): Return word boxes, in the coordinates of the decoded image, instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deskew (bool): Overrides the default deskew mode for tiers that do not deskew themselves.
+        - deadline (Deadline): Deadline of the request, or None to escalate regardless of time.
+
+        Returns:
+        - str or WordBoxes: Extracted text from the image, or its words.
+        """
+        ladder = self.quality_ladder
+        config = config or self.config
+        attempts = []
+        stopped = None
+
+        for index, tier in enumerate(ladder.tiers_for(image.shape)):
+            started = time.perf_counter()
+            tier_report = {} if report is not None else None
+            scaled = ladder.resize(image, tier)
+            preprocessed_image = self._preprocess_array(scaled, tier.pipeline or pipeline, tier_report,
+                                                        True if tier.deskew else deskew)
+            if preprocessed_image is None:
+                raise ValueError("Unable to preprocess image")
+
+            if index == 0 and reuse_result is not None:
+                reused_text = reuse_result(preprocessed_image)
+                if reused_text is not None:
+                    return reused_text
+
+            if deadline is not None:
+                deadline.check('OCR')
+            with self._time_stage('ocr'):
+                result = self._recognize(preprocessed_image, detect_regions, tier_report, True, tier.config(config),
+                                         deadline)
+            confidence, coverage = ladder.assess(result, preprocessed_image)
+            elapsed = time.perf_counter() - started
+            attempts.append({"tier": tier.name, "confidence": round(confidence, 1), "coverage": round(coverage, 3),
+                             "ms": round(elapsed * 1000, 3)})
+            if ladder.accepts(confidence, coverage):
+                break
+            if deadline is not None and deadline.remaining() < elapsed:
+                stopped = 'deadline'
+                break
+
+        if report is not None:
+            report.update(tier_report)
+            report["quality"] = {"tier": tier.name, "attempts": attempts}
+            if stopped:
+                report["quality"]["stopped"] = stopped
+
+        result = ladder.rescale(result, 1 / tier.scale)
+        return result if words else result.text()
+
+    def _recognize(self, preprocessed_image, detect_regions=None, report=None, words=False, config=None, deadline=None):
+        """
+        Run OCR on the whole image or on its detected text regions.
+
+        Parameters:
+        - preprocessed_image (np.ndarray): Preprocessed image.
+        - detect_regions (bool): Overrides the default region detection mode.
+        - report (dict): If given, receives the number of regions recognized.
+        - words (bool): Return word boxes, in full-image coordinates, instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deadline (Deadline): Deadline the OCR calls are limited to.
+
+        Returns:
+        - str or WordBoxes: Extracted text from the image, or its words.
+        """
+        if not (self.detect_regions if detect_regions is None else detect_regions):
+            return self._run_ocr(preprocessed_image, words, config, deadline)
+
+        boxes = self.region_detector.detect(preprocessed_image)
+        if report is not None:
+            report["regions"] = len(boxes)
+
+        if not boxes:
+            # Nothing worth cropping was found; fall back to full-frame OCR
+            return self._run_ocr(preprocessed_image, words, config, deadline)
+
+        crops = [preprocessed_image[y:y + height, x:x + width] for x, y, width, height in boxes]
+        texts = self._run_ocr_many(crops, words, config, deadline)
+        if words:
+            # Move every region's boxes back into the coordinates of the whole image
+            for region, (x, y, _, _) in zip(texts, boxes):
+                region.left = region.left + x
+                region.top = region.top + y
+            return WordBoxes.concatenate(texts)
+        return "\n".join(text.strip() for text in texts if text.strip()) + "\n"
+
+    def _run_ocr(self, preprocessed_image, words=False, config=None, deadline=None):
+        """
+        Run OCR on a preprocessed image, raising on failure.
+
+        Parameters:
+        - preprocessed_image (np.ndarray): Preprocessed image.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deadline (Deadline): Deadline tesseract is stopped at; DeadlineExceeded is raised once it has passed.
+
+        Returns:
+        - str or WordBoxes: Extracted text from the image, or its words.
+        """
+        try:
+            if self.engine is not None:
+                # Hand the array to a warm worker process
+                return self.engine.extract_text(preprocessed_image, words=words, config=config,
+                                                expires=deadline.expires if deadline is not None else None)
+
+            config = config or self.config
+            # pytesseract kills the tesseract subprocess once the time left is used up
+            timeout = deadline.timeout() if deadline is not None else 0
+            if words:
+                # One tesseract pass yields words, boxes, layout ids and confidences as TSV
+                return WordBoxes.from_tsv(pytesseract.image_to_data(preprocessed_image, lang=config.lang,
+                                                                    config=config.tesseract_args(), timeout=timeout))
+
+            # Use pytesseract to extract text
+            return pytesseract.image_to_string(preprocessed_image, lang=config.lang, config=config.tesseract_args(),
+                                               timeout=timeout)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            # Time-outs caused by the deadline are reported as such, not as OCR failures
+            if deadline is not None:
+                deadline.check('OCR finished', margin=_DEADLINE_MARGIN)
+            raise
+
+    def _run_ocr_many(self, preprocessed_images, words=False, config=None, deadline=None):
+        """
+        Run OCR on several preprocessed images concurrently, raising on failure.
+
+        Parameters:
+        - preprocessed_images (list): Preprocessed images.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Overrides the default OCR configuration.
+        - deadline (Deadline): Deadline every OCR call is stopped at.
+
+        Returns:
+        - list: Extracted text or WordBoxes of every image, in the same order.
+        """
+        expires = deadline.expires if deadline is not None else None
+        if self.engine is not None:
+            # Spread the images over the worker processes
+            futures = [self.engine.submit(image, words, config, expires) for image in preprocessed_images]
+        else:
+            # tesseract runs as a subprocess, so threads are enough to use several cores
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix='ocr-region')
+            futures = [self._executor.submit(self._run_ocr, image, words, config, deadline)
+                       for image in preprocessed_images]
+
+        try:
+            limit = self.engine.job_timeout if self.engine is not None else None
+            return [future.result(timeout=deadline.timeout(limit) if deadline is not None else limit)
+                    for future in futures]
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            if deadline is not None:
+                deadline.check('OCR finished', margin=_DEADLINE_MARGIN)
+            raise
+        finally:
+            for future in futures:
+                if self.engine is not None:
+                    self.engine.abandon(future, expires)
+                else:
+                    future.cancel()
 
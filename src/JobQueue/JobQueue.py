@@ -0,0 +1,309 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class QueueFull(Exception):
+
+    """
+    QueueFull: Raised when a job is submitted while the job queue is at capacity.
+
+    Attributes:
+        - retry_after (int): Suggested number of seconds before the client retries.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class JobStore:
+
+    """
+    JobStore: SQLite-backed record of submitted OCR jobs and their results.
+
+    Methods:
+        - create(job_id: str, filename: str) -> None:
+            Record a newly queued job.
+
+        - mark_running(job_id: str) -> None:
+            Record that a worker picked up a job.
+
+        - mark_done(job_id: str, result: dict) -> None:
+            Store the result of a finished job.
+
+        - mark_failed(job_id: str, error: str) -> None:
+            Store the error of a failed job.
+
+        - get(job_id: str) -> dict:
+            Return a job record, or None if it is unknown.
+
+        - delete(job_id: str) -> None:
+            Remove a job record.
+
+        - fail_incomplete(error: str) -> int:
+            Fail jobs left queued or running by a previous server process.
+
+        - fail_owned(pid: int, error: str) -> int:
+            Fail jobs left queued or running by a process that exited.
+
+        - purge(older_than: float) -> int:
+            Delete finished jobs older than a number of seconds.
+    """
+
+    def __init__(self, database_path):
+        """
+        Initialize the store, creating the database if needed.
+
+        Parameters:
+        - database_path (str): Path of the SQLite database file.
+        """
+        self.database_path = database_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(database_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT, owner INTEGER)"
+            )
+            # Databases from before jobs recorded the process that queued them
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(jobs)")]
+            if 'owner' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+
+    def create(self, job_id, filename):
+        """Record a newly queued job, owned by the process that holds its payload."""
+        with self._connection() as connection:
+            connection.execute("INSERT INTO jobs (id, status, filename, created, owner) VALUES (?, 'queued', ?, ?, ?)",
+                               (job_id, filename, time.time(), os.getpid()))
+
+    def mark_running(self, job_id):
+        """Record that a worker picked up a job."""
+        with self._connection() as connection:
+            connection.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), job_id))
+
+    def mark_done(self, job_id, result):
+        """Store the result of a finished job."""
+        with self._connection() as connection:
+            connection.execute("UPDATE jobs SET status = 'done', finished = ?, result = ? WHERE id = ?",
+                               (time.time(), json.dumps(result), job_id))
+
+    def mark_failed(self, job_id, error):
+        """Store the error of a failed job."""
+        with self._connection() as connection:
+            connection.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                               (time.time(), error, job_id))
+
+    def get(self, job_id):
+        """
+        Return a job record.
+
+        Parameters:
+        - job_id (str): Job identifier.
+
+        Returns:
+        - dict: Job fields, with the result decoded, or None if the job is unknown.
+        """
+        row = self._connection().execute(
+            "SELECT id, status, filename, created, started, finished, result, error FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        keys = ("job_id", "status", "filename", "created", "started", "finished", "result", "error")
+        job = dict(zip(keys, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def delete(self, job_id):
+        """Remove a job record."""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail_incomplete(self, error):
+        """Fail jobs left queued or running by a previous server process; their payloads are gone."""
+        with self._connection() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE status IN ('queued', 'running')",
+                (time.time(), error)
+            ).rowcount
+
+    def fail_owned(self, pid, error):
+        """
+        Fail jobs left queued or running by a process that exited, for example a prefork worker.
+
+        Parameters:
+        - pid (int): Process id of the exited process.
+        - error (str): Error stored with the failed jobs.
+
+        Returns:
+        - int: Number of failed jobs.
+        """
+        with self._connection() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = ? "
+                "WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), error, pid)
+            ).rowcount
+
+    def purge(self, older_than):
+        """Delete finished jobs older than a number of seconds."""
+        with self._connection() as connection:
+            return connection.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+                                      (time.time() - older_than,)).rowcount
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+
+class JobQueue:
+
+    """
+    JobQueue: Bounded in-process queue that runs OCR jobs on background threads.
+
+    Submitting never blocks: when the queue is at capacity QueueFull is raised, carrying a
+    Retry-After estimate derived from the recent job duration.
+
+    Methods:
+        - submit(payload: object, filename: str) -> str:
+            Queue a payload for the handler and return its job id.
+
+        - get(job_id: str) -> dict:
+            Return the stored state of a job.
+
+        - depth() -> int:
+            Number of jobs waiting in the queue.
+
+        - estimated_wait() -> float:
+            Seconds a newly submitted job is expected to wait for a worker.
+
+    Example Usage:
+        jobs = JobQueue(handler=run_ocr, store=JobStore('tmp_post/jobs.sqlite3'), max_queued=64, workers=2)
+        job_id = jobs.submit(upload, upload.filename)
+        job = jobs.get(job_id)
+    """
+
+    def __init__(self, handler, store, max_queued=64, workers=2, result_ttl=24 * 60 * 60):
+        """
+        Initialize the queue. Worker threads are started on first submit.
+
+        Parameters:
+        - handler (callable): Function called with a payload, returning a JSON-serializable result.
+        - store (JobStore): Store that records job state.
+        - max_queued (int): Maximum number of jobs waiting for a worker.
+        - workers (int): Number of worker threads.
+        - result_ttl (float): Seconds finished jobs are kept in the store.
+        """
+        self.handler = handler
+        self.store = store
+        self.max_queued = max_queued
+        self.workers = workers
+        self.result_ttl = result_ttl
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._threads_pid = None
+        self._average_duration = 1.0
+        self._last_purge = 0.0
+
+        self.store.fail_incomplete("Server restarted before the job finished")
+
+    def submit(self, payload, filename=None):
+        """
+        Queue a payload for the handler.
+
+        Parameters:
+        - payload (object): Payload passed to the handler.
+        - filename (str): Name recorded with the job.
+
+        Returns:
+        - str: Job identifier.
+        """
+        self._ensure_workers()
+        self._purge_expired()
+
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, filename)
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except queue.Full:
+            self.store.delete(job_id)
+            raise QueueFull(self.retry_after())
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return the stored state of a job.
+
+        Parameters:
+        - job_id (str): Job identifier.
+
+        Returns:
+        - dict: Job fields, or None if the job is unknown.
+        """
+        return self.store.get(job_id)
+
+    def depth(self):
+        """Number of jobs waiting in the queue."""
+        return self._queue.qsize()
+
+    def estimated_wait(self):
+        """Seconds a newly submitted job is expected to wait for a worker."""
+        return self._average_duration * self.depth() / self.workers
+
+    def retry_after(self):
+        """Estimate in whole seconds until a queue slot frees up."""
+        return max(1, int(round(self.estimated_wait())))
+
+    def _ensure_workers(self):
+        """Start the worker threads in this process if they are not running yet."""
+        with self._lock:
+            if self._threads_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ocr-job-{index}", daemon=True)
+                thread.start()
+            self._threads_pid = os.getpid()
+
+    def _purge_expired(self):
+        """Delete expired job records, at most once a minute."""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self.store.purge(self.result_ttl)
+
+    def _work(self):
+        """Worker thread loop: run queued jobs and record their outcome."""
+        while True:
+            job_id, payload = self._queue.get()
+            started = time.time()
+            try:
+                self.store.mark_running(job_id)
+                result = self.handler(payload)
+                self.store.mark_done(job_id, result)
+            except Exception as e:
+                self.store.mark_failed(job_id, str(e))
+            finally:
+                duration = time.time() - started
+                self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+                self._queue.task_done()
@@ -0,0 +1,77 @@
+import importlib
+import threading
+import time
+import types
+
+
+class LazyModule(types.ModuleType):
+
+    """
+    LazyModule: Stand-in for a module that is only imported on first attribute access.
+
+    Heavy libraries such as cv2, numpy, pytesseract and PIL are declared with LazyModule at
+    the top of a file, so importing the file stays cheap and processes that never use them,
+    such as OCR worker processes or command line tools, never pay for them. After the first
+    access the module's attributes are copied onto the stand-in, so later lookups are as fast
+    as with a regular import.
+
+    Methods:
+        - loaded() -> dict:
+            Seconds spent importing each lazy module that has been loaded so far.
+
+    Example Usage:
+        cv2 = LazyModule('cv2')
+        image = cv2.imread('scan.png')  # cv2 is imported here
+    """
+
+    _load_seconds = {}
+    _load_lock = threading.RLock()
+
+    def __init__(self, name):
+        """
+        Initialize the stand-in without importing anything.
+
+        Parameters:
+        - name (str): Absolute name of the module, for example 'PIL.Image'.
+        """
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def __getattr__(self, attribute):
+        # Only called for attributes not copied over yet, so this runs until the module is loaded
+        if self.__dict__['_lazy_module'] is None:
+            self._load()
+        return getattr(self.__dict__['_lazy_module'], attribute)
+
+    def __dir__(self):
+        if self.__dict__['_lazy_module'] is None:
+            self._load()
+        return dir(self.__dict__['_lazy_module'])
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+    @classmethod
+    def loaded(cls):
+        """
+        Seconds spent importing each lazy module that has been loaded so far.
+
+        Returns:
+        - dict: Module name to import time in seconds, in load order.
+        """
+        with cls._load_lock:
+            return dict(cls._load_seconds)
+
+    def _load(self):
+        """Import the real module and copy its attributes onto the stand-in."""
+        with LazyModule._load_lock:
+            if self.__dict__['_lazy_module'] is not None:
+                return
+
+            started = time.perf_counter()
+            module = importlib.import_module(self.__name__)
+            LazyModule._load_seconds.setdefault(self.__name__, time.perf_counter() - started)
+
+            self.__dict__.update(module.__dict__)
+            self.__dict__['_lazy_module'] = module
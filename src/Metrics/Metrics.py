@@ -0,0 +1,210 @@
+import multiprocessing
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+
+    """
+    _Metric: Base class for metrics stored in shared memory.
+
+    Values live in a multiprocessing.RawArray guarded by a multiprocessing.Lock, so they are
+    consistent across threads and across worker processes forked after the metric was created.
+    Every metric has at most one label, whose possible values are declared up front.
+    """
+
+    kind = None
+    slots_per_series = 1
+
+    def __init__(self, name, documentation, label=None, values=()):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.values = tuple(values) if label else ('',)
+        self._index = {value: position for position, value in enumerate(self.values)}
+        self._data = multiprocessing.RawArray('d', len(self.values) * self.slots_per_series)
+        self._lock = multiprocessing.Lock()
+
+    def _offset(self, label_value):
+        """Return the first slot of a label value's series."""
+        try:
+            return self._index[label_value if self.label else ''] * self.slots_per_series
+        except KeyError:
+            raise ValueError(f"Unknown value for label {self.label} of {self.name}: {label_value}")
+
+    def _labels(self, label_value, extra=None):
+        """Render the label set of a sample."""
+        pairs = []
+        if self.label:
+            pairs.append(f'{self.label}="{label_value}"')
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        """Render the metric in Prometheus text format."""
+        with self._lock:
+            data = list(self._data)
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for position, label_value in enumerate(self.values):
+            offset = position * self.slots_per_series
+            lines.extend(self._render_series(label_value, data[offset:offset + self.slots_per_series]))
+        return lines
+
+
+class Counter(_Metric):
+
+    """
+    Counter: Monotonically increasing count shared across threads and forked processes.
+
+    Methods:
+        - inc(amount: float = 1, label_value: str = None) -> None:
+            Increase the counter.
+
+        - value(label_value: str = None) -> float:
+            Current value of the counter.
+    """
+
+    kind = 'counter'
+
+    def inc(self, amount=1, label_value=None):
+        """Increase the counter."""
+        offset = self._offset(label_value)
+        with self._lock:
+            self._data[offset] += amount
+
+    def value(self, label_value=None):
+        """Current value of the counter."""
+        offset = self._offset(label_value)
+        with self._lock:
+            return self._data[offset]
+
+    def _render_series(self, label_value, data):
+        return [f"{self.name}{self._labels(label_value)} {_format_value(data[0])}"]
+
+
+class Histogram(_Metric):
+
+    """
+    Histogram: Distribution of observed values over fixed buckets, shared across threads and forked processes.
+
+    Methods:
+        - observe(value: float, label_value: str = None) -> None:
+            Record an observation.
+
+        - time(label_value: str = None) -> context manager:
+            Observe the seconds spent inside a with block.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, label=None, values=()):
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket, one for +Inf, then sum and count
+        self.slots_per_series = len(self.buckets) + 3
+        super().__init__(name, documentation, label, values)
+
+    def observe(self, value, label_value=None):
+        """Record an observation."""
+        offset = self._offset(label_value)
+        bucket = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                bucket = position
+                break
+
+        with self._lock:
+            self._data[offset + bucket] += 1
+            self._data[offset + len(self.buckets) + 1] += value
+            self._data[offset + len(self.buckets) + 2] += 1
+
+    @contextmanager
+    def time(self, label_value=None):
+        """Observe the seconds spent inside a with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, label_value)
+
+    def _render_series(self, label_value, data):
+        lines = []
+        cumulative = 0
+        for position, bound in enumerate(self.buckets + (float('inf'),)):
+            cumulative += data[position]
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{self._labels(label_value, le)} {_format_value(cumulative)}")
+        lines.append(f"{self.name}_sum{self._labels(label_value)} {_format_value(data[-2])}")
+        lines.append(f"{self.name}_count{self._labels(label_value)} {_format_value(data[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+
+    """
+    MetricsRegistry: Collection of counters and histograms rendered in Prometheus text format.
+
+    Metrics are backed by shared memory. Create them before worker processes are forked, and
+    every worker updates the same values, so a scrape of any worker reports the whole server.
+
+    Methods:
+        - counter(name: str, documentation: str, label: str = None, values: tuple = ()) -> Counter:
+            Register a counter.
+
+        - histogram(name: str, documentation: str, buckets: tuple, label: str = None, values: tuple = ()) -> Histogram:
+            Register a histogram.
+
+        - get(name: str) -> _Metric:
+            Return a registered metric, or None.
+
+        - render() -> str:
+            Render all metrics in Prometheus text format.
+
+    Example Usage:
+        metrics = MetricsRegistry()
+        stage_seconds = metrics.histogram('ocr_stage_seconds', 'Stage latency', LATENCY_BUCKETS,
+                                          label='stage', values=('decode', 'ocr'))
+        with stage_seconds.time('decode'):
+            image = decode(data)
+        body = metrics.render()
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, documentation, label=None, values=()):
+        """Register a counter."""
+        return self._register(Counter(name, documentation, label, values))
+
+    def histogram(self, name, documentation, buckets, label=None, values=()):
+        """Register a histogram."""
+        return self._register(Histogram(name, documentation, buckets, label, values))
+
+    def get(self, name):
+        """Return a registered metric, or None."""
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render all metrics in Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.LazyModule.LazyModule import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+class NearDuplicateIndex:
+
+    """
+    NearDuplicateIndex: SQLite-backed index of perceptual image hashes for near-duplicate lookup.
+
+    Images are fingerprinted with a difference hash (dHash) of the preprocessed page. To find
+    fingerprints within max_distance bits, every fingerprint is split into at least
+    max_distance + 1 chunks that are indexed separately: by the pigeonhole principle a match within the
+    distance agrees exactly on at least one chunk. Chunks take every chunk_count-th bit rather than
+    a contiguous run, because contiguous dHash bits are whole image rows, and the blank margins
+    that most pages share would put nearly every entry in the same buckets. A lookup reads at
+    most max_candidates of the most recent entries from each bucket, so it stays bounded however
+    crowded a bucket gets. The index is shared by all worker processes and survives restarts.
+
+    Methods:
+        - fingerprint(image: np.ndarray) -> int:
+            Compute the difference hash of a grayscale image.
+
+        - find(fingerprint: int, settings: dict) -> tuple:
+            Return the closest indexed entry within the distance threshold, or None.
+
+        - add(fingerprint: int, settings: dict, cache_key: str) -> None:
+            Index the fingerprint of an image whose OCR result is cached under cache_key.
+
+        - remove(cache_key: str) -> None:
+            Remove the entries pointing at a cache key, for example after it was evicted.
+
+    Private Methods:
+        - _chunks(fingerprint: int) -> list:
+            Split a fingerprint into its indexed chunks.
+
+        - _ensure_layout() -> None:
+            Rebuild the chunk index if it was created with another hash size or distance.
+
+    Example Usage:
+        index = NearDuplicateIndex('tmp_post/near_duplicates.sqlite3', hash_size=16, max_distance=10)
+        fingerprint = index.fingerprint(preprocessed_image)
+        match = index.find(fingerprint, settings)
+        if match is None:
+            index.add(fingerprint, settings, cache_key)
+    """
+
+    def __init__(self, database_path, hash_size=16, max_distance=10, max_candidates=256):
+        """
+        Initialize the index, creating the database if needed.
+
+        Parameters:
+        - database_path (str): Path of the SQLite database file.
+        - hash_size (int): Side of the dHash grid; fingerprints have hash_size * hash_size bits.
+        - max_distance (int): Largest Hamming distance between fingerprints treated as the same image.
+        - max_candidates (int): Most recent entries read from each chunk bucket per lookup, bounding crowded buckets.
+        """
+        self.database_path = database_path
+        self.hash_size = hash_size
+        self.bits = hash_size * hash_size
+        self.max_distance = max_distance
+        self.max_candidates = max_candidates
+        if not 0 <= max_distance < self.bits:
+            raise ValueError(f"max_distance must be between 0 and {self.bits - 1}")
+
+        # Chunk i holds bits i, i + chunk_count, i + 2 * chunk_count, ...; max_distance + 1 chunks guarantee a
+        # shared chunk for any match, and every chunk must fit in an SQLite integer
+        self.chunk_count = max(max_distance + 1, -(-self.bits // 62))
+        self._positions = [range(index, self.bits, self.chunk_count) for index in range(self.chunk_count)]
+        self._local = threading.local()
+
+        directory = os.path.dirname(database_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "id INTEGER PRIMARY KEY, settings TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "cache_key TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS fingerprints_cache_key ON fingerprints (cache_key)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprint_chunks ("
+                "position INTEGER NOT NULL, value INTEGER NOT NULL, fingerprint_id INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS fingerprint_chunks_lookup "
+                               "ON fingerprint_chunks (position, value, fingerprint_id)")
+            connection.execute("CREATE TABLE IF NOT EXISTS index_layout (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._ensure_layout()
+
+    def fingerprint(self, image):
+        """
+        Compute the difference hash of a grayscale image.
+
+        The image is shrunk to (hash_size + 1) x hash_size and every bit records whether a
+        pixel is brighter than its right-hand neighbour, which survives rescaling, recompression
+        and small changes in exposure.
+
+        Parameters:
+        - image (np.ndarray): Grayscale image, such as the output of the preprocessing pipeline.
+
+        Returns:
+        - int: Fingerprint of hash_size * hash_size bits.
+        """
+        small = cv2.resize(image, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        bits = np.packbits(small[:, 1:] > small[:, :-1])
+        return int.from_bytes(bits.tobytes(), 'big')
+
+    def find(self, fingerprint, settings):
+        """
+        Return the closest indexed entry within the distance threshold.
+
+        Parameters:
+        - fingerprint (int): Fingerprint from fingerprint().
+        - settings (dict): OCR settings the result must have been produced with.
+
+        Returns:
+        - tuple: (cache key, Hamming distance) of the closest entry, or None if there is none.
+        """
+        # Each bucket is read newest first through the (position, value, fingerprint_id) index, up to its limit
+        chunks = self._chunks(fingerprint)
+        buckets = " UNION ".join(
+            "SELECT fingerprint_id FROM (SELECT fingerprint_id FROM fingerprint_chunks WHERE position = ? AND value = ? "
+            "ORDER BY fingerprint_id DESC LIMIT ?)" for _ in chunks)
+        parameters = [value for position, chunk in enumerate(chunks) for value in (position, chunk, self.max_candidates)]
+        rows = self._connection().execute(
+            f"SELECT fingerprint, cache_key FROM fingerprints WHERE id IN ({buckets}) AND settings = ?",
+            parameters + [self._settings_key(settings)]
+        ).fetchall()
+
+        best = None
+        for candidate, cache_key in rows:
+            distance = bin(int(candidate, 16) ^ fingerprint).count('1')
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (cache_key, distance)
+        return best
+
+    def add(self, fingerprint, settings, cache_key):
+        """Index the fingerprint of an image whose OCR result is cached under cache_key."""
+        with self._connection() as connection:
+            fingerprint_id = connection.execute(
+                "INSERT INTO fingerprints (settings, fingerprint, cache_key, created) VALUES (?, ?, ?, ?)",
+                (self._settings_key(settings), format(fingerprint, 'x'), cache_key, time.time())
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO fingerprint_chunks (position, value, fingerprint_id) VALUES (?, ?, ?)",
+                [(position, value, fingerprint_id) for position, value in enumerate(self._chunks(fingerprint))]
+            )
+
+    def remove(self, cache_key):
+        """Remove the entries pointing at a cache key, for example after it was evicted."""
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM fingerprint_chunks WHERE fingerprint_id IN (SELECT id FROM fingerprints WHERE cache_key = ?)",
+                (cache_key,)
+            )
+            connection.execute("DELETE FROM fingerprints WHERE cache_key = ?", (cache_key,))
+
+    def _chunks(self, fingerprint):
+        """Split a fingerprint into its indexed chunks of strided bits."""
+        chunks = []
+        for positions in self._positions:
+            value = 0
+            for position in positions:
+                value = (value << 1) | ((fingerprint >> position) & 1)
+            chunks.append(value)
+        return chunks
+
+    @staticmethod
+    def _settings_key(settings):
+        return json.dumps(settings or {}, sort_keys=True)
+
+    def _ensure_layout(self):
+        """Rebuild the chunk index if it was created with another hash size or distance."""
+        layout = json.dumps({"hash_size": self.hash_size, "chunks": self.chunk_count, "spread": "stride"})
+        with self._connection() as connection:
+            row = connection.execute("SELECT value FROM index_layout WHERE key = 'chunks'").fetchone()
+            if row is not None and row[0] == layout:
+                return
+
+            connection.execute("DELETE FROM fingerprint_chunks")
+            if row is not None and json.loads(row[0])["hash_size"] != self.hash_size:
+                # Fingerprints of another hash size cannot be compared with the new ones
+                connection.execute("DELETE FROM fingerprints")
+            rows = connection.execute("SELECT id, fingerprint FROM fingerprints").fetchall()
+            connection.executemany(
+                "INSERT INTO fingerprint_chunks (position, value, fingerprint_id) VALUES (?, ?, ?)",
+                [(position, value, fingerprint_id) for fingerprint_id, fingerprint in rows
+                 for position, value in enumerate(self._chunks(int(fingerprint, 16)))]
+            )
+            connection.execute("INSERT OR REPLACE INTO index_layout (key, value) VALUES ('chunks', ?)", (layout,))
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class OCRCache:
+
+    """
+    OCRCache: Two-tier cache for OCR results keyed by upload content hash and OCR settings.
+
+    The first tier is a bounded in-memory LRU; the second tier is a directory of small JSON
+    files that survives server restarts. Entries found on disk are promoted back into memory.
+
+    Methods:
+        - make_key(content_hash: str, settings: dict) -> str:
+            Build a cache key from a content hash and the OCR settings used.
+
+        - get(key: str) -> object:
+            Return the cached result for a key, or None on a miss.
+
+        - put(key: str, value: object) -> None:
+            Store a JSON-serializable result under a key in both tiers.
+
+        - stats() -> dict:
+            Return hit, miss and eviction counters together with current sizes.
+
+    Example Usage:
+        cache = OCRCache(max_entries=1024, cache_directory='tmp_post/ocr_cache')
+        key = cache.make_key(content_hash, {'lang': 'eng'})
+        text = cache.get(key)
+        if text is None:
+            cache.put(key, extracted_text)
+    """
+
+    def __init__(self, max_entries=1024, cache_directory=None, max_disk_bytes=256 * 1024 * 1024, metrics=None):
+        """
+        Initialize the cache.
+
+        Parameters:
+        - max_entries (int): Maximum number of results held in memory.
+        - cache_directory (str): Directory for the on-disk tier, or None to disable it.
+        - max_disk_bytes (int): Size limit of the on-disk tier in bytes.
+        - metrics (MetricsRegistry): Registry that also receives the cache counters, shared across processes.
+        """
+        self.max_entries = max_entries
+        self.cache_directory = cache_directory
+        self.max_disk_bytes = max_disk_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._events = None
+        if metrics is not None:
+            self._events = metrics.counter('ocr_cache_events_total', 'OCR result cache hits, misses and evictions.',
+                                           label='event', values=tuple(self._counters))
+
+        # Size of the disk tier, measured on first need rather than at startup
+        self._disk_bytes = None
+        if self.cache_directory and not os.path.exists(self.cache_directory):
+            os.makedirs(self.cache_directory)
+
+    @staticmethod
+    def make_key(content_hash, settings=None):
+        """
+        Build a cache key from a content hash and the OCR settings used.
+
+        Parameters:
+        - content_hash (str): Hex digest of the uploaded image bytes.
+        - settings (dict): OCR settings that influence the result.
+
+        Returns:
+        - str: Cache key.
+        """
+        encoded_settings = json.dumps(settings or {}, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}:{encoded_settings}".encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached result for a key.
+
+        Parameters:
+        - key (str): Cache key from make_key.
+
+        Returns:
+        - object: Cached result, or None if the key is not cached.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._count("memory_hits")
+                return self._entries[key]
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self._count("misses")
+                return None
+
+            self._count("disk_hits")
+            self._store_memory(key, value)
+            return value
+
+    def put(self, key, value):
+        """
+        Store a result under a key in both tiers.
+
+        Parameters:
+        - key (str): Cache key from make_key.
+        - value (object): JSON-serializable result.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            self._store_memory(key, value)
+
+        self._write_disk(key, value)
+
+    def stats(self):
+        """
+        Return hit, miss and eviction counters together with current sizes.
+
+        Returns:
+        - dict: Cache counters.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            if self._events is not None:
+                # The shared counters include the other worker processes
+                stats.update({counter: int(self._events.value(counter)) for counter in self._counters})
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["evictions"] = stats["memory_evictions"] + stats["disk_evictions"]
+            stats["memory_entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["disk_bytes"] = self._disk_usage()
+            stats["max_disk_bytes"] = self.max_disk_bytes if self.cache_directory else 0
+            return stats
+
+    def _count(self, counter, amount=1):
+        """Increase a counter and its shared metric; the caller must hold the lock."""
+        self._counters[counter] += amount
+        if self._events is not None and amount:
+            self._events.inc(amount, counter)
+
+    def _store_memory(self, key, value):
+        """Insert a value into the LRU tier; the caller must hold the lock."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._count("memory_evictions")
+
+    def _disk_path(self, key):
+        """Return the on-disk path of a key, sharded by its first two characters."""
+        return os.path.join(self.cache_directory, key[:2], f"{key}.json")
+
+    def _disk_usage(self):
+        """Return the size of the disk tier in bytes, walking it once on first use; the caller must hold the lock."""
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(os.path.getsize(path) for path in self._iter_disk_files()) if self.cache_directory else 0
+        return self._disk_bytes
+
+    def _iter_disk_files(self):
+        """Yield the paths of all files in the on-disk tier."""
+        for root, _, files in os.walk(self.cache_directory):
+            for name in files:
+                if name.endswith('.json'):
+                    yield os.path.join(root, name)
+
+    def _read_disk(self, key):
+        """Read a value from the on-disk tier, or return None if it is missing."""
+        if not self.cache_directory:
+            return None
+
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as cache_file:
+                return json.load(cache_file)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, value):
+        """Write a value to the on-disk tier and enforce the size limit."""
+        if not self.cache_directory:
+            return
+
+        # Measure the tier before this write lands, so the new file is counted once, through the delta below
+        with self._lock:
+            self._disk_usage()
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump({"value": value}, cache_file)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error writing OCR cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._disk_bytes = self._disk_usage() + size - previous_size
+            over_limit = self._disk_bytes > self.max_disk_bytes
+
+        if over_limit:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Remove the least recently written files until the disk tier is under 90% of its limit."""
+        files = []
+        for path in self._iter_disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        target = int(self.max_disk_bytes * 0.9)
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self._count("disk_evictions", evicted)
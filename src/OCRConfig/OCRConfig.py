@@ -0,0 +1,181 @@
+import re
+import shlex
+import threading
+
+from src.LazyModule.LazyModule import LazyModule
+
+pytesseract = LazyModule('pytesseract')
+
+# Page segmentation modes that produce text; 0 only detects orientation and 2 is not implemented
+PSM_VALUES = (1,) + tuple(range(3, 14))
+OEM_VALUES = (0, 1, 2, 3)
+MAX_WHITELIST_LENGTH = 256
+
+_LANGUAGE_PATTERN = re.compile(r'^[A-Za-z0-9_]+(\+[A-Za-z0-9_]+)*$')
+
+
+class OCRConfig:
+
+    """
+    OCRConfig: Tesseract settings of a request, used to pick the worker pool that serves it.
+
+    A configuration is the language (one or several joined by '+'), the page segmentation
+    mode, the engine mode and an optional character whitelist. Configurations are hashable
+    and treated as immutable, so the OCR engine keys its warm worker pools on them.
+
+    Methods:
+        - from_request(lang: str = None, psm: str = None, oem: str = None, whitelist: str = None, default: OCRConfig = None) -> OCRConfig:
+            Build a validated configuration from request fields.
+
+        - installed_languages() -> set:
+            Languages with traineddata installed, read once from tesseract.
+
+        - tesseract_args() -> str:
+            Command line options for pytesseract.
+
+        - settings() -> dict:
+            Settings that influence the extracted text, for cache keys.
+
+    Example Usage:
+        config = OCRConfig.from_request(lang='deu+eng', psm='6')
+        text = pytesseract.image_to_string(image, lang=config.lang, config=config.tesseract_args())
+    """
+
+    __slots__ = ('lang', 'psm', 'oem', 'whitelist')
+
+    _installed_languages = None
+    _installed_lock = threading.Lock()
+
+    def __init__(self, lang='eng', psm=None, oem=None, whitelist=None):
+        """
+        Initialize a configuration without validating it.
+
+        Parameters:
+        - lang (str): Tesseract language, several joined by '+'.
+        - psm (int): Page segmentation mode, or None for tesseract's default.
+        - oem (int): OCR engine mode, or None for tesseract's default.
+        - whitelist (str): Only characters recognized, or None for all.
+        """
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.whitelist = whitelist or None
+
+    @property
+    def key(self):
+        """Tuple identifying the configuration."""
+        return self.lang, self.psm, self.oem, self.whitelist
+
+    def __eq__(self, other):
+        return isinstance(other, OCRConfig) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"OCRConfig(lang={self.lang!r}, psm={self.psm!r}, oem={self.oem!r}, whitelist={self.whitelist!r})"
+
+    @classmethod
+    def from_request(cls, lang=None, psm=None, oem=None, whitelist=None, default=None):
+        """
+        Build a validated configuration from request fields, raising ValueError for invalid ones.
+
+        Parameters:
+        - lang (str): Languages joined by '+'; each must be installed.
+        - psm (str): Page segmentation mode.
+        - oem (str): OCR engine mode.
+        - whitelist (str): Characters to recognize; whitespace and control characters are refused.
+        - default (OCRConfig): Configuration whose values are used for missing fields.
+
+        Returns:
+        - OCRConfig: The requested configuration.
+        """
+        default = default or cls()
+
+        if lang:
+            lang = lang.strip()
+            if not _LANGUAGE_PATTERN.match(lang):
+                raise ValueError(f"Invalid value for lang: {lang}")
+            missing = [name for name in lang.split('+') if name not in cls.installed_languages()]
+            if missing:
+                raise ValueError(f"Language not installed: {', '.join(missing)}")
+        else:
+            lang = default.lang
+
+        psm = cls._parse_mode('psm', psm, PSM_VALUES, default.psm)
+        oem = cls._parse_mode('oem', oem, OEM_VALUES, default.oem)
+
+        if whitelist:
+            if len(whitelist) > MAX_WHITELIST_LENGTH:
+                raise ValueError(f"whitelist is longer than {MAX_WHITELIST_LENGTH} characters")
+            if any(character.isspace() or not character.isprintable() for character in whitelist):
+                raise ValueError("whitelist must not contain whitespace or control characters")
+            # The order and repetition of characters make no difference to tesseract
+            whitelist = "".join(sorted(set(whitelist)))
+        else:
+            whitelist = default.whitelist
+
+        return cls(lang, psm, oem, whitelist)
+
+    @staticmethod
+    def _parse_mode(name, value, allowed, default):
+        """Parse an integer mode field, raising ValueError for anything outside the allowed values."""
+        if value is None or not str(value).strip():
+            return default
+        try:
+            mode = int(str(value).strip())
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value}") from None
+        if mode not in allowed:
+            raise ValueError(f"Invalid value for {name}: {value}")
+        return mode
+
+    @classmethod
+    def installed_languages(cls):
+        """
+        Languages with traineddata installed, read once from tesseract.
+
+        Returns:
+        - set: Installed language codes.
+        """
+        with cls._installed_lock:
+            if cls._installed_languages is None:
+                try:
+                    cls._installed_languages = frozenset(pytesseract.get_languages(config=''))
+                except Exception as e:
+                    # Not remembered, so the next request tries again
+                    print(f"Error listing installed tesseract languages: {e}")
+                    return frozenset()
+            return cls._installed_languages
+
+    def tesseract_args(self):
+        """
+        Command line options for pytesseract.
+
+        Returns:
+        - str: Options such as '--psm 6 --oem 1 -c tessedit_char_whitelist=0123456789'.
+        """
+        args = []
+        if self.psm is not None:
+            args.append(f"--psm {self.psm}")
+        if self.oem is not None:
+            args.append(f"--oem {self.oem}")
+        if self.whitelist:
+            args.append(f"-c {shlex.quote('tessedit_char_whitelist=' + self.whitelist)}")
+        return " ".join(args)
+
+    def settings(self):
+        """
+        Settings that influence the extracted text, for cache keys.
+
+        Returns:
+        - dict: The language, plus every mode and the whitelist that differ from tesseract's defaults.
+        """
+        settings = {"lang": self.lang}
+        if self.psm is not None:
+            settings["psm"] = self.psm
+        if self.oem is not None:
+            settings["oem"] = self.oem
+        if self.whitelist:
+            settings["whitelist"] = self.whitelist
+        return settings
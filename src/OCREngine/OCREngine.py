@@ -0,0 +1,421 @@
+import importlib.util
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from src.LazyModule.LazyModule import LazyModule
+from src.OCRConfig.OCRConfig import OCRConfig
+from src.WordBoxes.WordBoxes import WordBoxes
+
+pytesseract = LazyModule('pytesseract')
+
+# Per-worker state, populated once by _init_worker in every pool process
+_worker_apis = {}
+_worker_tesserocr = False
+_worker_slots = None
+_worker_slot = None
+
+
+def tesserocr_available():
+    """Return True if tesserocr, which keeps the model resident in the worker processes, is installed."""
+    return importlib.util.find_spec('tesserocr') is not None
+
+
+def _init_worker(config, slots):
+    """Load the traineddata of a configuration once per worker process and claim a slot in the pool's table."""
+    global _worker_slots, _worker_slot, _worker_tesserocr
+
+    # tesserocr keeps the model resident in the worker between jobs; without it every job runs the tesseract binary
+    _worker_tesserocr = tesserocr_available()
+    if _worker_tesserocr:
+        _worker_apis[config] = _open_api(config)
+
+    # The slot records this worker's pid and current job, so that a hung job's worker can be killed
+    _worker_slots = slots
+    with slots.get_lock():
+        for index in range(0, len(slots), 2):
+            if not slots[index] or not _process_alive(slots[index]):
+                slots[index] = os.getpid()
+                slots[index + 1] = 0
+                _worker_slot = index
+                break
+
+
+def _process_alive(pid):
+    """Return True if a process with this pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _open_api(config):
+    """Create a tesserocr API set up for a configuration."""
+    import tesserocr
+
+    options = {"lang": config.lang}
+    if config.psm is not None:
+        options["psm"] = config.psm
+    if config.oem is not None:
+        options["oem"] = config.oem
+    api = tesserocr.PyTessBaseAPI(**options)
+    if config.whitelist:
+        api.SetVariable('tessedit_char_whitelist', config.whitelist)
+    return api
+
+
+def _ocr_job(image, config, timeout, words=False, expires=None, job_id=0):
+    """Run OCR on a preprocessed image inside a worker process, returning text or WordBoxes."""
+    if expires is not None:
+        # A job that waited in the pool past its deadline is skipped; otherwise tesseract gets only the time left
+        remaining = expires - time.time()
+        if remaining <= 0:
+            raise RuntimeError("Deadline passed before the OCR job started")
+        timeout = min(timeout, remaining) if timeout else remaining
+    if _worker_slot is not None:
+        _worker_slots[_worker_slot + 1] = job_id
+    try:
+        return _recognize(image, config, timeout, words)
+    except Exception as e:
+        # Backend exceptions are not always picklable; send back a plain error instead
+        raise RuntimeError(str(e)) from None
+    finally:
+        if _worker_slot is not None:
+            _worker_slots[_worker_slot + 1] = 0
+
+
+def _recognize(image, config, timeout, words=False):
+    """Run the worker's resident tesserocr API, or the tesseract binary without tesserocr, on a preprocessed image."""
+    if not _worker_tesserocr:
+        # pytesseract kills the tesseract subprocess once the time limit is used up
+        if words:
+            return WordBoxes.from_tsv(pytesseract.image_to_data(image, lang=config.lang,
+                                                                config=config.tesseract_args(), timeout=timeout or 0))
+        return pytesseract.image_to_string(image, lang=config.lang, config=config.tesseract_args(),
+                                           timeout=timeout or 0)
+
+    api = _worker_apis.get(config)
+    if api is None:
+        api = _worker_apis[config] = _open_api(config)
+
+    height, width = image.shape[:2]
+    bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+    api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+    if not api.Recognize(timeout=int(timeout * 1000) if timeout else 0):
+        raise RuntimeError('Tesseract process timeout')
+    if words:
+        # The TSV is parsed here, so only the compact columns travel back to the server
+        return WordBoxes.from_tsv(api.GetTSVText(0))
+    return api.GetUTF8Text()
+
+
+class OCREngine:
+
+    """
+    OCREngine: Pools of long-lived OCR worker processes, one per OCR configuration.
+
+    Every worker loads the tesserocr model once, then serves preprocessed images until it
+    is recycled, so the traineddata stays resident between jobs. tesserocr is an optional
+    dependency (the 'tesserocr' extra); without it the workers run the tesseract binary
+    through pytesseract for every job, which still keeps OCR, its time limits and hung-job
+    reclaim off the request threads. Each distinct OCRConfig (language,
+    page segmentation mode, engine mode, whitelist) gets its own warm pool, so switching
+    configuration does not reload models. At most max_pools pools are kept; beyond that the
+    least recently used idle pool is shut down. The default configuration's pool is kept.
+
+    Jobs may carry a deadline. A job still queued when its deadline passes is skipped by the
+    worker, and a running job's tesseract call is limited to the time left, so the worker is
+    free again by the deadline. A job abandoned by its caller that still runs reclaim_grace
+    seconds after it should have stopped is assumed hung: its worker is killed and the pool
+    is replaced; other jobs running on that pool fail.
+
+    Methods:
+        - submit(image: np.ndarray, words: bool = False, config: OCRConfig = None, expires: float = None) -> Future:
+            Queue a preprocessed image for OCR and return a future for its text or WordBoxes.
+
+        - extract_text(image: np.ndarray, timeout: float = None, words: bool = False, config: OCRConfig = None, expires: float = None) -> str:
+            Run OCR on a preprocessed image and wait for the result.
+
+        - abandon(future: Future, expires: float = None) -> None:
+            Cancel a job whose result is no longer wanted, reclaiming its worker if it hangs.
+
+        - warm_up(image: np.ndarray) -> None:
+            Start every worker process of the default pool and run one OCR job on each.
+
+        - pools() -> list:
+            Configurations with a running pool, least recently used first.
+
+        - shutdown(wait: bool = True) -> None:
+            Stop all worker processes.
+
+    Example Usage:
+        engine = OCREngine(workers=4, lang='eng', job_timeout=30, max_jobs_per_worker=500)
+        text = engine.extract_text(preprocessed_image)
+        digits = engine.extract_text(preprocessed_image, config=OCRConfig('eng', psm=7, whitelist='0123456789'))
+    """
+
+    def __init__(self, workers=None, lang='eng', job_timeout=60, max_jobs_per_worker=None, max_pools=4,
+                 config_workers=None, reclaim_grace=5.0):
+        """
+        Initialize the engine. Worker processes are started on first use.
+
+        Parameters:
+        - workers (int): Number of worker processes, defaults to the number of CPU cores.
+        - lang (str): Tesseract language of the default configuration.
+        - job_timeout (float): Seconds a single OCR job may run before it is abandoned.
+        - max_jobs_per_worker (int): Jobs served by a worker before it is replaced, or None to never recycle.
+        - max_pools (int): Worker pools kept at once, including the default one.
+        - config_workers (int): Worker processes of pools for other configurations, defaults to workers.
+        - reclaim_grace (float): Seconds an abandoned job may run past its time limit before its pool is terminated.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.lang = lang
+        self.config = OCRConfig(lang)
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_pools = max(1, max_pools)
+        self.config_workers = config_workers or self.workers
+        self.reclaim_grace = reclaim_grace
+
+        # Pools by configuration, least recently used first, the jobs each has in flight and the pool of every job
+        self._executors = OrderedDict()
+        self._in_flight = {}
+        self._pools = {}
+        self._slots = {}
+        self._job_ids = itertools.count(1)
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, image, words=False, config=None, expires=None):
+        """
+        Queue a preprocessed image for OCR.
+
+        Parameters:
+        - image (np.ndarray): Preprocessed image.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Configuration to recognize with, defaults to the engine's.
+        - expires (float): Deadline of the job in seconds since the epoch, or None for the job timeout alone.
+
+        Returns:
+        - Future: Future resolving to the extracted text, or to WordBoxes.
+        """
+        config = config or self.config
+        try:
+            return self._submit(image, words, config, expires)
+        except BrokenProcessPool:
+            # A worker died (for example killed by the OOM killer); the pool has been dropped, so retry once
+            return self._submit(image, words, config, expires)
+
+    def extract_text(self, image, timeout=None, words=False, config=None, expires=None):
+        """
+        Run OCR on a preprocessed image and wait for the result.
+
+        Parameters:
+        - image (np.ndarray): Preprocessed image.
+        - timeout (float): Seconds to wait, defaults to the engine's job timeout.
+        - words (bool): Return word boxes and confidences instead of plain text.
+        - config (OCRConfig): Configuration to recognize with, defaults to the engine's.
+        - expires (float): Deadline in seconds since the epoch; the wait ends there at the latest.
+
+        Returns:
+        - str or WordBoxes: Extracted text from the image, or its words.
+        """
+        timeout = timeout or self.job_timeout
+        if expires is not None:
+            timeout = min(timeout, expires - time.time())
+            if timeout <= 0:
+                raise TimeoutError("Deadline passed before the OCR job was queued")
+
+        future = self.submit(image, words, config, expires)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.abandon(future, expires)
+            raise TimeoutError(f"OCR job exceeded {timeout:g} seconds")
+
+    def abandon(self, future, expires=None):
+        """
+        Cancel a job whose result is no longer wanted.
+
+        A queued job is simply cancelled. A running job stops by itself at its time limit; if it
+        is still running reclaim_grace seconds after that, its worker is assumed hung and the
+        pool is terminated so that the next job starts a fresh one.
+
+        Parameters:
+        - future (Future): Future returned by submit.
+        - expires (float): Deadline the job was submitted with, if any.
+
+        Returns:
+        - None
+        """
+        if future.cancel() or future.done():
+            return
+
+        # The job started at the latest now, so it must have stopped within its time limit from now
+        limit = self.job_timeout
+        if expires is not None:
+            limit = max(0.0, min(limit, expires - time.time()))
+        watchdog = threading.Timer(limit + self.reclaim_grace, self._reclaim, (future,))
+        watchdog.daemon = True
+        watchdog.start()
+
+    def warm_up(self, image):
+        """
+        Start every worker process of the default pool and run one OCR job on each, so that no
+        request waits for a worker to spawn or load its model.
+
+        Parameters:
+        - image (np.ndarray): Small preprocessed image, such as a blank page.
+
+        Returns:
+        - None
+        """
+        # Jobs submitted together while no worker is idle make the pool start all of its processes
+        futures = [self.submit(image) for _ in range(self.workers)]
+        for future in futures:
+            future.result(timeout=self.job_timeout)
+
+    def pools(self):
+        """
+        Configurations with a running pool, least recently used first.
+
+        Returns:
+        - list: OCRConfig of every pool in this process.
+        """
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                return []
+            return list(self._executors)
+
+    def shutdown(self, wait=True):
+        """
+        Stop all worker processes.
+
+        Parameters:
+        - wait (bool): Wait for running jobs to finish.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            executors = list(self._executors.values()) if self._executor_pid == os.getpid() else []
+            self._executors.clear()
+            self._in_flight.clear()
+            self._pools.clear()
+            self._slots.clear()
+
+        for executor in executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _submit(self, image, words, config, expires=None):
+        """Queue a job on the pool of a configuration and count it as in flight until it finishes."""
+        executor = self._get_executor(config)
+        try:
+            job_id = next(self._job_ids)
+            future = executor.submit(_ocr_job, image, config, self.job_timeout, words, expires, job_id)
+        except BrokenProcessPool:
+            self._job_done(executor)
+            self._discard_executor(config, executor)
+            raise
+        except BaseException:
+            self._job_done(executor)
+            raise
+        with self._lock:
+            self._pools[future] = (config, executor, job_id)
+        future.add_done_callback(lambda done: self._job_done(executor, done))
+        return future
+
+    def _job_done(self, executor, future=None):
+        """Count a finished job of a pool."""
+        with self._lock:
+            self._pools.pop(future, None)
+            remaining = self._in_flight.get(executor, 0) - 1
+            if remaining > 0:
+                self._in_flight[executor] = remaining
+            else:
+                self._in_flight.pop(executor, None)
+
+    def _reclaim(self, future):
+        """Terminate the pool of an abandoned job that is still running past its time limit."""
+        with self._lock:
+            pool = self._pools.get(future)
+            slots = pool and self._slots.get(pool[1])
+        if slots is None or future.done():
+            return
+
+        config, executor, job_id = pool
+        print(f"Error: OCR job overran its time limit by {self.reclaim_grace:g} s; restarting the {config} worker pool")
+        # The worker running the job is found through the pool's slot table; losing it breaks the pool
+        with slots.get_lock():
+            pids = [slots[index] for index in range(0, len(slots), 2) if slots[index] and slots[index + 1] == job_id]
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._discard_executor(config, executor)
+
+    def _discard_executor(self, config, executor):
+        """Drop a broken worker pool so that the next job starts a fresh one."""
+        with self._lock:
+            if self._executors.get(config) is executor:
+                del self._executors[config]
+            self._slots.pop(executor, None)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self, config):
+        """Return the worker pool of a configuration, starting it on first use, and count a job in flight on it."""
+        evicted = []
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                # Pools inherited through fork belong to the parent; this process needs its own
+                self._executors.clear()
+                self._in_flight.clear()
+                self._pools.clear()
+                self._slots.clear()
+                self._executor_pid = os.getpid()
+
+            executor = self._executors.get(config)
+            if executor is not None:
+                self._executors.move_to_end(config)
+                # Counted before the job is queued, so the pool cannot be evicted in between
+                self._in_flight[executor] = self._in_flight.get(executor, 0) + 1
+                return executor
+
+            # Spawned workers avoid inheriting Flask's threads and locks from the parent. The slot table
+            # holds a (pid, job id) pair per worker, with room for workers being replaced after recycling
+            context = multiprocessing.get_context('spawn')
+            max_workers = self.workers if config == self.config else self.config_workers
+            slots = context.Array('q', 4 * max_workers)
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(config, slots),
+                max_tasks_per_child=self.max_jobs_per_worker,
+            )
+            self._executors[config] = executor
+            self._slots[executor] = slots
+            self._in_flight[executor] = 1
+
+            # Shut down the least recently used idle pools beyond the limit; busy pools are kept
+            for candidate in list(self._executors):
+                if len(self._executors) <= self.max_pools:
+                    break
+                if candidate == self.config or candidate == config or self._in_flight.get(self._executors[candidate]):
+                    continue
+                evicted.append(self._executors.pop(candidate))
+
+        for idle in evicted:
+            idle.shutdown(wait=False)
+        return executor
@@ -1,54 +1,317 @@
+import functools
 import hashlib
+import json
+import multiprocessing
 import os
+import secrets
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, Request, Response, current_app, g, request, render_template, jsonify, stream_with_context, url_for
 from flask_wtf import CSRFProtect
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from wtforms import SubmitField
 
+from src.AdmissionController.AdmissionController import AdmissionController, AdmissionRejected
+from src.ArchiveIndex.ArchiveIndex import ArchiveIndex
+from src.ArchiveWriter.ArchiveWriter import ArchiveWriter
+from src.Deadline.Deadline import Deadline, DeadlineExceeded
 from src.ImageProcessor.ImageProcessor import ImageProcessor
-from src.OCRUtility.OCRUtility import OCRUtility
+from src.JobQueue.JobQueue import JobQueue, JobStore, QueueFull
+from src.Metrics.Metrics import DEPTH_BUCKETS, LATENCY_BUCKETS, SIZE_BUCKETS, MetricsRegistry
+from src.NearDuplicateIndex.NearDuplicateIndex import NearDuplicateIndex
+from src.OCRCache.OCRCache import OCRCache
+from src.OCRConfig.OCRConfig import OCRConfig
+from src.OCREngine.OCREngine import OCREngine, tesserocr_available
+from src.OCRUtility.OCRUtility import IMAGE_FORMATS, OCRUtility, UploadBuffer, UploadSink
+from src.PageReader.PageReader import PageReader
+from src.PreforkServer.PreforkServer import PreforkServer
+from src.PreprocessPipeline.PreprocessPipeline import PreprocessPipeline
+from src.QualityLadder.QualityLadder import QualityLadder
+from src.RequestLog.RequestLog import LogRecord, RequestLog
+from src.StartupReport.StartupReport import StartupReport
+from src.WordBoxes.WordBoxes import WordBoxes
 
 
 class OCRForm(FlaskForm):
     image = FileField('Upload Image', validators=[FileRequired()])
 
 
+class OCRRequest(Request):
+
+    """Request whose uploaded files are hashed, checked and spooled by an UploadSink while the body is parsed."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        sink_factory = current_app.config.get('UPLOAD_SINK_FACTORY')
+        if sink_factory is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return sink_factory(filename)
+
+
 class OCRServer:
     image_processor = ImageProcessor()
     ocr_utility = OCRUtility()
+    page_reader = PageReader()
+
+    def __init__(self, debug=False, host='0.0.0.0', ssl_context=None, cache_size=1024, cache_directory=None,
+                 cache_max_disk_bytes=256 * 1024 * 1024, ocr_workers=None, ocr_job_timeout=60,
+                 ocr_max_jobs_per_worker=None, ocr_max_pools=4, ocr_config_workers=None, spool_threshold=8 * 1024 * 1024, batch_workers=None,
+                 batch_max_in_flight=None, batch_max_members=1000, batch_max_uncompressed_bytes=1024 * 1024 * 1024,
+                 job_max_queued=64, job_workers=None, job_result_ttl=24 * 60 * 60,
+                 preprocess_profile='default', detect_regions=False, deskew=False, quality_tiered=False,
+                 quality_min_confidence=80.0, quality_min_coverage=0.6, quality_fast_scale=0.5,
+                 quality_enhanced_profile='photo', quality_enhanced_oem=None, target_dpi=None, log_capacity=1000, log_headers=False,
+                 log_file=None, log_max_bytes=10 * 1024 * 1024, log_backup_count=5, log_page_size=50, port=5000,
+                 server_mode='development', server_workers=None, worker_concurrency=16, graceful_timeout=30,
+                 archive_directory=None, archive_window=3600, archive_max_queued=256,
+                 archive_max_queued_bytes=256 * 1024 * 1024, archive_policy='drop', archive_block_timeout=5, archive_index=True, max_upload_bytes=64 * 1024 * 1024, near_duplicates=False,
+                 near_duplicate_hash_size=16, near_duplicate_max_distance=10, default_deadline=60, max_deadline=300,
+                 min_deadline=0.05, client_max_concurrency=8, warm_up=True, startup_report=None, startup_target=None):
+        # Time spent in each part of startup, reported at /startup
+        self.startup = startup_report or StartupReport()
+        self.startup_target = startup_target
+        self.warm_up_enabled = warm_up
 
-    def __init__(self, debug=False, host='0.0.0.0', ssl_context=None):
         self.app = Flask(__name__, template_folder='templates', static_folder='static')
         self.app.config['SECRET_KEY'] = "c01803ef2a0678cdf7e75694e66e73ea"
-        csrf = CSRFProtect(self.app)
+        # Bodies above the limit are refused with 413 from their Content-Length, before they are read
+        self.app.config['MAX_CONTENT_LENGTH'] = max_upload_bytes
+        self.app.config['UPLOAD_SINK_FACTORY'] = self.upload_sink
+        self.app.request_class = OCRRequest
 
+        # Status lives in shared memory, so every prefork worker reports the same one
+        self._status = multiprocessing.Array('c', 32)
         self.status = "active"
         self.uptime_start_time = time.time()
-        self.processed_requests = 0
-        self.requests_log = []
+
+        # Metrics live in shared memory, so threads and forked workers all update the same values
+        self.metrics = MetricsRegistry()
+        self.stage_seconds = self.metrics.histogram(
+            'ocr_stage_seconds', 'Latency of each processing stage in seconds.', LATENCY_BUCKETS,
+            label='stage', values=('upload', 'decode', 'preprocess', 'ocr', 'archive'))
+        self.request_seconds = self.metrics.histogram(
+            'ocr_request_seconds', 'Latency of synchronous OCR requests in seconds.', LATENCY_BUCKETS,
+            label='endpoint', values=('process_image', 'submit_job', 'demo'))
+        self.upload_bytes = self.metrics.histogram('ocr_upload_bytes', 'Size of uploaded images in bytes.', SIZE_BUCKETS)
+        self.queue_depth = self.metrics.histogram('ocr_job_queue_depth', 'Job queue depth seen by each submission.',
+                                                  DEPTH_BUCKETS)
+        self.processed_total = self.metrics.counter('ocr_processed_requests_total', 'Images and documents processed.')
+        self.errors_total = self.metrics.counter('ocr_errors_total', 'Errors by processing stage.',
+                                                 label='stage', values=('upload', 'ocr', 'archive', 'request', 'deadline'))
+        self.rejected_total = self.metrics.counter('ocr_rejected_requests_total', 'Requests turned away by admission control.',
+                                                   label='reason', values=('client_limit', 'deadline', 'deadline_too_short',
+                                                                           'deadline_expired'))
+        # Keep a bounded window of compact log records; older ones only survive in the optional log file
+        self.requests_log = RequestLog(capacity=log_capacity, log_file=log_file, max_bytes=log_max_bytes,
+                                       backup_count=log_backup_count)
+        self.log_headers = log_headers
+        self.log_page_size = log_page_size
+
+        # Parse upload bodies before the route handlers, so rejected uploads get a clean 413 or 415. The hook is
+        # registered ahead of CSRF protection, which would otherwise read the body first and hide its upload time
+        self.app.before_request(self.receive_uploads)
+        csrf = CSRFProtect(self.app)
+        self.app.register_error_handler(RequestEntityTooLarge, self.upload_rejected)
+        self.app.register_error_handler(UnsupportedMediaType, self.upload_rejected)
 
         # Define routes
         self.app.route('/')(self.index)
-        self.app.route('/process_image', methods=['POST'])(self.process_image)
-        self.app.route('/demo', methods=['GET', 'POST'])(self.demo)
+        self.app.route('/process_image', methods=['POST'])(self._admitted(self._timed(self.process_image)))
+        self.app.route('/process_batch', methods=['POST'])(self._admitted(self.process_batch, optional_deadline=True))
+        self.app.route('/process_document', methods=['POST'])(self._admitted(self.process_document,
+                                                                             optional_deadline=True))
+        self.app.route('/jobs', methods=['POST'])(self._timed(self.submit_job))
+        self.app.route('/jobs/<job_id>')(self.job_status)
+        self.app.route('/jobs/<job_id>/result')(self.job_result)
+        self.app.route('/demo', methods=['GET', 'POST'])(self._admitted(self._timed(self.demo)))
+        self.app.route('/cache/stats')(self.cache_stats)
+        self.app.route('/metrics')(self.metrics_endpoint)
+        self.app.route('/startup')(self.startup_endpoint)
+        self.app.route('/archive')(self.archive_lookup)
+        self.app.route('/archive/<token>/ocr', methods=['POST'])(self._admitted(self.archive_reocr))
+        self.startup.mark('app')
 
         self.debug = debug
         self.host = host
+        self.port = port
         self.ssl_context = ssl_context
 
+        # 'prefork' serves from several worker processes instead of the Werkzeug development server
+        if server_mode not in ('development', 'prefork'):
+            raise ValueError(f"Unknown server mode: {server_mode}")
+        self.server_mode = server_mode
+        self.server_workers = server_workers or os.cpu_count() or 1
+        self.worker_concurrency = worker_concurrency
+        self.graceful_timeout = graceful_timeout
+
         # Create a temporary folder for uploaded photos
         self.tmp_folder = 'tmp_post'
         if not os.path.exists(self.tmp_folder):
             os.makedirs(self.tmp_folder)
 
+        # Uploads and their OCR results are archived in batches by a background writer, off the request path,
+        # and indexed by hash, token and time so that past uploads are found without opening the archives
+        archive_directory = archive_directory or self.tmp_folder
+        if archive_index:
+            self.archive_index = ArchiveIndex(os.path.join(archive_directory, 'archive_index.sqlite3'), archive_directory)
+        else:
+            self.archive_index = None
+        self.archive_writer = ArchiveWriter(archive_directory, window_seconds=archive_window,
+                                            max_queued=archive_max_queued, max_queued_bytes=archive_max_queued_bytes,
+                                            policy=archive_policy, block_timeout=archive_block_timeout, metrics=self.metrics,
+                                            stage_seconds=self.stage_seconds, index=self.archive_index)
+        self.startup.mark('archive')
+
+        # Uploads are decoded in memory; only those above the threshold are spooled to unique files
+        self.spool_threshold = spool_threshold
+        self.spool_folder = os.path.join(self.tmp_folder, 'spool')
+        self.max_upload_bytes = max_upload_bytes
+        # Formats accepted per endpoint, checked against the first bytes of every uploaded file
+        self.upload_formats = {
+            'process_batch': IMAGE_FORMATS + ('zip',),
+            'process_document': IMAGE_FORMATS + ('pdf',),
+        }
+
+        # Cache OCR results by upload content hash, in memory and under the temporary folder
+        if cache_directory is None:
+            cache_directory = os.path.join(self.tmp_folder, 'ocr_cache')
+        self.ocr_cache = OCRCache(max_entries=cache_size, cache_directory=cache_directory,
+                                  max_disk_bytes=cache_max_disk_bytes, metrics=self.metrics)
+
+        # Optionally reuse the cached result of a visually near-identical earlier upload
+        if near_duplicates:
+            self.near_duplicates = NearDuplicateIndex(os.path.join(self.tmp_folder, 'near_duplicates.sqlite3'),
+                                                      hash_size=near_duplicate_hash_size,
+                                                      max_distance=near_duplicate_max_distance)
+        else:
+            self.near_duplicates = None
+        self.startup.mark('cache')
+
+        # Run OCR on a pool of warm worker processes; zero workers keeps OCR in the request thread.
+        # Prefork workers each start their own pool, so by default they share the cores between them
+        if ocr_workers is None and server_mode == 'prefork':
+            ocr_workers = max(1, (os.cpu_count() or 1) // self.server_workers)
+        if ocr_workers != 0 and not tesserocr_available():
+            # The pool still runs, but every job starts a tesseract process instead of using a resident model
+            print("Warning: tesserocr is not installed (pip install 'OCRServer[tesserocr]'); "
+                  "OCR workers run the tesseract binary for every job")
+        if ocr_workers != 0:
+            self.ocr_engine = OCREngine(workers=ocr_workers, job_timeout=ocr_job_timeout,
+                                        max_jobs_per_worker=ocr_max_jobs_per_worker, max_pools=ocr_max_pools,
+                                        config_workers=ocr_config_workers)
+        else:
+            self.ocr_engine = None
+
+        # Requests may pick another preprocessing profile or stage list than the configured default.
+        # In tiered mode a cheap downscaled pass runs first and only poor results are escalated
+        quality_ladder = QualityLadder(min_confidence=quality_min_confidence, min_coverage=quality_min_coverage,
+                                       fast_scale=quality_fast_scale, enhanced_profile=quality_enhanced_profile,
+                                       enhanced_oem=quality_enhanced_oem)
+        self.image_processor = ImageProcessor(engine=self.ocr_engine,
+                                              pipeline=PreprocessPipeline.from_request(profile=preprocess_profile),
+                                              detect_regions=detect_regions, deskew=deskew,
+                                              stage_seconds=self.stage_seconds, tiered=quality_tiered,
+                                              quality_ladder=quality_ladder, target_dpi=target_dpi)
+        # Oversized photos sent as documents are reduced while decoding, like single uploads
+        self.page_reader = PageReader(max_side=self.image_processor.max_decode_side)
+        self.startup.mark('engine')
+
+        # Batch images are decoded and preprocessed on a thread pool, with a bounded number in flight
+        self.batch_workers = batch_workers or os.cpu_count() or 1
+        self.batch_max_in_flight = batch_max_in_flight or 2 * self.batch_workers
+        self.batch_executor = ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix='ocr-batch')
+        # ZIP members count against the same per-file limit as uploads, plus limits for the archive as a whole
+        self.batch_max_members = batch_max_members
+        self.batch_max_uncompressed_bytes = batch_max_uncompressed_bytes
+
+        # Asynchronous jobs wait in a bounded queue; their state is kept in SQLite under the temporary folder
+        job_store = JobStore(os.path.join(self.tmp_folder, 'jobs.sqlite3'))
+        self.job_queue = JobQueue(self._run_job, job_store, max_queued=job_max_queued,
+                                  workers=job_workers or (self.ocr_engine.workers if self.ocr_engine else 1),
+                                  result_ttl=job_result_ttl)
+        self.startup.mark('jobs')
+
+        # Single-image requests get a deadline, which clients may shorten or extend up to the maximum. Requests
+        # are turned away when the expected wait for a worker already exceeds it, or when their client has
+        # too many requests in flight. Prefork workers each admit requests for their own OCR workers
+        self.default_deadline = default_deadline
+        self.max_deadline = max_deadline
+        self.admission = AdmissionController(self.ocr_engine.workers if self.ocr_engine else os.cpu_count() or 1,
+                                             max_per_client=client_max_concurrency, min_deadline=min_deadline)
+
+    @property
+    def status(self):
+        """Current server status, shared by all worker processes."""
+        return self._status.value.decode()
+
+    @status.setter
+    def status(self, new_status):
+        self._status.value = new_status.encode()[:len(self._status) - 1]
+
+    @property
+    def processed_requests(self):
+        """Number of processed images and documents, summed over all worker processes."""
+        return int(self.processed_total.value())
+
     def run(self):
-        """Run the Flask web server."""
+        """Run the web server, either the Flask development server or the prefork server."""
         self.update_status("active")
-        self.app.run(debug=self.debug, host=self.host, ssl_context=self.ssl_context)
+        if self.server_mode == 'prefork':
+            self.report_startup()
+            # Every worker warms up its own OCR pool before it accepts connections
+            server = PreforkServer(self.app, host=self.host, port=self.port, workers=self.server_workers,
+                                   worker_concurrency=self.worker_concurrency, ssl_context=self.ssl_context,
+                                   graceful_timeout=self.graceful_timeout, on_worker_start=self.start_worker,
+                                   on_worker_exit=self.shutdown, on_worker_lost=self.fail_worker_jobs)
+            server.serve_forever()
+        else:
+            # With the debug reloader, only the child process that serves requests warms up
+            if self.warm_up_enabled and (not self.debug or os.environ.get('WERKZEUG_RUN_MAIN')):
+                self.warm_up()
+            self.report_startup()
+            try:
+                self.app.run(debug=self.debug, host=self.host, port=self.port, ssl_context=self.ssl_context)
+            finally:
+                self.shutdown()
+
+    def warm_up(self):
+        """Load the imaging libraries and OCR model and start the OCR workers ahead of the first request."""
+        try:
+            with self.startup.phase('warm_up'):
+                self.image_processor.warm_up()
+        except Exception as e:
+            print(f"Error warming up OCR: {e}")
+
+    def start_worker(self):
+        """Prepare a freshly forked prefork worker; its startup report only covers what a respawn pays for."""
+        self.startup = StartupReport()
+        if self.warm_up_enabled:
+            self.warm_up()
+        if self.startup_target and self.startup.total() > self.startup_target:
+            print(f"Warning: worker {os.getpid()} took {self.startup.total():.2f} s to start, "
+                  f"above the {self.startup_target} s target", flush=True)
+
+    def fail_worker_jobs(self, pid):
+        """Fail the jobs a prefork worker queued before it exited; their payloads died with it."""
+        failed = self.job_queue.store.fail_owned(pid, "Worker exited before the job finished")
+        if failed:
+            print(f"Failed {failed} unfinished jobs of worker {pid}", flush=True)
+
+    def report_startup(self):
+        """Print the startup report, warning when startup took longer than the target."""
+        print(self.startup.summary(), flush=True)
+        if self.startup_target and self.startup.total() > self.startup_target:
+            print(f"Warning: startup took {self.startup.total():.2f} s, above the {self.startup_target} s target",
+                  flush=True)
+
+    def shutdown(self):
+        """Write the queued archive entries and stop the OCR worker processes."""
+        self.archive_writer.close(timeout=self.graceful_timeout)
+        if self.ocr_engine is not None:
+            self.ocr_engine.shutdown()
 
     def index(self):
         """Route handler for the index page displaying server information."""
@@ -58,17 +321,25 @@ class OCRServer:
         server_info = f"{self.tmp_folder}"
         log_entries = []
 
-        for i, log_entry in enumerate(reversed(self.requests_log), start=1):
-            log_array = log_entry.split('\n')
-            for each in log_array:
+        page = request.args.get('page', 1, type=int)
+        records, total_pages = self.requests_log.page(page, self.log_page_size)
+        page = min(max(1, page), total_pages)
+        for record in records:
+            for each in record.lines():
                 log_entries.append(f"{each}\n")
 
         return render_template('index.html', status=self.status, indicator=self.status.lower(), uptime=uptime,
                                processed_requests=self.processed_requests, current_date=today[0], server_info=server_info,
-                               log_entries=log_entries)
+                               log_entries=log_entries, cache_stats=self.ocr_cache.stats(), page=page,
+                               total_pages=total_pages)
 
     def process_image(self):
         """Route handler for processing uploaded images and extracting text using OCR."""
+        try:
+            options = self.ocr_options()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
         try:
             log_entry = []
 
@@ -77,36 +348,51 @@ class OCRServer:
             log_entry.append(f"SRC: {request_source_address}")
             self.write_log(log_entry)
 
-            # Create a temporary path for the uploaded file
-            tmp_file_path = os.path.join(self.tmp_folder, 'uploaded_photo.jpg')
-
-            # Save the uploaded file to the temporary folder
+            # Read the uploaded file once; it stays in memory unless it is above the spool threshold
             uploaded_file = request.files['image']
-            uploaded_file.save(tmp_file_path)
+            upload = self.read_upload(uploaded_file)
 
-            # Use OCRUtility to generate a unique filename and save the file
-            sanitized_name = self.ocr_utility.sanitize_name(uploaded_file.filename)
-            saved_path = self.ocr_utility.save_uploaded_file(uploaded_file, self.tmp_folder, sanitized_name)
+            try:
+                # Use ImageProcessor to process and extract text, reusing cached results for identical uploads
+                report = {}
+                result, cached = self.extract_text_cached(upload, options, report, g.deadline)
+                fields = self.result_fields(result)
 
-            # Use ImageProcessor to process and extract text
-            extracted_text = self.image_processor.process_and_extract_text(tmp_file_path)
+                # Hand the image and its text to the background archive writer
+                archive_token = self.archive_upload(upload, {"extracted_text": fields["extracted_text"], "cached": cached})
+                if archive_token:
+                    report["archive_token"] = archive_token
+            finally:
+                upload.cleanup()
 
             # Update status and log
             self.update_status("Processing")
-            self.processed_requests += 1
+            self.count_processed()
+
+            if isinstance(result, WordBoxes) and self.wants_binary_words():
+                self.update_status("ready")
+                return Response(result.to_bytes(), mimetype=WordBoxes.MIMETYPE,
+                                headers={"X-OCR-Cached": str(cached).lower(), "X-OCR-Words": str(len(result))})
 
             response_data = {
                 "status": "success",
                 "message": "Image processed successfully!",
-                "extracted_text": extracted_text
+                "cached": cached
             }
+            response_data.update(fields)
+            response_data.update(report)
             self.update_status("ready")
 
             return jsonify(response_data)
 
+        except DeadlineExceeded as e:
+            # Running out of time is the client's limit, not a server fault, so the status is left alone
+            return jsonify({"status": "error", "message": str(e)}), 504
+
         except Exception as e:
             # Handle exceptions and return an error response
             self.update_status('error')
+            self.errors_total.inc(label_value='request')
             error_message = f"Error processing image: {e}"
             response_data = {
                 "status": "error",
@@ -114,25 +400,339 @@ class OCRServer:
             }
             return jsonify(response_data), 500
 
+    def process_batch(self):
+        """
+        Route handler for OCR on many images at once.
+
+        Accepts several files in the 'images' field, or a single ZIP archive, and streams one
+        newline-delimited JSON result per image as soon as it finishes, followed by a summary line.
+        """
+        log_entry = [f"SRC: {request.remote_addr}", "BATCH"]
+        self.write_log(log_entry)
+
+        try:
+            options = self.ocr_options()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        files = request.files.getlist('images')
+        if not files:
+            response_data = {
+                "status": "error",
+                "message": "No images uploaded"
+            }
+            return jsonify(response_data), 400
+
+        uploads = self.ocr_utility.iter_batch_uploads(files, self.spool_folder, self.spool_threshold,
+                                                      max_member_bytes=self.max_upload_bytes,
+                                                      max_total_bytes=self.batch_max_uncompressed_bytes,
+                                                      max_members=self.batch_max_members)
+        deadline = g.deadline
+
+        def generate():
+            self.update_status("Processing")
+            processed = 0
+            errors = 0
+
+            process_item = functools.partial(self._process_batch_item, options=options, deadline=deadline)
+            results = self.ocr_utility.map_bounded(self.batch_executor, process_item, uploads,
+                                                   self.batch_max_in_flight)
+            for index, upload, future in results:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "error", "message": f"Error processing image: {e}"}
+
+                result["index"] = index
+                result["filename"] = upload.filename
+                if result["status"] == "success":
+                    processed += 1
+                else:
+                    errors += 1
+
+                yield json.dumps(result) + "\n"
+
+            self.count_processed(processed)
+            self.update_status("ready")
+            yield json.dumps({"status": "complete", "processed": processed, "errors": errors}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def _process_batch_item(self, upload, options=None, deadline=None):
+        """
+        Archive and OCR a single image of a batch.
+
+        Parameters:
+        - upload (UploadBuffer): Image read from the batch.
+        - options (dict): OCR options parsed from the request.
+        - deadline (Deadline): Deadline of the whole batch.
+
+        Returns:
+        - dict: Result line for the image.
+        """
+        if upload.error:
+            # A ZIP member refused while it was read, for example for its size or format
+            self.errors_total.inc(label_value='upload')
+            return {"status": "error", "message": upload.error}
+
+        try:
+            self.upload_bytes.observe(upload.size)
+
+            report = {}
+            extracted, cached = self.ocr_upload(upload, options, report, deadline)
+            fields = self.result_fields(extracted)
+            archive_token = self.archive_upload(upload, {"extracted_text": fields["extracted_text"], "cached": cached})
+            if archive_token:
+                report["archive_token"] = archive_token
+            result = {
+                "status": "success",
+                "cached": cached
+            }
+            result.update(fields)
+            for field in ("near_duplicate", "rotation", "quality", "archive_token"):
+                if field in report:
+                    result[field] = report[field]
+            return result
+        finally:
+            upload.cleanup()
+
+    def process_document(self):
+        """
+        Route handler for OCR on a multi-page TIFF or PDF.
+
+        Pages are decoded one at a time and recognized in parallel. One newline-delimited JSON
+        line is streamed per page as soon as it finishes, followed by a summary line holding
+        the whole document text in page order.
+        """
+        log_entry = [f"SRC: {request.remote_addr}", "DOCUMENT"]
+        self.write_log(log_entry)
+
+        try:
+            options = self.ocr_options()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        uploaded_file = request.files.get('document') or request.files.get('image')
+        if uploaded_file is None:
+            response_data = {
+                "status": "error",
+                "message": "No document uploaded"
+            }
+            return jsonify(response_data), 400
+
+        upload = self.read_upload(uploaded_file)
+        settings = dict(self.image_processor.settings(**options), document=True)
+        deadline = g.deadline
+        cache_key = self.ocr_cache.make_key(upload.hash_value, settings)
+
+        def generate():
+            self.update_status("Processing")
+            page_texts = self.ocr_cache.get(cache_key)
+            cached = page_texts is not None
+            errors = 0
+
+            try:
+                if cached:
+                    page_texts = [self.cached_result(value) for value in page_texts]
+                    for index, page in enumerate(page_texts):
+                        result = {"status": "success", "page": index + 1}
+                        result.update(self.result_fields(page))
+                        yield json.dumps(result) + "\n"
+                else:
+                    page_texts = {}
+                    pages = self.page_reader.iter_pages(upload.source())
+                    extract_page_text = functools.partial(self.image_processor.extract_page_text, deadline=deadline,
+                                                          **options)
+                    results = self.ocr_utility.map_bounded(self.batch_executor, extract_page_text, pages,
+                                                           self.batch_max_in_flight)
+                    for index, _, future in results:
+                        try:
+                            page_texts[index] = future.result()
+                            result = {"status": "success"}
+                            result.update(self.result_fields(page_texts[index]))
+                        except Exception as e:
+                            errors += 1
+                            self.errors_total.inc(label_value='deadline' if isinstance(e, DeadlineExceeded) else 'ocr')
+                            page_texts[index] = ""
+                            result = {"status": "error", "message": f"Error processing page: {e}"}
+
+                        result["page"] = index + 1
+                        yield json.dumps(result) + "\n"
+
+                    page_texts = [page_texts[index] for index in range(len(page_texts))]
+                    if not errors:
+                        self.ocr_cache.put(cache_key, [self.cache_value(page) for page in page_texts])
+            except Exception as e:
+                self.update_status('error')
+                self.errors_total.inc(label_value='request')
+                yield json.dumps({"status": "error", "message": f"Error reading document: {e}"}) + "\n"
+                return
+            finally:
+                upload.cleanup()
+
+            self.count_processed()
+            self.update_status("ready")
+            yield json.dumps({
+                "status": "complete",
+                "pages": len(page_texts),
+                "errors": errors,
+                "cached": cached,
+                "extracted_text": "\f".join(self.result_fields(page)["extracted_text"] for page in page_texts)
+            }) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def submit_job(self):
+        """
+        Route handler queueing an uploaded image for asynchronous OCR.
+
+        Returns 202 with the job id straight away, or 429 with Retry-After when the queue is full.
+        Jobs have no deadline unless the client sets one; a deadline below the minimum is refused
+        with 400, a job whose deadline would pass while it waits in the queue with 503, and one
+        that is picked up too late fails.
+        """
+        log_entry = [f"SRC: {request.remote_addr}", "JOB"]
+        self.write_log(log_entry)
+
+        try:
+            options = self.ocr_options()
+            deadline = self.request_deadline(optional=True)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        if deadline is not None:
+            try:
+                self.admission.check_deadline(deadline)
+            except AdmissionRejected as e:
+                return self.admission_rejected(e)
+
+            wait = self.job_queue.estimated_wait()
+            if wait > 0 and wait >= deadline.remaining():
+                self.rejected_total.inc(label_value='deadline')
+                response_data = {
+                    "status": "error",
+                    "message": f"Job queue busy: estimated wait of {wait:.1f} s exceeds the deadline of {deadline.seconds:g} s"
+                }
+                return jsonify(response_data), 503, {"Retry-After": str(self.job_queue.retry_after())}
+
+        uploaded_file = request.files.get('image')
+        if uploaded_file is None:
+            response_data = {
+                "status": "error",
+                "message": "No image uploaded"
+            }
+            return jsonify(response_data), 400
+
+        upload = self.read_upload(uploaded_file)
+        self.queue_depth.observe(self.job_queue.depth())
+        try:
+            job_id = self.job_queue.submit((upload, options, deadline), upload.filename)
+        except QueueFull as e:
+            upload.cleanup()
+            response_data = {
+                "status": "error",
+                "message": str(e)
+            }
+            return jsonify(response_data), 429, {"Retry-After": str(e.retry_after)}
+
+        response_data = {
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": url_for('job_status', job_id=job_id),
+            "result_url": url_for('job_result', job_id=job_id)
+        }
+        return jsonify(response_data), 202, {"Location": response_data["status_url"]}
+
+    def job_status(self, job_id):
+        """Route handler reporting the state of an asynchronous job."""
+        job = self.job_queue.get(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": "Unknown job"}), 404
+
+        job.pop("result")
+        return jsonify(job)
+
+    def job_result(self, job_id):
+        """Route handler returning the result of an asynchronous job, or 202 while it is still pending."""
+        job = self.job_queue.get(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": "Unknown job"}), 404
+
+        if job["status"] == "failed":
+            response_data = {
+                "status": "error",
+                "message": f"Error processing image: {job['error']}"
+            }
+            return jsonify(response_data), 500
+
+        if job["status"] != "done":
+            response_data = {
+                "status": job["status"],
+                "job_id": job_id
+            }
+            return jsonify(response_data), 202, {"Retry-After": str(self.job_queue.retry_after())}
+
+        response_data = {
+            "status": "success",
+            "message": "Image processed successfully!",
+            "job_id": job_id
+        }
+        response_data.update(job["result"])
+        return jsonify(response_data)
+
+    def _run_job(self, payload):
+        """
+        Archive and OCR the upload of an asynchronous job.
+
+        Parameters:
+        - payload (tuple): (UploadBuffer, OCR options, Deadline or None) queued by submit_job.
+
+        Returns:
+        - dict: Job result stored for the client.
+        """
+        upload, options, deadline = payload
+        try:
+            if deadline is not None:
+                deadline.check('the job started')
+            report = {}
+            extracted, cached = self.ocr_upload(upload, options, report, deadline)
+            fields = self.result_fields(extracted)
+            archive_token = self.archive_upload(upload, {"extracted_text": fields["extracted_text"], "cached": cached})
+            if archive_token:
+                report["archive_token"] = archive_token
+            self.count_processed()
+            result = {"cached": cached}
+            result.update(fields)
+            for field in ("near_duplicate", "rotation", "quality", "archive_token"):
+                if field in report:
+                    result[field] = report[field]
+            return result
+        finally:
+            upload.cleanup()
+
     def demo(self):
         """Route handler for trying OCR on a user-uploaded image."""
         form = OCRForm()
 
         if form.validate_on_submit():
             try:
-                # Save the uploaded file to the temporary folder
+                # Read the uploaded file once; it stays in memory unless it is above the spool threshold
                 uploaded_file = form.image.data
-                tmp_file_path = os.path.join(self.tmp_folder, 'uploaded_photo.jpg')
-                uploaded_file.save(tmp_file_path)
+                upload = self.read_upload(uploaded_file)
 
                 # Use ImageProcessor to process and extract text
-                extracted_text = self.image_processor.process_and_extract_text(tmp_file_path)
+                try:
+                    extracted_text, _ = self.extract_text_cached(upload, deadline=g.deadline)
+                finally:
+                    upload.cleanup()
 
                 # Update status and log
                 self.update_status("OCR Demo")
 
                 # Return the extracted text as a response
                 return render_template('result.html', extracted_text=extracted_text)
+            except DeadlineExceeded as e:
+                return jsonify({"status": "error", "message": str(e)}), 504
             except Exception as e:
                 # Handle exceptions and return an error response
                 self.update_status('error')
@@ -145,6 +745,463 @@ class OCRServer:
 
         return render_template('demo.html', form=form)
 
+    def cache_stats(self):
+        """Route handler returning the OCR result cache counters."""
+        return jsonify(self.ocr_cache.stats())
+
+    def metrics_endpoint(self):
+        """Route handler exposing server metrics in Prometheus text format."""
+        return Response(self.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    def startup_endpoint(self):
+        """Route handler exposing the startup report of the process serving the request."""
+        report = self.startup.to_dict()
+        report["pid"] = os.getpid()
+        report["target"] = self.startup_target
+        return jsonify(report)
+
+    def archive_lookup(self):
+        """
+        Route handler finding archived uploads through the archive index.
+
+        Query parameters:
+        - hash: MD5 hex digest of the upload contents.
+        - token: Archive token returned when the upload was processed.
+        - start, end: ISO 8601 dates or times bounding the time of receipt; end is exclusive.
+        - limit: Most uploads returned, 100 by default.
+        """
+        if self.archive_index is None:
+            return jsonify({"status": "error", "message": "The archive index is disabled"}), 404
+
+        try:
+            start, end = (datetime.fromisoformat(request.args[name]).timestamp() if request.args.get(name) else None
+                          for name in ('start', 'end'))
+            limit = min(max(1, int(request.args.get('limit', 100))), 1000)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": f"Invalid query: {e}"}), 400
+
+        uploads = self.archive_index.find(hash_value=request.args.get('hash') or None,
+                                          token=request.args.get('token') or None, start=start, end=end, limit=limit)
+        for upload in uploads:
+            upload["received"] = datetime.fromtimestamp(upload["received"]).isoformat()
+        return jsonify({"status": "success", "uploads": uploads})
+
+    def archive_reocr(self, token):
+        """Route handler running OCR again on an archived upload, with the OCR options of the form."""
+        if self.archive_index is None:
+            return jsonify({"status": "error", "message": "The archive index is disabled"}), 404
+
+        try:
+            options = self.ocr_options()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        uploads = self.archive_index.find(token=token, limit=1)
+        if not uploads:
+            return jsonify({"status": "error", "message": "Unknown archive token"}), 404
+        if uploads[0]["image"] is None:
+            return jsonify({"status": "error", "message": "The image of this upload was not archived"}), 410
+
+        try:
+            data = bytearray(self.archive_index.read(uploads[0]))
+            upload = UploadBuffer(uploads[0]["filename"], hashlib.md5(data).hexdigest(), len(data), data=data)
+            report = {}
+            result, cached = self.ocr_upload(upload, options, report, g.deadline)
+        except DeadlineExceeded as e:
+            return jsonify({"status": "error", "message": str(e)}), 504
+        except Exception as e:
+            self.errors_total.inc(label_value='request')
+            return jsonify({"status": "error", "message": f"Error processing image: {e}"}), 500
+
+        self.count_processed()
+        response_data = {
+            "status": "success",
+            "message": "Image processed successfully!",
+            "archive_token": token,
+            "cached": cached
+        }
+        response_data.update(self.result_fields(result))
+        response_data.update(report)
+        return jsonify(response_data)
+
+    def upload_sink(self, filename):
+        """
+        Create the UploadSink that receives an uploaded file of the current request.
+
+        Parameters:
+        - filename (str): Name sent by the client.
+
+        Returns:
+        - UploadSink: Sink accepting the formats allowed for the requested endpoint.
+        """
+        return UploadSink(self.spool_folder, spool_threshold=self.spool_threshold, max_bytes=self.max_upload_bytes,
+                          allowed_formats=self.upload_formats.get(request.endpoint, IMAGE_FORMATS),
+                          filename=filename)
+
+    def receive_uploads(self):
+        """Receive the uploaded files of a POST request, recording the latency of the upload stage."""
+        # Deadlines count from the arrival of the request, so the upload is part of them
+        g.received = time.time()
+        if request.method != 'POST' or request.mimetype != 'multipart/form-data':
+            return None
+
+        try:
+            with self.stage_seconds.time('upload'):
+                request.files
+        except Exception:
+            self.errors_total.inc(label_value='upload')
+            raise
+        return None
+
+    def upload_rejected(self, error):
+        """Error handler answering oversized or unsupported uploads with a JSON error."""
+        response_data = {
+            "status": "error",
+            "message": error.description
+        }
+        return jsonify(response_data), error.code
+
+    def read_upload(self, uploaded_file):
+        """
+        Read an uploaded file with OCRUtility.read_upload, recording its size.
+
+        Parameters:
+        - uploaded_file (FileStorage): Uploaded file object.
+
+        Returns:
+        - UploadBuffer: The upload contents, hash and size.
+        """
+        try:
+            upload = self.ocr_utility.read_upload(uploaded_file, self.spool_folder, self.spool_threshold)
+        except Exception:
+            self.errors_total.inc(label_value='upload')
+            raise
+
+        self.upload_bytes.observe(upload.size)
+        return upload
+
+    def archive_upload(self, upload, result=None):
+        """
+        Queue an upload and its OCR result for the background archive writer.
+
+        Parameters:
+        - upload (UploadBuffer): Upload to archive.
+        - result (dict): OCR result stored next to the image.
+
+        Returns:
+        - str: Token the upload is archived and indexed under, or None if it was dropped.
+        """
+        # Sanitize the stem and extension separately so the archived image keeps its extension
+        stem, extension = os.path.splitext(upload.filename or '')
+        sanitized_name = self.ocr_utility.sanitize_name(stem) or 'upload'
+        if self.ocr_utility.sanitize_name(extension):
+            sanitized_name += '.' + self.ocr_utility.sanitize_name(extension)
+        token = secrets.token_hex(8)
+        queued = self.archive_writer.submit(upload, sanitized_name, result, token=token)
+
+        if not queued:
+            self.errors_total.inc(label_value='archive')
+            return None
+        return token
+
+    def count_processed(self, amount=1):
+        """Count processed images in the shared metric."""
+        self.processed_total.inc(amount)
+
+    def _timed(self, view):
+        """Wrap a route handler so that its latency is recorded under its own name."""
+        @functools.wraps(view)
+        def timed_view(*args, **kwargs):
+            with self.request_seconds.time(view.__name__):
+                return view(*args, **kwargs)
+
+        return timed_view
+
+    def _admitted(self, view, optional_deadline=False):
+        """
+        Wrap a route handler so that it only runs for requests admission control lets in.
+
+        The request's deadline is available to the handler as g.deadline. The admission slot is
+        held until the response has been sent, which for streamed responses is after the last line.
+        Streaming endpoints pass optional_deadline, so that long batches are only cut short when the
+        client asks for it.
+        """
+        @functools.wraps(view)
+        def admitted_view(*args, **kwargs):
+            try:
+                deadline = self.request_deadline(optional=optional_deadline)
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+
+            try:
+                ticket = self.admission.admit(request.remote_addr, deadline)
+            except AdmissionRejected as e:
+                return self.admission_rejected(e)
+
+            g.deadline = deadline
+            try:
+                response = self.app.make_response(view(*args, **kwargs))
+            except BaseException:
+                ticket.release()
+                raise
+            if response.is_streamed:
+                # Streams keep their slot until the last line is sent; their length says nothing about service time
+                response.call_on_close(functools.partial(ticket.release, record=False))
+            else:
+                ticket.release()
+            return response
+
+        return admitted_view
+
+    def admission_rejected(self, error):
+        """
+        Response to a request turned away by admission control.
+
+        Parameters:
+        - error (AdmissionRejected): Why the request was rejected.
+
+        Returns:
+        - tuple: JSON error, status code and headers: 429 over the client limit, 400 for a deadline
+          below the minimum, 504 for one that passed before admission, and 503 for a busy server.
+        """
+        self.rejected_total.inc(label_value=error.reason)
+        response_data = {
+            "status": "error",
+            "message": str(error)
+        }
+        status_code = {'client_limit': 429, 'deadline_too_short': 400, 'deadline_expired': 504}.get(error.reason, 503)
+        headers = {"Retry-After": str(error.retry_after)} if error.retry_after is not None else {}
+        return jsonify(response_data), status_code, headers
+
+    def request_deadline(self, optional=False):
+        """
+        Deadline of the current request.
+
+        Form fields:
+        - deadline: Seconds the client is willing to wait, counted from the arrival of the request.
+          Values above the server's maximum deadline are lowered to it.
+
+        Parameters:
+        - optional (bool): Return None when the client sets no deadline, instead of the server's default one.
+
+        Returns:
+        - Deadline: Deadline of the request, or None.
+        """
+        value = request.form.get('deadline')
+        if value is None or not value.strip():
+            seconds = None if optional else self.default_deadline
+        else:
+            try:
+                seconds = float(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for deadline: {value}") from None
+            if not 0 < seconds < float('inf'):
+                raise ValueError(f"Invalid value for deadline: {value}")
+        if not seconds:
+            return None
+        if self.max_deadline:
+            seconds = min(seconds, self.max_deadline)
+        return Deadline(seconds, start=g.get('received'))
+
+    def ocr_options(self):
+        """
+        Parse the per-request OCR options from the submitted form.
+
+        Form fields:
+        - profile: Name of a preprocessing profile.
+        - pipeline: Comma-separated preprocessing stages, overriding the profile.
+        - regions: 'true' to recognize only detected text regions, 'false' for full-frame OCR.
+        - deskew: 'true' to straighten skewed, sideways and upside-down pages before OCR.
+        - tiered: 'true' to read a cheap downscaled copy first and escalate only poor results, 'false' for one full pass.
+        - output: 'text' for plain text, 'words' to add word boxes, layout ids and confidences.
+        - lang: Installed tesseract languages joined by '+', for example 'deu+eng'.
+        - psm: Tesseract page segmentation mode, for example 7 for a single line.
+        - oem: Tesseract OCR engine mode.
+        - whitelist: Characters tesseract may recognize, for example '0123456789.,'.
+
+        Returns:
+        - dict: Keyword arguments for ImageProcessor.extract_text and ImageProcessor.settings.
+        """
+        options = {}
+
+        profile = request.form.get('profile')
+        stages = request.form.get('pipeline')
+        if profile or stages:
+            options["pipeline"] = PreprocessPipeline.from_request(profile=profile, stages=stages)
+
+        regions = request.form.get('regions')
+        if regions is not None:
+            options["detect_regions"] = self._parse_flag('regions', regions)
+
+        deskew = request.form.get('deskew')
+        if deskew is not None:
+            options["deskew"] = self._parse_flag('deskew', deskew)
+
+        tiered = request.form.get('tiered')
+        if tiered is not None:
+            options["tiered"] = self._parse_flag('tiered', tiered)
+
+        output = request.form.get('output', 'text').strip().lower()
+        if output not in ('text', 'words'):
+            raise ValueError(f"Invalid value for output: {output}")
+        if output == 'words':
+            options["words"] = True
+
+        # Each distinct configuration is served by its own warm OCR worker pool
+        fields = {name: request.form.get(name) for name in ('lang', 'psm', 'oem', 'whitelist')}
+        if any(fields.values()):
+            options["config"] = OCRConfig.from_request(default=self.image_processor.config, **fields)
+
+        return options
+
+    @staticmethod
+    def _parse_flag(name, value):
+        """Parse a boolean form field, raising ValueError for anything unrecognized."""
+        value = value.strip().lower()
+        if value in ('1', 'true', 'yes', 'on'):
+            return True
+        if value in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"Invalid value for {name}: {value}")
+
+    @staticmethod
+    def result_fields(result):
+        """
+        Response fields of an OCR result.
+
+        Parameters:
+        - result (str or WordBoxes): Extracted text, or words when word output was requested.
+
+        Returns:
+        - dict: 'extracted_text', plus the columnar 'words' for word output.
+        """
+        if isinstance(result, WordBoxes):
+            return {"extracted_text": result.text(), "words": result.to_json()}
+        return {"extracted_text": result}
+
+    @staticmethod
+    def cache_value(result):
+        """Convert an OCR result into the JSON value stored in the result cache."""
+        return result.to_json() if isinstance(result, WordBoxes) else result
+
+    @staticmethod
+    def cached_result(value):
+        """Convert a value read from the result cache back into an OCR result."""
+        return WordBoxes.from_json(value) if isinstance(value, dict) else value
+
+    @staticmethod
+    def wants_binary_words():
+        """Return True if the client prefers word output in the compact binary form over JSON."""
+        return request.accept_mimetypes.best_match(['application/json', WordBoxes.MIMETYPE]) == WordBoxes.MIMETYPE
+
+    def extract_text_cached(self, upload, options=None, report=None, deadline=None):
+        """
+        Extract text from an upload, consulting the OCR result cache first.
+
+        Parameters:
+        - upload (UploadBuffer): Upload read by OCRUtility.read_upload.
+        - options (dict): OCR options parsed from the request.
+        - report (dict): If given, filled with processing details of a fresh extraction.
+        - deadline (Deadline): Deadline of the request; DeadlineExceeded is raised once it has passed.
+
+        Returns:
+        - tuple: (extracted text or WordBoxes, whether the result came from the cache)
+        """
+        try:
+            return self.ocr_upload(upload, options, report, deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # Failed extractions are reported but never cached
+            return f"Error processing image: {e}", False
+
+    def ocr_upload(self, upload, options=None, report=None, deadline=None):
+        """
+        Extract text from an upload through the OCR result cache, raising on failure.
+
+        With the near-duplicate index enabled, an upload whose preprocessed image is close to
+        an earlier one reuses that cached result, and the report's near_duplicate flag is set.
+
+        Parameters:
+        - upload (UploadBuffer): Upload read by OCRUtility.read_upload.
+        - options (dict): OCR options parsed from the request.
+        - report (dict): If given, filled with processing details of a fresh extraction.
+        - deadline (Deadline): Deadline of the request; DeadlineExceeded is raised once it has passed.
+
+        Returns:
+        - tuple: (extracted text or WordBoxes, whether the result came from the cache)
+        """
+        options = options or {}
+        settings = self.image_processor.settings(**options)
+        cache_key = self.ocr_cache.make_key(upload.hash_value, settings)
+
+        extracted_text = self.cached_result(self.ocr_cache.get(cache_key))
+        if extracted_text is not None:
+            if self.near_duplicates is not None and report is not None:
+                report["near_duplicate"] = False
+            return extracted_text, True
+
+        if self.near_duplicates is None:
+            reuse_result = None
+            matches = None
+        else:
+            matches = {}
+            reuse_result = functools.partial(self.reuse_near_duplicate, settings=settings, matches=matches)
+
+        try:
+            extracted_text = self.image_processor.extract_text(upload.source(), report=report,
+                                                               reuse_result=reuse_result, deadline=deadline, **options)
+        except DeadlineExceeded:
+            self.errors_total.inc(label_value='deadline')
+            raise
+        except Exception:
+            self.errors_total.inc(label_value='ocr')
+            raise
+
+        self.ocr_cache.put(cache_key, self.cache_value(extracted_text))
+        if matches is None:
+            return extracted_text, False
+
+        near_duplicate = "cache_key" in matches
+        if report is not None:
+            report["near_duplicate"] = near_duplicate
+        if not near_duplicate and "fingerprint" in matches:
+            try:
+                self.near_duplicates.add(matches["fingerprint"], settings, cache_key)
+            except Exception as e:
+                print(f"Error indexing image fingerprint: {e}")
+        return extracted_text, near_duplicate
+
+    def reuse_near_duplicate(self, preprocessed_image, settings, matches):
+        """
+        Look up the cached text of an earlier upload that is visually near-identical.
+
+        Parameters:
+        - preprocessed_image (np.ndarray): Preprocessed image of the current upload.
+        - settings (dict): OCR settings the reused result must have been produced with.
+        - matches (dict): Receives the fingerprint, and the cache key and distance of a match.
+
+        Returns:
+        - str or WordBoxes: Cached result of the near duplicate, or None to run OCR.
+        """
+        try:
+            matches["fingerprint"] = self.near_duplicates.fingerprint(preprocessed_image)
+            match = self.near_duplicates.find(matches["fingerprint"], settings)
+            if match is None:
+                return None
+
+            extracted_text = self.cached_result(self.ocr_cache.get(match[0]))
+            if extracted_text is None:
+                # The earlier result has been evicted from the cache; drop its stale fingerprint
+                self.near_duplicates.remove(match[0])
+                return None
+        except Exception as e:
+            print(f"Error looking up near-duplicate images: {e}")
+            return None
+
+        matches["cache_key"], matches["distance"] = match
+        return extracted_text
+
     @staticmethod
     def get_current_datestamp():
         """
@@ -164,17 +1221,12 @@ class OCRServer:
 
     def write_log(self, message):
         """Write a log message to the requests log."""
-        current_datetime = self.get_current_datestamp()
-        request_headers = dict(request.headers)
-        unique_id = self.generate_unique_id()
-
-        log_entry = f"\n[{current_datetime[0]}:{current_datetime[1]}] Unique ID: {unique_id}\n"
-        for key, value in request_headers.items():
-            log_entry += f"{key}: {value}\n"
-
-        log_entry += f"{message}\n"
+        if isinstance(message, (list, tuple)):
+            message = " ".join(str(part) for part in message)
 
-        self.requests_log.append(log_entry)
+        request_headers = dict(request.headers) if self.log_headers else None
+        record = LogRecord(time.time(), self.generate_unique_id(), request.remote_addr, message, request_headers)
+        self.requests_log.append(record)
 
     def generate_unique_id(self):
         """Generate a unique identifier based on timestamp with milliseconds."""
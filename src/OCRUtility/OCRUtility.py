@@ -1,10 +1,229 @@
 import hashlib
+import io
 import os
+import tempfile
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime
 
-from PIL import Image
 from slugify import slugify
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+
+from src.LazyModule.LazyModule import LazyModule
+
+Image = LazyModule('PIL.Image')
+
+# Leading bytes of the formats accepted as uploads
+FORMAT_SIGNATURES = (
+    ('jpeg', b'\xff\xd8\xff'),
+    ('png', b'\x89PNG\r\n\x1a\n'),
+    ('bmp', b'BM'),
+    ('tiff', b'II*\x00'),
+    ('tiff', b'MM\x00*'),
+    ('jp2', b'\x00\x00\x00\x0cjP  \r\n\x87\n'),
+    ('pdf', b'%PDF-'),
+    ('zip', b'PK\x03\x04'),
+)
+IMAGE_FORMATS = ('jpeg', 'png', 'bmp', 'tiff', 'webp', 'jp2', 'pnm')
+SNIFF_BYTES = 12
+
+
+class UploadBuffer:
+
+    """
+    UploadBuffer: An uploaded file read once, held in memory or spooled to a unique file.
+
+    Attributes:
+        - filename (str): Original file name sent by the client.
+        - data (bytearray): Upload contents when held in memory, otherwise None.
+        - path (str): Path of the spooled file when the upload was too large for memory, otherwise None.
+        - hash_value (str): MD5 hex digest of the upload contents.
+        - size (int): Size of the upload in bytes.
+        - error (str): Why a batch member was rejected, in which case it holds no data, otherwise None.
+
+    Methods:
+        - source() -> bytearray or str:
+            The in-memory contents, or the spooled file path.
+
+        - cleanup() -> None:
+            Remove the spooled file, if any.
+    """
+
+    def __init__(self, filename, hash_value, size, data=None, path=None, error=None):
+        self.filename = filename
+        self.hash_value = hash_value
+        self.size = size
+        self.data = data
+        self.path = path
+        self.error = error
+
+    def source(self):
+        """
+        The in-memory contents, or the spooled file path.
+
+        Returns:
+        - bytearray or str: Image source accepted by ImageProcessor.
+        """
+        return self.data if self.data is not None else self.path
+
+    def cleanup(self):
+        """
+        Remove the spooled file, if any.
+
+        Returns:
+        - None
+        """
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class UploadSink:
+
+    """
+    UploadSink: Destination of an uploaded file while the request body is being parsed.
+
+    Data is hashed as it arrives and kept in memory up to the spool threshold, then spooled
+    to a unique file. The format is sniffed from the first bytes. Oversized or unsupported
+    payloads raise 413 or 415 as soon as that is detected, so the rest of the body is never
+    read. Any spooled file not handed over with to_upload is removed on close.
+
+    Methods:
+        - write(chunk: bytes) -> int:
+            Hash, check and store a chunk of the upload.
+
+        - read(size: int = -1) -> bytes, seek(offset: int, whence: int = 0) -> int, tell() -> int:
+            Read the stored upload back like a regular file.
+
+        - close() -> None:
+            Release the buffer and remove the spooled file, if it was not handed over.
+
+        - to_upload(filename: str) -> UploadBuffer:
+            Hand the stored upload over as an UploadBuffer without reading it again.
+
+    Example Usage:
+        sink = UploadSink('tmp_post/spool', spool_threshold=8 * 1024 * 1024, max_bytes=64 * 1024 * 1024,
+                          allowed_formats=IMAGE_FORMATS)
+        sink.write(chunk)
+        upload = sink.to_upload('scan.png')
+    """
+
+    def __init__(self, spool_directory, spool_threshold=8 * 1024 * 1024, max_bytes=None, allowed_formats=None,
+                 filename=None):
+        """
+        Initialize the sink.
+
+        Parameters:
+        - spool_directory (str): Directory for uploads above the threshold.
+        - spool_threshold (int): Largest upload in bytes kept in memory.
+        - max_bytes (int): Largest accepted upload in bytes, or None for no limit.
+        - allowed_formats (tuple): Accepted formats as named by OCRUtility.sniff_format, or None to accept any.
+        - filename (str): Name sent by the client, used for the spool file extension.
+        """
+        self.spool_directory = spool_directory
+        self.spool_threshold = spool_threshold
+        self.max_bytes = max_bytes
+        self.allowed_formats = allowed_formats
+        self.filename = filename
+        self.format = None
+        self.size = 0
+
+        self._hash = hashlib.md5()
+        self._header = bytearray()
+        self._file = io.BytesIO()
+        self._path = None
+        self._sniffed = False
+
+    def write(self, chunk):
+        """Hash, check and store a chunk of the upload."""
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f"Upload exceeds the limit of {self.max_bytes} bytes")
+
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        if not self._sniffed:
+            self._header.extend(chunk[:SNIFF_BYTES - len(self._header)])
+            if len(self._header) >= SNIFF_BYTES:
+                self._check_format()
+
+        if self._path is None and self.size > self.spool_threshold:
+            self._spool()
+        return len(chunk)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=0):
+        if not self._sniffed and self.size:
+            # Uploads shorter than the sniffing window are checked once they are complete
+            self._check_format()
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        """Release the buffer and remove the spooled file, if it was not handed over."""
+        self._file.close()
+        if self._path is not None and os.path.exists(self._path):
+            os.remove(self._path)
+        self._path = None
+
+    def to_upload(self, filename=None):
+        """
+        Hand the stored upload over as an UploadBuffer without reading it again.
+
+        Parameters:
+        - filename (str): Name sent by the client.
+
+        Returns:
+        - UploadBuffer: The upload contents, hash and size; the caller now owns any spooled file.
+        """
+        filename = filename if filename is not None else self.filename
+        if self._path is None:
+            return UploadBuffer(filename, self._hash.hexdigest(), self.size, data=bytearray(self._file.getbuffer()))
+
+        # The spool file now belongs to the UploadBuffer; only its handle is released here
+        self._file.close()
+        path, self._path = self._path, None
+        return UploadBuffer(filename, self._hash.hexdigest(), self.size, path=path)
+
+    def _check_format(self):
+        """Reject the upload if its leading bytes are not one of the allowed formats."""
+        self._sniffed = True
+        self.format = OCRUtility.sniff_format(bytes(self._header))
+        if self.allowed_formats is not None and self.format not in self.allowed_formats:
+            self.close()
+            raise UnsupportedMediaType(f"Unsupported upload format; expected one of: {', '.join(self.allowed_formats)}")
+
+    def _spool(self):
+        """Move the data received so far to a unique spool file and keep writing there."""
+        if not os.path.exists(self.spool_directory):
+            os.makedirs(self.spool_directory, exist_ok=True)
+        _, extension = os.path.splitext(self.filename or '')
+        fd, self._path = tempfile.mkstemp(prefix='upload_', suffix=extension, dir=self.spool_directory)
+        spool_file = os.fdopen(fd, 'w+b')
+        spool_file.write(self._file.getbuffer())
+        self._file.close()
+        self._file = spool_file
 
 
 class OCRUtility:
@@ -13,8 +232,8 @@ class OCRUtility:
     OCRUtility: Utility class for Optical Character Recognition (OCR) operations.
 
     Methods:
-        - resize_photo(photo_path: str, output_path: str, size: tuple = (1920, 1080)) -> None:
-            Resize a photo to the specified dimensions.
+        - resize_photo(photo_path: str, output_path: str, size: tuple = (1920, 1080), grayscale: bool = False) -> None:
+            Shrink a photo to fit within the specified dimensions, keeping its aspect ratio.
 
         - sanitize_name(name: str) -> str:
             Sanitize a name by removing special characters and spaces.
@@ -22,31 +241,58 @@ class OCRUtility:
         - save_uploaded_file(file: FileStorage, upload_directory: str, token: str) -> str:
             Save an uploaded file to the specified directory with organized storage.
 
+        - hash_file(file_path: str, chunk_size: int = 65536) -> str:
+            Compute the MD5 hash of a file on disk.
+
+        - sniff_format(header: bytes) -> str:
+            Name the format of a payload from its leading bytes.
+
+        - read_upload(file: FileStorage, spool_directory: str, spool_threshold: int) -> UploadBuffer:
+            Read an upload once, hashing it and keeping it in memory unless it exceeds the threshold.
+
+        - read_stream(stream: file, filename: str, spool_directory: str, spool_threshold: int) -> UploadBuffer:
+            Read a binary stream in chunks, hashing it and spooling it above the threshold.
+
+        - iter_batch_uploads(files: list, spool_directory: str, spool_threshold: int, max_member_bytes: int = None, max_total_bytes: int = None, max_members: int = None) -> Iterator[UploadBuffer]:
+            Lazily yield the images of a batch upload, expanding ZIP archives member by member.
+
+        - map_bounded(executor: Executor, func: callable, items: iterable, max_in_flight: int) -> Iterator[tuple]:
+            Run func over items with at most max_in_flight pending, yielding results as they complete.
+
     Example Usage:
         ocr_utility = OCRUtility()
         ocr_utility.resize_photo('input_photo.jpg', 'resized_photo.jpg')
         sanitized_name = ocr_utility.sanitize_name('Hello World!')
         saved_path = ocr_utility.save_uploaded_file(uploaded_file, 'uploads', 'example_token')
+        content_hash = ocr_utility.hash_file('input_photo.jpg')
+        upload = ocr_utility.read_upload(uploaded_file, 'uploads/spool', 8 * 1024 * 1024)
     """
 
 
     @staticmethod
-    def resize_photo(photo_path, output_path, size=(1920, 1080)):
+    def resize_photo(photo_path, output_path, size=(1920, 1080), grayscale=False):
         """
-        Resize a photo to the specified dimensions.
+        Shrink a photo to fit within the specified dimensions, keeping its aspect ratio.
+
+        JPEGs are decoded at a reduced scale that is still at least the requested size,
+        which is much cheaper than decoding every pixel of a large camera image.
 
         Parameters:
         - photo_path (str): Path to the input photo.
         - output_path (str): Path to save the resized photo.
-        - size (tuple): Desired dimensions (width, height).
+        - size (tuple): Bounding dimensions (width, height); smaller photos are not enlarged.
+        - grayscale (bool): Decode and save a single-channel image.
 
         Returns:
         - None
         """
         try:
-            image = Image.open(photo_path)
-            rgb_image = image.convert('RGB')
-            resized_image = rgb_image.resize(size)
+            mode = 'L' if grayscale else 'RGB'
+            with Image.open(photo_path) as image:
+                # Lets the JPEG decoder scale by 1/2, 1/4 or 1/8 and convert colour while decoding
+                image.draft(mode, size)
+                resized_image = image.convert(mode)
+            resized_image.thumbnail(size, Image.LANCZOS)
             resized_image.save(output_path)
         except Exception as e:
             print(f"Error resizing photo: {e}")
@@ -65,7 +311,7 @@ class OCRUtility:
         return slugify(name)
 
     @staticmethod
-    def save_uploaded_file(file, upload_directory, token):
+    def save_uploaded_file(file, upload_directory, token, hash_value=None):
         """
         Save an uploaded file to the specified directory with organized storage.
 
@@ -73,6 +319,7 @@ class OCRUtility:
         - file (FileStorage): Uploaded file object.
         - upload_directory (str): Directory to save the file.
         - token (str): Token used for the request.
+        - hash_value (str): Precomputed MD5 of the upload, read from the file if not given.
 
         Returns:
         - str: Path to the saved file.
@@ -84,9 +331,14 @@ class OCRUtility:
             # Get the original file name
             original_filename = file.filename
 
-            # Generate a hash of the original image
-            hash_object = hashlib.md5(file.read())
-            hash_value = hash_object.hexdigest()
+            # Hash the whole upload in chunks, from the start of the stream whatever has consumed it before
+            if hash_value is None:
+                hash_object = hashlib.md5()
+                file.stream.seek(0)
+                for chunk in iter(lambda: file.stream.read(65536), b''):
+                    hash_object.update(chunk)
+                file.stream.seek(0)
+                hash_value = hash_object.hexdigest()
 
             # Create a unique filename based on date, hash, and token
             current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -109,3 +361,236 @@ class OCRUtility:
         except Exception as e:
             print(f"Error saving uploaded file: {e}")
             return None
+
+    @staticmethod
+    def hash_file(file_path, chunk_size=65536):
+        """
+        Compute the MD5 hash of a file on disk.
+
+        Parameters:
+        - file_path (str): Path to the file.
+        - chunk_size (int): Number of bytes read at a time.
+
+        Returns:
+        - str: Hex digest of the file contents.
+        """
+        hash_object = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hash_object.update(chunk)
+        return hash_object.hexdigest()
+
+    @staticmethod
+    def sniff_format(header):
+        """
+        Name the format of a payload from its leading bytes.
+
+        Parameters:
+        - header (bytes): At least the first SNIFF_BYTES bytes of the payload, if it is that long.
+
+        Returns:
+        - str: Format name such as 'jpeg', 'png', 'tiff', 'pdf' or 'zip', or None if it is not recognized.
+        """
+        for name, signature in FORMAT_SIGNATURES:
+            if header.startswith(signature):
+                return name
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return 'webp'
+        if len(header) >= 3 and header[:1] == b'P' and header[1:2] in b'123456' and header[2:3].isspace():
+            return 'pnm'
+        return None
+
+    @staticmethod
+    def read_upload(file, spool_directory, spool_threshold=8 * 1024 * 1024, chunk_size=65536):
+        """
+        Read an upload once, hashing it and keeping it in memory unless it exceeds the threshold.
+
+        Uploads larger than the threshold are spooled to a unique file per request, so
+        concurrent requests never share a path.
+
+        Parameters:
+        - file (FileStorage): Uploaded file object.
+        - spool_directory (str): Directory for uploads above the threshold.
+        - spool_threshold (int): Largest upload in bytes kept in memory.
+        - chunk_size (int): Number of bytes read at a time.
+
+        Returns:
+        - UploadBuffer: The upload contents, hash and size.
+        """
+        if isinstance(file.stream, UploadSink):
+            # Already hashed and spooled while the request body was parsed
+            return file.stream.to_upload(file.filename)
+
+        return OCRUtility.read_stream(file.stream, file.filename, spool_directory, spool_threshold, chunk_size)
+
+    @staticmethod
+    def read_stream(stream, filename, spool_directory, spool_threshold=8 * 1024 * 1024, chunk_size=65536):
+        """
+        Read a binary stream in chunks, hashing it and spooling it above the threshold.
+
+        Parameters:
+        - stream (file): Binary stream positioned at the start of the data.
+        - filename (str): Name recorded with the upload, also used for the spool file extension.
+        - spool_directory (str): Directory for uploads above the threshold.
+        - spool_threshold (int): Largest upload in bytes kept in memory.
+        - chunk_size (int): Number of bytes read at a time.
+
+        Returns:
+        - UploadBuffer: The stream contents, hash and size.
+        """
+        hash_object = hashlib.md5()
+        buffer = bytearray()
+        spool_file = None
+        spool_path = None
+        size = 0
+
+        try:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                hash_object.update(chunk)
+                size += len(chunk)
+
+                if spool_file is None and size > spool_threshold:
+                    if not os.path.exists(spool_directory):
+                        os.makedirs(spool_directory)
+                    _, extension = os.path.splitext(filename or '')
+                    fd, spool_path = tempfile.mkstemp(prefix='upload_', suffix=extension, dir=spool_directory)
+                    spool_file = os.fdopen(fd, 'wb')
+                    spool_file.write(buffer)
+                    buffer = None
+
+                if spool_file is not None:
+                    spool_file.write(chunk)
+                else:
+                    buffer.extend(chunk)
+        except Exception:
+            if spool_file is not None:
+                spool_file.close()
+                os.remove(spool_path)
+            raise
+
+        if spool_file is not None:
+            spool_file.close()
+            return UploadBuffer(filename, hash_object.hexdigest(), size, path=spool_path)
+
+        return UploadBuffer(filename, hash_object.hexdigest(), size, data=buffer)
+
+    @staticmethod
+    def iter_batch_uploads(files, spool_directory, spool_threshold=8 * 1024 * 1024, max_member_bytes=None,
+                           max_total_bytes=None, max_members=None):
+        """
+        Lazily yield the images of a batch upload, expanding ZIP archives member by member.
+
+        The central directories of all archives are checked before anything is read, so an
+        archive with too many members or too many uncompressed bytes is refused with 413 up
+        front. Every member is then read through an UploadSink, which caps its size and sniffs
+        its format like a top-level upload; a member failing those checks is yielded as an
+        UploadBuffer carrying the error, so the rest of the batch still runs.
+
+        Parameters:
+        - files (list): Uploaded FileStorage objects.
+        - spool_directory (str): Directory for uploads above the spool threshold.
+        - spool_threshold (int): Largest upload in bytes kept in memory.
+        - max_member_bytes (int): Largest uncompressed ZIP member in bytes, or None for no limit.
+        - max_total_bytes (int): Largest total of uncompressed ZIP members in bytes, or None for no limit.
+        - max_members (int): Most ZIP members across the batch, or None for no limit.
+
+        Returns:
+        - Iterator[UploadBuffer]: One buffer per image, read only when requested.
+        """
+        archives = {}
+        members = 0
+        total_bytes = 0
+        for file in files:
+            if not zipfile.is_zipfile(file.stream):
+                continue
+            file.stream.seek(0)
+            archive = archives[id(file)] = zipfile.ZipFile(file.stream)
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                members += 1
+                total_bytes += member.file_size
+            if max_members is not None and members > max_members:
+                raise RequestEntityTooLarge(f"Batch archives hold more than {max_members} files")
+            if max_total_bytes is not None and total_bytes > max_total_bytes:
+                raise RequestEntityTooLarge(f"Batch archives expand to more than {max_total_bytes} bytes")
+
+        return OCRUtility._iter_batch_members(files, archives, spool_directory, spool_threshold, max_member_bytes)
+
+    @staticmethod
+    def _iter_batch_members(files, archives, spool_directory, spool_threshold, max_member_bytes, chunk_size=65536):
+        """Yield the uploads of a checked batch, reading ZIP members through size- and format-checking sinks."""
+        for file in files:
+            archive = archives.get(id(file))
+            if archive is None:
+                file.stream.seek(0)
+                yield OCRUtility.read_upload(file, spool_directory, spool_threshold)
+                continue
+
+            with archive:
+                for member in archive.infolist():
+                    if member.is_dir():
+                        continue
+                    if max_member_bytes is not None and member.file_size > max_member_bytes:
+                        yield UploadBuffer(member.filename, None, member.file_size,
+                                           error=f"File exceeds the limit of {max_member_bytes} bytes")
+                        continue
+
+                    # Large members are spooled instead of being inflated into memory
+                    sink = UploadSink(spool_directory, spool_threshold=spool_threshold, max_bytes=max_member_bytes,
+                                      allowed_formats=IMAGE_FORMATS, filename=member.filename)
+                    try:
+                        with archive.open(member) as member_stream:
+                            for chunk in iter(lambda: member_stream.read(chunk_size), b''):
+                                sink.write(chunk)
+                        sink.seek(0)
+                    except HTTPException as e:
+                        sink.close()
+                        yield UploadBuffer(member.filename, None, sink.size, error=e.description)
+                        continue
+                    except BaseException:
+                        sink.close()
+                        raise
+                    yield sink.to_upload(member.filename)
+
+    @staticmethod
+    def map_bounded(executor, func, items, max_in_flight):
+        """
+        Run func over items with at most max_in_flight pending, yielding results as they complete.
+
+        Items are pulled from the iterable only when a slot frees up, so memory stays bounded
+        however many items there are. Pending work is cancelled if the caller stops early.
+
+        Parameters:
+        - executor (Executor): Executor that runs func.
+        - func (callable): Function applied to each item.
+        - items (iterable): Items to process, consumed lazily.
+        - max_in_flight (int): Maximum number of submitted but unfinished items.
+
+        Returns:
+        - Iterator[tuple]: (index, item, completed Future) in completion order.
+        """
+        items = iter(enumerate(items))
+        pending = {}
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(func, item)] = (index, item)
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    yield index, item, future
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,122 @@
+import io
+
+from src.ImageProcessor.ImageProcessor import ImageProcessor
+from src.LazyModule.LazyModule import LazyModule
+
+np = LazyModule('numpy')
+Image = LazyModule('PIL.Image')
+
+
+class PageReader:
+
+    """
+    PageReader: Lazily decode the pages of single images, multi-page TIFFs and PDFs.
+
+    Pages are produced one at a time by a generator, so only the page being decoded is
+    held in memory however long the document is. PDF rendering requires pypdfium2.
+
+    Methods:
+        - detect_format(image_source: str or bytes) -> str:
+            Return 'pdf', 'tiff' or 'image' from the leading magic bytes.
+
+        - iter_pages(image_source: str or bytes) -> Iterator[np.ndarray]:
+            Yield the pages of a document as NumPy arrays, in order.
+
+    Example Usage:
+        reader = PageReader(pdf_dpi=300)
+        for page in reader.iter_pages(upload.source()):
+            text = image_processor.extract_page_text(page)
+    """
+
+    def __init__(self, pdf_dpi=300, max_side=None):
+        """
+        Initialize the reader.
+
+        Parameters:
+        - pdf_dpi (int): Resolution at which PDF pages are rendered.
+        - max_side (int): Longest side of decoded single images, or None for the full resolution.
+        """
+        self.pdf_dpi = pdf_dpi
+        self.max_side = max_side
+
+    @staticmethod
+    def detect_format(image_source):
+        """
+        Return the document format from its leading magic bytes.
+
+        Parameters:
+        - image_source (str or bytes): Path to the file, or its contents.
+
+        Returns:
+        - str: 'pdf', 'tiff' or 'image'.
+        """
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            header = bytes(image_source[:4])
+        else:
+            with open(image_source, 'rb') as f:
+                header = f.read(4)
+
+        if header == b'%PDF':
+            return 'pdf'
+        if header in (b'II*\x00', b'MM\x00*'):
+            return 'tiff'
+        return 'image'
+
+    def iter_pages(self, image_source):
+        """
+        Yield the pages of a document as NumPy arrays, in order.
+
+        Every page is a grayscale (2-D) array. Single images larger than max_side are
+        reduced while they are decoded.
+
+        Parameters:
+        - image_source (str or bytes): Path to the file, or its contents.
+
+        Returns:
+        - Iterator[np.ndarray]: One array per page.
+        """
+        document_format = self.detect_format(image_source)
+
+        if document_format == 'pdf':
+            yield from self._iter_pdf_pages(image_source)
+        elif document_format == 'tiff':
+            yield from self._iter_tiff_pages(image_source)
+        else:
+            image = ImageProcessor._load_image(image_source, self.max_side)
+            if image is None:
+                raise ValueError("Unable to read image")
+            yield image
+
+    @staticmethod
+    def _iter_tiff_pages(image_source):
+        """Yield the frames of a multi-page TIFF, decoding each only when it is reached."""
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            image_source = io.BytesIO(image_source)
+
+        with Image.open(image_source) as image:
+            for index in range(getattr(image, 'n_frames', 1)):
+                image.seek(index)
+                yield np.array(image.convert('L'))
+
+    def _iter_pdf_pages(self, image_source):
+        """Render the pages of a PDF one at a time."""
+        try:
+            import pypdfium2
+        except ImportError:
+            raise ValueError("PDF support requires the pypdfium2 package")
+
+        if isinstance(image_source, (bytearray, memoryview)):
+            image_source = bytes(image_source)
+
+        document = pypdfium2.PdfDocument(image_source)
+        try:
+            for index in range(len(document)):
+                page = document[index]
+                try:
+                    bitmap = page.render(scale=self.pdf_dpi / 72, grayscale=True)
+                    # Copy out of the PDFium buffer, which is released with the bitmap
+                    yield np.array(bitmap.to_numpy()).reshape(bitmap.height, bitmap.width)
+                finally:
+                    page.close()
+        finally:
+            document.close()
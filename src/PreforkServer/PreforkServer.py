@@ -0,0 +1,319 @@
+import os
+import select
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import ThreadedWSGIServer
+
+
+class _WorkerServer(ThreadedWSGIServer):
+
+    """
+    _WorkerServer: Threaded WSGI server with a fixed number of request slots.
+
+    A connection is only accepted once a slot is free, so a busy worker leaves new
+    connections in the shared listen backlog where an idle worker picks them up.
+    """
+
+    def __init__(self, host, port, app, concurrency, ssl_context=None, fd=None):
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        super().__init__(host, port, app, ssl_context=ssl_context, fd=fd)
+
+    def get_request(self):
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            # Another worker won the race for this connection
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+    def drain(self, timeout):
+        """Wait until every in-flight request has finished, or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        for _ in range(self.concurrency):
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+
+class PreforkServer:
+
+    """
+    PreforkServer: Serve a WSGI application from several forked worker processes.
+
+    The master process binds the listening socket once and forks the workers, which all
+    accept from it. Everything the application created before serve_forever, including
+    shared-memory metrics, is inherited by every worker. A worker only starts accepting once
+    its start hook, for example a warm-up, has finished, and reports ready to the master over
+    a pipe. Dead workers are replaced, and the master's lost hook is told about every worker
+    that exited so that state it left behind can be cleaned up.
+
+    Signals sent to the master:
+        - SIGHUP: Graceful reload; start a fresh set of workers and, once they are ready, let the old ones finish their requests and exit.
+        - SIGTERM, SIGINT: Graceful shutdown.
+
+    Methods:
+        - serve_forever() -> None:
+            Bind the socket, start the workers and supervise them until shutdown.
+
+    Private Methods:
+        - _spawn_worker() -> int:
+            Fork a worker process and return its pid.
+
+        - _run_worker(ready_write: int) -> None:
+            Serve requests inside a worker process until it is told to stop.
+
+        - _reload() -> None:
+            Replace all workers without dropping connections.
+
+        - _wait_ready(pids: list, timeout: float) -> list:
+            Wait until workers have reported ready and return those that did not in time.
+
+        - _reap_workers() -> None:
+            Collect exited workers and replace those of the current generation.
+
+        - _stop_workers(pids: list) -> None:
+            Ask workers to finish their requests and exit.
+
+        - _worker_lost(pid: int) -> None:
+            Run the lost hook for an exited worker.
+
+    Example Usage:
+        server = PreforkServer(app, host='0.0.0.0', port=5000, workers=4, worker_concurrency=16)
+        server.serve_forever()
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=None, worker_concurrency=16, ssl_context=None,
+                 graceful_timeout=30, backlog=2048, on_worker_start=None, on_worker_exit=None,
+                 on_worker_lost=None):
+        """
+        Initialize the server.
+
+        Parameters:
+        - app (callable): WSGI application, for example a Flask app.
+        - host (str): Address to listen on.
+        - port (int): Port to listen on.
+        - workers (int): Number of worker processes, defaults to the number of CPU cores.
+        - worker_concurrency (int): Requests a single worker handles at the same time.
+        - ssl_context (tuple or ssl.SSLContext): Certificate and key paths, or a context, to serve HTTPS.
+        - graceful_timeout (float): Seconds a stopping worker may spend finishing its requests.
+        - backlog (int): Length of the shared listen backlog.
+        - on_worker_start (callable): Called without arguments in a worker before it accepts connections, to warm up.
+        - on_worker_exit (callable): Called without arguments in a worker after its last request, to flush state.
+        - on_worker_lost (callable): Called with the pid in the master after a worker exited, however it exited.
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.worker_concurrency = worker_concurrency
+        self.ssl_context = ssl_context
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.on_worker_start = on_worker_start
+        self.on_worker_exit = on_worker_exit
+        self.on_worker_lost = on_worker_lost
+
+        self._socket = None
+        self._generation = 0
+        self._workers = {}
+        self._reload_requested = False
+        self._stopping = False
+
+    def serve_forever(self):
+        """Bind the socket, start the workers and supervise them until shutdown."""
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(self.backlog)
+        # Workers race for each connection; the losers must not block in accept
+        self._socket.setblocking(False)
+
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        print(f"Serving on {self.host}:{self.port} with {self.workers} workers "
+              f"of {self.worker_concurrency} concurrent requests (master pid {os.getpid()})", flush=True)
+        try:
+            for _ in range(self.workers):
+                self._spawn_worker()
+
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                self._reap_workers()
+                time.sleep(0.5)
+        finally:
+            self._stop_workers(list(self._workers))
+            self._socket.close()
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn_worker(self):
+        """Fork a worker process and return its pid."""
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                os.close(ready_read)
+                for _, _, sibling_ready in self._workers.values():
+                    os.close(sibling_ready)
+                self._run_worker(ready_write)
+            except BaseException as e:
+                print(f"Error in worker {os.getpid()}: {e}", flush=True)
+                status = 1
+            finally:
+                # Never fall back into the master's code
+                os._exit(status)
+
+        os.close(ready_write)
+        self._workers[pid] = (self._generation, time.monotonic(), ready_read)
+        return pid
+
+    def _run_worker(self, ready_write):
+        """Serve requests inside a worker process until it is told to stop."""
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        started = time.monotonic()
+        if self.on_worker_start is not None:
+            self.on_worker_start()
+        server = _WorkerServer(self.host, self.port, self.app, self.worker_concurrency,
+                               ssl_context=self.ssl_context, fd=self._socket.fileno())
+        os.write(ready_write, b'1')
+        os.close(ready_write)
+        print(f"Worker {os.getpid()} ready in {time.monotonic() - started:.2f} s", flush=True)
+
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever, so it cannot run on the serving thread itself
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        server.serve_forever()
+        server.drain(self.graceful_timeout)
+        server.server_close()
+        if self.on_worker_exit is not None:
+            self.on_worker_exit()
+
+    def _reload(self):
+        """Replace all workers without dropping connections."""
+        old_workers = list(self._workers)
+        self._generation += 1
+        new_workers = [self._spawn_worker() for _ in range(self.workers)]
+        # Old workers keep serving until the new ones have warmed up
+        late = self._wait_ready(new_workers, self.graceful_timeout)
+        if late:
+            print(f"Reloading: {len(late)} new workers not ready after {self.graceful_timeout} s", flush=True)
+        print(f"Reloading: started {self.workers} workers, stopping {len(old_workers)}", flush=True)
+        for pid in old_workers:
+            self._signal_worker(pid, signal.SIGTERM)
+
+    def _wait_ready(self, pids, timeout):
+        """Wait until workers have reported ready and return those that did not in time."""
+        deadline = time.monotonic() + timeout
+        waiting = {self._workers[pid][2]: pid for pid in pids if pid in self._workers}
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(list(waiting), [], [], remaining)
+            for ready_read in readable:
+                # A worker that died before becoming ready closes its pipe too
+                waiting.pop(ready_read)
+        return list(waiting.values())
+
+    def _reap_workers(self):
+        """Collect exited workers and replace those of the current generation."""
+        while self._workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._workers.clear()
+                return
+            if pid == 0:
+                return
+
+            generation, started, ready_read = self._workers.pop(pid, (None, 0, None))
+            if ready_read is not None:
+                os.close(ready_read)
+            self._worker_lost(pid)
+            if generation != self._generation or self._stopping:
+                continue
+
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; starting a replacement", flush=True)
+            if time.monotonic() - started < 1:
+                # Avoid a fork loop when workers fail right after starting
+                time.sleep(1)
+            self._spawn_worker()
+
+    def _stop_workers(self, pids):
+        """Ask workers to finish their requests and exit, killing those that exceed the graceful timeout."""
+        for pid in pids:
+            self._signal_worker(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                        remaining.discard(pid)
+                except ChildProcessError:
+                    remaining.discard(pid)
+            time.sleep(0.1)
+
+        for pid in remaining:
+            self._signal_worker(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        for pid in pids:
+            worker = self._workers.pop(pid, None)
+            if worker is not None:
+                os.close(worker[2])
+                self._worker_lost(pid)
+
+    def _worker_lost(self, pid):
+        """Run the lost hook for an exited worker, keeping the master alive if it fails."""
+        if self.on_worker_lost is None:
+            return
+        try:
+            self.on_worker_lost(pid)
+        except Exception as e:
+            print(f"Error cleaning up after worker {pid}: {e}", flush=True)
+
+    @staticmethod
+    def _signal_worker(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
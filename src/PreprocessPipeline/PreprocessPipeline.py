@@ -0,0 +1,170 @@
+import threading
+import time
+
+from src.LazyModule.LazyModule import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# Reusable per-thread scratch memory shared by all pipelines
+_scratch = threading.local()
+
+
+def _grayscale(src, dst):
+    """Convert a BGR image to grayscale; grayscale input is copied as is."""
+    if src.ndim == 2:
+        np.copyto(dst, src)
+        return dst
+    return cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=dst)
+
+
+def _gaussian_blur(src, dst):
+    """Apply a 5x5 Gaussian blur to reduce noise."""
+    return cv2.GaussianBlur(src, (5, 5), 0, dst=dst)
+
+
+def _otsu_threshold(src, dst):
+    """Binarize with a global threshold chosen by Otsu's method."""
+    cv2.threshold(src, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+    return dst
+
+
+def _denoise(src, dst):
+    """Remove salt-and-pepper noise with a 3x3 median filter."""
+    return cv2.medianBlur(src, 3, dst=dst)
+
+
+def _adaptive_threshold(src, dst):
+    """Binarize against a local Gaussian-weighted mean, for unevenly lit photos."""
+    return cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15, dst=dst)
+
+
+def _normalize_contrast(src, dst):
+    """Stretch intensities to the full 0-255 range."""
+    return cv2.normalize(src, dst, 0, 255, cv2.NORM_MINMAX)
+
+
+def _morph_open(src, dst):
+    """Remove specks smaller than a 2x2 kernel."""
+    return cv2.morphologyEx(src, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8), dst=dst)
+
+
+def _morph_close(src, dst):
+    """Fill small gaps in strokes with a 2x2 kernel."""
+    return cv2.morphologyEx(src, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8), dst=dst)
+
+
+class PreprocessPipeline:
+
+    """
+    PreprocessPipeline: Declarative sequence of image preprocessing stages.
+
+    Stages ping-pong between two per-thread scratch buffers that are grown on demand and
+    reused for every image, so a run allocates nothing once the buffers are large enough.
+    The returned image is a view into scratch memory and stays valid until the next run on
+    the same thread. Every run can record the time spent in each stage.
+
+    Attributes:
+        - STAGES (dict): Stage name to stage function.
+        - PROFILES (dict): Profile name to list of stage names.
+
+    Methods:
+        - from_request(profile: str = None, stages: str = None, default_profile: str = 'default') -> PreprocessPipeline:
+            Build a pipeline from a profile name or a comma-separated list of stages.
+
+        - run(image: np.ndarray, timings: dict = None) -> np.ndarray:
+            Run all stages on a decoded image.
+
+    Example Usage:
+        pipeline = PreprocessPipeline.from_request(profile='photo')
+        timings = {}
+        preprocessed_image = pipeline.run(image, timings)
+    """
+
+    STAGES = {
+        'grayscale': _grayscale,
+        'gaussian_blur': _gaussian_blur,
+        'otsu_threshold': _otsu_threshold,
+        'denoise': _denoise,
+        'adaptive_threshold': _adaptive_threshold,
+        'normalize_contrast': _normalize_contrast,
+        'morph_open': _morph_open,
+        'morph_close': _morph_close,
+    }
+
+    PROFILES = {
+        'default': ['grayscale', 'gaussian_blur', 'otsu_threshold'],
+        'clean': ['grayscale', 'otsu_threshold'],
+        'photo': ['grayscale', 'normalize_contrast', 'denoise', 'adaptive_threshold'],
+        'noisy_scan': ['grayscale', 'denoise', 'otsu_threshold', 'morph_open'],
+    }
+
+    def __init__(self, stages=None):
+        """
+        Initialize the pipeline.
+
+        Parameters:
+        - stages (list): Stage names, run in order. Grayscale conversion is always run first.
+        """
+        stages = list(stages or self.PROFILES['default'])
+        unknown = [stage for stage in stages if stage not in self.STAGES]
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stage: {', '.join(unknown)}")
+
+        if 'grayscale' in stages:
+            stages.remove('grayscale')
+        self.stages = ['grayscale'] + stages
+
+    @classmethod
+    def from_request(cls, profile=None, stages=None, default_profile='default'):
+        """
+        Build a pipeline from a profile name or a comma-separated list of stages.
+
+        Parameters:
+        - profile (str): Name of a profile in PROFILES.
+        - stages (str): Comma-separated stage names; takes precedence over the profile.
+        - default_profile (str): Profile used when neither is given.
+
+        Returns:
+        - PreprocessPipeline: The requested pipeline.
+        """
+        if stages:
+            return cls([stage.strip() for stage in stages.split(',') if stage.strip()])
+
+        profile = profile or default_profile
+        if profile not in cls.PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {profile}")
+        return cls(cls.PROFILES[profile])
+
+    def run(self, image, timings=None):
+        """
+        Run all stages on a decoded image.
+
+        Parameters:
+        - image (np.ndarray): Decoded BGR or grayscale image; it is never modified.
+        - timings (dict): If given, filled with the milliseconds spent in each stage.
+
+        Returns:
+        - np.ndarray: Preprocessed image, a view into this thread's scratch buffers.
+        """
+        front, back = self._scratch_buffers(image.shape[0], image.shape[1])
+
+        src = image
+        for stage in self.stages:
+            started = time.perf_counter()
+            src = self.STAGES[stage](src, front)
+            if timings is not None:
+                timings[stage] = round((time.perf_counter() - started) * 1000, 3)
+            front, back = back, front
+
+        return src
+
+    @staticmethod
+    def _scratch_buffers(height, width):
+        """Return two height x width uint8 views into this thread's scratch memory."""
+        size = height * width
+        buffers = getattr(_scratch, 'buffers', None)
+        if buffers is None or buffers[0].size < size:
+            buffers = _scratch.buffers = (np.empty(size, np.uint8), np.empty(size, np.uint8))
+
+        return buffers[0][:size].reshape(height, width), buffers[1][:size].reshape(height, width)
@@ -0,0 +1,200 @@
+from src.LazyModule.LazyModule import LazyModule
+from src.OCRConfig.OCRConfig import OCRConfig
+from src.PreprocessPipeline.PreprocessPipeline import PreprocessPipeline
+from src.WordBoxes.WordBoxes import WordBoxes
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+class QualityTier:
+
+    """
+    QualityTier: One rung of the quality ladder.
+
+    Attributes:
+        - name (str): Name reported for results produced by the tier.
+        - scale (float): Factor the decoded image is resized by before preprocessing.
+        - pipeline (PreprocessPipeline): Preprocessing used by the tier, or None for the request's pipeline.
+        - deskew (bool): Straighten the page before preprocessing.
+        - oem (int): Tesseract engine mode used by the tier, or None for the request's.
+    """
+
+    __slots__ = ('name', 'scale', 'pipeline', 'deskew', 'oem')
+
+    def __init__(self, name, scale=1.0, pipeline=None, deskew=False, oem=None):
+        if not 0 < scale <= 1:
+            raise ValueError(f"Scale of quality tier {name} must be in (0, 1]")
+        self.name = name
+        self.scale = scale
+        self.pipeline = pipeline
+        self.deskew = deskew
+        self.oem = oem
+
+    def config(self, config):
+        """Return the OCR configuration of a request with the tier's engine mode applied."""
+        if self.oem is None or self.oem == config.oem:
+            return config
+        return OCRConfig(config.lang, psm=config.psm, oem=self.oem, whitelist=config.whitelist)
+
+    def settings(self):
+        """Settings of the tier that influence the extracted text, for cache keys."""
+        settings = {"name": self.name, "scale": self.scale}
+        if self.pipeline is not None:
+            settings["pipeline"] = self.pipeline.stages
+        if self.deskew:
+            settings["deskew"] = True
+        if self.oem is not None:
+            settings["oem"] = self.oem
+        return settings
+
+
+class QualityLadder:
+
+    """
+    QualityLadder: Cheap OCR first, escalating to more expensive tiers only when the result looks poor.
+
+    The default tiers are 'fast', which reads a downscaled copy with the cheapest
+    preprocessing, 'full', which reads the full resolution with the request's pipeline, and
+    'enhanced', which adds deskewing, heavier preprocessing and optionally a slower engine
+    mode. A tier's result is accepted when the mean word confidence and the coverage, the
+    share of ink in the preprocessed image that lies inside recognized words, both reach
+    their thresholds. Otherwise the next tier runs; the last tier's result is always kept.
+    Clean documents are therefore read once at a fraction of the pixels.
+
+    Methods:
+        - tiers_for(shape: tuple) -> list:
+            Tiers worth running for an image of the given shape.
+
+        - resize(image: np.ndarray, tier: QualityTier) -> np.ndarray:
+            Resize a decoded image for a tier.
+
+        - assess(words: WordBoxes, preprocessed_image: np.ndarray) -> tuple:
+            Return the mean word confidence and the ink coverage of a result.
+
+        - accepts(confidence: float, coverage: float) -> bool:
+            Return True if a result is good enough to stop escalating.
+
+        - rescale(words: WordBoxes, factor: float) -> WordBoxes:
+            Map word boxes of a resized image back to the original coordinates.
+
+        - settings() -> dict:
+            Settings that influence the extracted text, for cache keys.
+
+    Example Usage:
+        ladder = QualityLadder(min_confidence=80, min_coverage=0.6, fast_scale=0.5)
+        for tier in ladder.tiers_for(image.shape):
+            ...
+    """
+
+    def __init__(self, min_confidence=80.0, min_coverage=0.6, fast_scale=0.5, enhanced_profile='photo',
+                 enhanced_oem=None, min_side=1000, tiers=None):
+        """
+        Initialize the ladder.
+
+        Parameters:
+        - min_confidence (float): Lowest mean word confidence, 0 to 100, accepted without escalating.
+        - min_coverage (float): Lowest share of ink, 0 to 1, that must lie inside recognized words.
+        - fast_scale (float): Resize factor of the fast tier.
+        - enhanced_profile (str): Preprocessing profile of the enhanced tier.
+        - enhanced_oem (int): Tesseract engine mode of the enhanced tier, or None to keep the request's.
+        - min_side (int): Downscaled tiers are skipped when they would make the longest side shorter than this.
+        - tiers (list): QualityTier list replacing the default tiers, cheapest first.
+        """
+        self.min_confidence = min_confidence
+        self.min_coverage = min_coverage
+        self.min_side = min_side
+        self.tiers = tiers or [
+            QualityTier('fast', scale=fast_scale, pipeline=PreprocessPipeline.from_request(profile='clean')),
+            QualityTier('full'),
+            QualityTier('enhanced', pipeline=PreprocessPipeline.from_request(profile=enhanced_profile), deskew=True,
+                        oem=enhanced_oem),
+        ]
+
+    def tiers_for(self, shape):
+        """
+        Tiers worth running for an image of the given shape.
+
+        Parameters:
+        - shape (tuple): Shape of the decoded image.
+
+        Returns:
+        - list: Tiers in order; downscaled tiers are left out for images that are already small.
+        """
+        longest = max(shape[:2])
+        tiers = [tier for tier in self.tiers[:-1] if tier.scale == 1 or longest * tier.scale >= self.min_side]
+        return tiers + self.tiers[-1:]
+
+    @staticmethod
+    def resize(image, tier):
+        """Resize a decoded image for a tier; full-scale tiers get the image itself."""
+        if tier.scale == 1:
+            return image
+        height, width = image.shape[:2]
+        return cv2.resize(image, (max(1, round(width * tier.scale)), max(1, round(height * tier.scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def assess(words, preprocessed_image):
+        """
+        Return the mean word confidence and the ink coverage of a result.
+
+        Parameters:
+        - words (WordBoxes): Words recognized in the preprocessed image.
+        - preprocessed_image (np.ndarray): Image the words were recognized in, dark text on white.
+
+        Returns:
+        - tuple: (mean confidence from 0 to 100, share of ink inside word boxes from 0 to 1); an
+          image without ink has nothing left to find and scores (100, 1).
+        """
+        ink = (preprocessed_image < 128).view(np.uint8)
+        total = int(np.count_nonzero(ink))
+        if not total:
+            return 100.0, 1.0
+
+        confidences = words.confidence[words.confidence >= 0]
+        confidence = float(confidences.mean()) if len(confidences) else 0.0
+        if not len(words):
+            return confidence, 0.0
+
+        # Ink inside every box from four lookups in the summed-area table
+        height, width = ink.shape[:2]
+        table = cv2.integral(ink)
+        left = np.clip(words.left, 0, width)
+        top = np.clip(words.top, 0, height)
+        right = np.clip(words.left + words.width, 0, width)
+        bottom = np.clip(words.top + words.height, 0, height)
+        covered = (table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]).sum()
+        return confidence, min(1.0, float(covered) / total)
+
+    def accepts(self, confidence, coverage):
+        """Return True if a result is good enough to stop escalating."""
+        return confidence >= self.min_confidence and coverage >= self.min_coverage
+
+    @staticmethod
+    def rescale(words, factor):
+        """
+        Map word boxes of a resized image back to the original coordinates.
+
+        Parameters:
+        - words (WordBoxes): Words recognized in the resized image.
+        - factor (float): Original size divided by the resized size.
+
+        Returns:
+        - WordBoxes: Words with boxes in original coordinates.
+        """
+        if factor == 1:
+            return words
+        columns = {name: getattr(words, name) for name in ('block', 'paragraph', 'line', 'confidence')}
+        for name in ('left', 'top', 'width', 'height'):
+            columns[name] = np.rint(getattr(words, name) * factor)
+        return WordBoxes(columns, words.offsets, words.blob)
+
+    def settings(self):
+        """Settings that influence the extracted text, for cache keys."""
+        return {
+            "min_confidence": self.min_confidence,
+            "min_coverage": self.min_coverage,
+            "min_side": self.min_side,
+            "tiers": [tier.settings() for tier in self.tiers],
+        }
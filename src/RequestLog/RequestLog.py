@@ -0,0 +1,143 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+class LogRecord:
+
+    """
+    LogRecord: Compact record of a single request.
+
+    Attributes:
+        - timestamp (float): Time the request was logged, in seconds since the epoch.
+        - unique_id (str): Identifier of the request.
+        - source (str): Remote address of the client.
+        - message (str): Log message.
+        - headers (dict): Request headers, or None when header logging is disabled.
+    """
+
+    __slots__ = ('timestamp', 'unique_id', 'source', 'message', 'headers')
+
+    def __init__(self, timestamp, unique_id, source, message, headers=None):
+        self.timestamp = timestamp
+        self.unique_id = unique_id
+        self.source = source
+        self.message = message
+        self.headers = headers
+
+    def lines(self):
+        """
+        Render the record as display lines.
+
+        Returns:
+        - list: Header line, optional request headers and the message.
+        """
+        stamp = datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d:%H:%M:%S")
+        lines = [f"[{stamp}] Unique ID: {self.unique_id}"]
+        if self.headers:
+            lines.extend(f"{key}: {value}" for key, value in self.headers.items())
+        lines.append(self.message)
+        return lines
+
+    def to_dict(self):
+        """
+        Return the record as a JSON-serializable dict.
+
+        Returns:
+        - dict: Record fields.
+        """
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class RequestLog:
+
+    """
+    RequestLog: Fixed-capacity ring buffer of request log records.
+
+    Once full, every new record overwrites the oldest one, so memory use is bounded however
+    long the server runs. Records can also be written to a rotating file, which keeps the
+    history that has left memory.
+
+    Methods:
+        - append(record: LogRecord) -> None:
+            Add a record, overwriting the oldest one when full.
+
+        - page(number: int, per_page: int) -> tuple:
+            Return one page of records, newest first, and the number of pages.
+
+    Example Usage:
+        requests_log = RequestLog(capacity=1000, log_file='tmp_post/requests.log')
+        requests_log.append(LogRecord(time.time(), unique_id, '127.0.0.1', 'SRC: 127.0.0.1'))
+        records, total_pages = requests_log.page(1, 50)
+    """
+
+    def __init__(self, capacity=1000, log_file=None, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """
+        Initialize the log.
+
+        Parameters:
+        - capacity (int): Number of records kept in memory.
+        - log_file (str): Path of the rotating on-disk log, or None to keep records in memory only.
+        - max_bytes (int): Size at which the on-disk log is rotated.
+        - backup_count (int): Number of rotated files kept.
+        """
+        self.capacity = capacity
+        self._records = [None] * capacity
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self._sink = None
+        if log_file:
+            self._sink = logging.getLogger(f"{__name__}.{log_file}")
+            self._sink.propagate = False
+            self._sink.setLevel(logging.INFO)
+            if not self._sink.handlers:
+                handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                self._sink.addHandler(handler)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, record):
+        """
+        Add a record, overwriting the oldest one when full.
+
+        Parameters:
+        - record (LogRecord): Record to add.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            self._records[self._next] = record
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+        if self._sink is not None:
+            self._sink.info(json.dumps(record.to_dict()))
+
+    def page(self, number, per_page=50):
+        """
+        Return one page of records, newest first.
+
+        Parameters:
+        - number (int): Page number, starting at 1; clamped to the valid range.
+        - per_page (int): Records per page.
+
+        Returns:
+        - tuple: (list of LogRecord, total number of pages)
+        """
+        with self._lock:
+            total_pages = max(1, -(-self._count // per_page))
+            number = min(max(1, number), total_pages)
+
+            start = (number - 1) * per_page
+            stop = min(start + per_page, self._count)
+            newest = self._next - 1
+            records = [self._records[(newest - offset) % self.capacity] for offset in range(start, stop)]
+
+        return records, total_pages
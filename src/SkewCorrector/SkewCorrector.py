@@ -0,0 +1,210 @@
+from src.LazyModule.LazyModule import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# cv2.rotate codes by counter-clockwise quarter turn
+_QUARTER_TURNS = {90: 'ROTATE_90_COUNTERCLOCKWISE', 180: 'ROTATE_180', 270: 'ROTATE_90_CLOCKWISE'}
+
+
+class SkewCorrector:
+
+    """
+    SkewCorrector: Fast deskew and 90-degree orientation pre-pass, without tesseract's OSD.
+
+    Works on a downscaled, binarized copy. Every connected component (roughly a character)
+    contributes the bottom centre of its box, and those points line up on the baselines.
+    The skew is the rotation under which the points' row histogram is sharpest: all
+    candidate angles are scored at once with one vectorized histogram, first coarsely and
+    then finely around the best. Text turned by a quarter turn lines up along the right
+    edges of its components instead, and upside-down Latin text has more ink below its
+    lines' x-height band (descenders) than above it (ascenders and capitals). The
+    full-resolution image is then rotated once, which dominates the cost.
+
+    Methods:
+        - estimate(gray: np.ndarray) -> tuple:
+            Return the counter-clockwise quarter-turn orientation and skew angle that straighten the image.
+
+        - correct(gray: np.ndarray) -> tuple:
+            Return the straightened image with the orientation and skew applied.
+
+    Private Methods:
+        - _binarize(gray: np.ndarray) -> np.ndarray:
+            Downscale and binarize an image, ink as 1.
+
+        - _baseline_points(boxes: np.ndarray, shape: tuple, turned: bool) -> np.ndarray:
+            Bottom centres of component boxes around the image centre, optionally for the page turned clockwise.
+
+        - _best_skew(points: np.ndarray) -> tuple:
+            Return the skew angle with the sharpest row profile and its score.
+
+        - _profile_scores(points: np.ndarray, angles: np.ndarray) -> np.ndarray:
+            Score the row profile sharpness of points at several angles at once.
+
+        - _upside_down(binary: np.ndarray) -> bool:
+            Return True if the text lines of an upright binary image are upside down.
+
+        - _rotate(image: np.ndarray, orientation: int, skew: float, border: int) -> np.ndarray:
+            Apply a quarter-turn orientation and a skew rotation.
+
+    Example Usage:
+        corrector = SkewCorrector(max_angle=15)
+        straightened, orientation, skew = corrector.correct(gray)
+    """
+
+    def __init__(self, max_angle=15.0, detect_orientation=True, max_side=800, min_angle=0.1, min_components=10):
+        """
+        Initialize the corrector.
+
+        Parameters:
+        - max_angle (float): Largest skew searched, in degrees either way.
+        - detect_orientation (bool): Also detect pages turned by 90, 180 or 270 degrees.
+        - max_side (int): Longest side of the downscaled copy used for the estimate.
+        - min_angle (float): Skews below this many degrees are left alone.
+        - min_components (int): Fewest character-sized components needed for an estimate.
+        """
+        self.max_angle = max_angle
+        self.detect_orientation = detect_orientation
+        self.max_side = max_side
+        self.min_angle = min_angle
+        self.min_components = min_components
+
+    def estimate(self, gray):
+        """
+        Return the rotation that straightens an image.
+
+        Parameters:
+        - gray (np.ndarray): Grayscale image with dark text on a light background.
+
+        Returns:
+        - tuple: (orientation, skew); orientation is 0, 90, 180 or 270 and skew is in degrees,
+          both counter-clockwise and applied in that order.
+        """
+        binary = self._binarize(gray)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        # Drop the background and specks of noise
+        boxes = stats[1:]
+        boxes = boxes[(boxes[:, cv2.CC_STAT_AREA] >= 4) & (boxes[:, cv2.CC_STAT_HEIGHT] >= 3)
+                      & (boxes[:, cv2.CC_STAT_WIDTH] >= 2)]
+        if len(boxes) < self.min_components:
+            return 0, 0.0
+
+        orientation = 0
+        skew, score = self._best_skew(self._baseline_points(boxes, binary.shape, False))
+        if self.detect_orientation:
+            turned_skew, turned_score = self._best_skew(self._baseline_points(boxes, binary.shape, True))
+            if turned_score > 1.2 * score:
+                orientation, skew = 270, turned_skew
+            if self._upside_down(self._rotate(binary, orientation, skew, 0)):
+                orientation = (orientation + 180) % 360
+
+        return orientation, (skew if abs(skew) >= self.min_angle else 0.0)
+
+    def correct(self, gray):
+        """
+        Return the straightened image.
+
+        Parameters:
+        - gray (np.ndarray): Grayscale image with dark text on a light background.
+
+        Returns:
+        - tuple: (image, orientation, skew); the image is the input itself when nothing was rotated.
+        """
+        orientation, skew = self.estimate(gray)
+        if not orientation and not skew:
+            return gray, 0, 0.0
+        return self._rotate(gray, orientation, skew, 255), orientation, skew
+
+    def _binarize(self, gray):
+        """Downscale and binarize an image, ink as 1."""
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.max_side / max(height, width))
+        small = gray if scale == 1.0 else cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                                     interpolation=cv2.INTER_AREA)
+        # A local threshold copes with the uneven lighting of phone photos
+        return cv2.adaptiveThreshold(small, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+
+    @staticmethod
+    def _baseline_points(boxes, shape, turned):
+        """Bottom centres of component boxes around the image centre, optionally for the page turned clockwise."""
+        x = boxes[:, cv2.CC_STAT_LEFT].astype(np.float32) - shape[1] / 2
+        y = boxes[:, cv2.CC_STAT_TOP].astype(np.float32) - shape[0] / 2
+        width = boxes[:, cv2.CC_STAT_WIDTH]
+        height = boxes[:, cv2.CC_STAT_HEIGHT]
+        if turned:
+            # After a clockwise quarter turn, a box's right edge becomes its bottom
+            return np.stack((-(y + height / 2), x + width))
+        return np.stack((x + width / 2, y + height))
+
+    def _best_skew(self, points):
+        """Return the skew angle, in degrees counter-clockwise, with the sharpest row profile and its score."""
+        coarse = np.arange(-self.max_angle, self.max_angle + 0.25, 0.5)
+        best = coarse[int(np.argmax(self._profile_scores(points, coarse)))]
+
+        fine = np.arange(best - 0.5, best + 0.525, 0.05)
+        scores = self._profile_scores(points, fine)
+        index = int(np.argmax(scores))
+        return round(float(fine[index]), 2), float(scores[index])
+
+    @staticmethod
+    def _profile_scores(points, angles):
+        """
+        Score the row profile sharpness of points at several angles at once.
+
+        Each point gets the row it would land in after rotating the image counter-clockwise by
+        each angle; the sum of the squared histogram counts is largest when the text lines
+        collapse into few rows, so the best angle is the rotation that straightens them.
+
+        Parameters:
+        - points (np.ndarray): 2 x N float32 coordinates (x, y) around the image centre.
+        - angles (np.ndarray): Candidate rotations in degrees, counter-clockwise.
+
+        Returns:
+        - np.ndarray: Score of every angle.
+        """
+        radians = np.deg2rad(angles).astype(np.float32)
+        # Same convention as cv2.getRotationMatrix2D: y' = y * cos(a) - x * sin(a)
+        rows = np.outer(np.cos(radians), points[1]) - np.outer(np.sin(radians), points[0])
+        radius = int(np.abs(points).sum(axis=0).max()) + 1
+        bins = 2 * radius + 1
+        indices = np.rint(rows).astype(np.int64) + radius + bins * np.arange(len(angles))[:, None]
+        counts = np.bincount(indices.ravel(), minlength=bins * len(angles)).reshape(len(angles), bins)
+        return (counts.astype(np.float64) ** 2).sum(axis=1)
+
+    @staticmethod
+    def _upside_down(binary):
+        """Return True if the text lines of an upright binary image are upside down."""
+        profile = binary.sum(axis=1).astype(np.float64)
+        if not profile.any():
+            return False
+
+        # Text lines are runs of rows with ink; their x-height band holds the densest rows
+        inked = profile > 0.05 * profile.max()
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], inked.astype(np.int8), [0]))))
+        above = below = 0.0
+        for start, end in zip(edges[::2], edges[1::2]):
+            if end - start < 4:
+                continue
+            line = profile[start:end]
+            core = np.flatnonzero(line >= 0.5 * line.max())
+            above += line[:core[0]].sum()
+            below += line[core[-1] + 1:].sum()
+
+        return below > 1.25 * above and below - above > 0.01 * profile.sum()
+
+    @staticmethod
+    def _rotate(image, orientation, skew, border):
+        """Apply a quarter-turn orientation and then a skew rotation, both counter-clockwise, growing the canvas."""
+        if orientation:
+            image = cv2.rotate(image, getattr(cv2, _QUARTER_TURNS[orientation]))
+        if not skew:
+            return image
+
+        height, width = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_width, new_height = int(height * sin + width * cos + 0.5), int(height * cos + width * sin + 0.5)
+        matrix[0, 2] += (new_width - width) / 2
+        matrix[1, 2] += (new_height - height) / 2
+        return cv2.warpAffine(image, matrix, (new_width, new_height), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=border)
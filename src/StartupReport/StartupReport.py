@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+
+from src.LazyModule.LazyModule import LazyModule
+
+
+class StartupReport:
+
+    """
+    StartupReport: Wall-clock breakdown of server startup.
+
+    Phases are either timed explicitly with phase() or recorded with mark(), which attributes
+    the time since the previous phase to a name. Together with the import times of the lazy
+    modules loaded so far, this shows where startup and worker respawn time goes.
+
+    Methods:
+        - phase(name: str) -> context manager:
+            Time a named phase.
+
+        - mark(name: str) -> None:
+            Record the time since the previous phase under a name.
+
+        - total() -> float:
+            Seconds covered by all recorded phases.
+
+        - to_dict() -> dict:
+            Phases, lazy module imports and the total, in seconds.
+
+        - summary() -> str:
+            One-line human-readable report.
+
+    Example Usage:
+        startup = StartupReport()
+        with startup.phase('import'):
+            from src.OCRServer.OCRServer import OCRServer
+        startup.mark('init')
+        print(startup.summary())
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a named phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.phases.append((name, self._last - started))
+
+    def mark(self, name):
+        """Record the time since the previous phase under a name."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        """Seconds covered by all recorded phases."""
+        return sum(seconds for _, seconds in self.phases)
+
+    def to_dict(self):
+        """
+        Phases, lazy module imports and the total, in seconds.
+
+        Returns:
+        - dict: Startup report.
+        """
+        return {
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases},
+            "lazy_imports": {name: round(seconds, 4) for name, seconds in LazyModule.loaded().items()},
+            "total": round(self.total(), 4),
+        }
+
+    def summary(self):
+        """One-line human-readable report."""
+        phases = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        return f"Startup {self.total() * 1000:.0f} ms ({phases})"
@@ -0,0 +1,121 @@
+from src.LazyModule.LazyModule import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+class TextRegionDetector:
+
+    """
+    TextRegionDetector: Cheap detector of text blocks in large, mostly empty images.
+
+    Works on a downscaled copy: a morphological gradient highlights stroke edges, Otsu
+    thresholding keeps the strong ones and a wide closing merges characters into lines and
+    lines into blocks. Block contours are scaled back to full resolution, padded, merged
+    where they overlap and returned in reading order.
+
+    Methods:
+        - detect(gray: np.ndarray) -> list:
+            Return (x, y, width, height) boxes of text blocks in reading order.
+
+    Example Usage:
+        detector = TextRegionDetector()
+        for x, y, width, height in detector.detect(preprocessed_image):
+            crop = preprocessed_image[y:y + height, x:x + width]
+    """
+
+    def __init__(self, max_side=1024, min_area_ratio=0.0005, padding=8, max_coverage=0.6):
+        """
+        Initialize the detector.
+
+        Parameters:
+        - max_side (int): Longest side of the downscaled copy used for detection.
+        - min_area_ratio (float): Smallest block kept, as a fraction of the image area.
+        - padding (int): Pixels added around every block at full resolution.
+        - max_coverage (float): If blocks cover more than this fraction of the image, none are
+          returned, since full-frame OCR is then at least as cheap.
+        """
+        self.max_side = max_side
+        self.min_area_ratio = min_area_ratio
+        self.padding = padding
+        self.max_coverage = max_coverage
+
+    def detect(self, gray):
+        """
+        Return the boxes of text blocks in reading order.
+
+        Parameters:
+        - gray (np.ndarray): Grayscale or binarized image.
+
+        Returns:
+        - list: (x, y, width, height) tuples at full resolution; empty if nothing useful was found.
+        """
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.max_side / max(height, width))
+        small = gray if scale == 1.0 else cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                                     interpolation=cv2.INTER_AREA)
+
+        gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+        _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Join characters into lines, then neighbouring lines into blocks
+        line_width = max(3, small.shape[1] // 60)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (line_width, 1)))
+        mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area = self.min_area_ratio * small.shape[0] * small.shape[1]
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < min_area or h < 4 or w < 4:
+                continue
+
+            # Scale back to full resolution and pad
+            x0 = max(0, int(x / scale) - self.padding)
+            y0 = max(0, int(y / scale) - self.padding)
+            x1 = min(width, int((x + w) / scale) + self.padding)
+            y1 = min(height, int((y + h) / scale) + self.padding)
+            boxes.append((x0, y0, x1, y1))
+
+        boxes = self._merge_overlapping(boxes)
+        covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+        if not boxes or covered > self.max_coverage * width * height:
+            return []
+
+        return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in self._reading_order(boxes)]
+
+    @staticmethod
+    def _merge_overlapping(boxes):
+        """Merge (x0, y0, x1, y1) boxes until none overlap."""
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in boxes:
+                for index, other in enumerate(result):
+                    if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                        result[index] = (min(box[0], other[0]), min(box[1], other[1]),
+                                         max(box[2], other[2]), max(box[3], other[3]))
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            boxes = result
+        return boxes
+
+    @staticmethod
+    def _reading_order(boxes):
+        """Sort boxes top to bottom, and left to right among boxes sharing a band of rows."""
+        boxes = sorted(boxes, key=lambda box: box[1])
+        rows = []
+        for box in boxes:
+            centre = (box[1] + box[3]) / 2
+            if rows and rows[-1][0] <= centre <= rows[-1][1]:
+                rows[-1][2].append(box)
+                rows[-1][1] = max(rows[-1][1], box[3])
+            else:
+                rows.append([box[1], box[3], [box]])
+
+        return [box for _, _, row in rows for box in sorted(row, key=lambda box: box[0])]
@@ -0,0 +1,249 @@
+import struct
+from array import array
+
+from src.LazyModule.LazyModule import LazyModule
+
+np = LazyModule('numpy')
+
+# Numeric columns in serialization order, with their array type codes
+COLUMNS = (
+    ('block', 'i'),
+    ('paragraph', 'i'),
+    ('line', 'i'),
+    ('left', 'i'),
+    ('top', 'i'),
+    ('width', 'i'),
+    ('height', 'i'),
+    ('confidence', 'f'),
+)
+
+# Binary layout: magic, version, word count, text blob size; then the columns, offsets and text
+_HEADER = struct.Struct('<4sBxxxII')
+_MAGIC = b'OCRW'
+_VERSION = 1
+
+
+class WordBoxes:
+
+    """
+    WordBoxes: Recognized words with their boxes, layout ids and confidences, stored column by column.
+
+    Every numeric attribute is one typed NumPy array and all words share a single UTF-8 blob
+    indexed by an offsets array, so a page with a hundred thousand words is a handful of
+    objects rather than a hundred thousand dicts. Results are built from tesseract's TSV
+    output and serialized as columnar JSON or as a compact little-endian binary format.
+
+    Attributes:
+        - block, paragraph, line (np.ndarray): int32 layout ids of every word.
+        - left, top, width, height (np.ndarray): int32 bounding box of every word in pixels.
+        - confidence (np.ndarray): float32 recognition confidence of every word, 0 to 100.
+        - offsets (np.ndarray): uint32 start of every word in the text blob, plus its end.
+        - blob (bytes): UTF-8 text of all words, concatenated.
+
+    Methods:
+        - from_tsv(tsv: str, left: int = 0, top: int = 0) -> WordBoxes:
+            Parse the words of tesseract's TSV output.
+
+        - concatenate(parts: list) -> WordBoxes:
+            Join results, renumbering blocks so they stay unique.
+
+        - word(index: int) -> str:
+            Text of a single word.
+
+        - text() -> str:
+            Plain text with words joined into lines and paragraphs separated by blank lines.
+
+        - to_json() -> dict:
+            Columnar JSON-serializable form.
+
+        - from_json(data: dict) -> WordBoxes:
+            Rebuild a result from its columnar JSON form.
+
+        - to_bytes() -> bytes:
+            Compact binary form.
+
+        - from_bytes(data: bytes) -> WordBoxes:
+            Rebuild a result from its binary form.
+
+    Example Usage:
+        words = WordBoxes.from_tsv(pytesseract.image_to_data(image))
+        print(len(words), words.word(0), words.left[0], words.confidence[0])
+        payload = words.to_bytes()
+    """
+
+    MIMETYPE = 'application/x-ocr-words'
+
+    def __init__(self, columns=None, offsets=None, blob=b''):
+        """
+        Initialize a result from its columns.
+
+        Parameters:
+        - columns (dict): Column name to array-like of equal length; missing columns are empty.
+        - offsets (array-like): Start of every word in the blob, followed by the blob size.
+        - blob (bytes): UTF-8 text of all words, concatenated.
+        """
+        columns = columns or {}
+        for name, typecode in COLUMNS:
+            dtype = np.int32 if typecode == 'i' else np.float32
+            setattr(self, name, np.asarray(columns.get(name, ()), dtype=dtype))
+        self.offsets = np.asarray(offsets if offsets is not None else (0,), dtype=np.uint32)
+        self.blob = bytes(blob)
+
+        if len(self.offsets) != len(self) + 1 or any(len(getattr(self, name)) != len(self) for name, _ in COLUMNS):
+            raise ValueError("Word box columns differ in length")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_tsv(cls, tsv, left=0, top=0):
+        """
+        Parse the words of tesseract's TSV output.
+
+        Parameters:
+        - tsv (str): Output of image_to_data or GetTSVText, with or without the header line.
+        - left (int): Horizontal offset added to every box, for text recognized in a crop.
+        - top (int): Vertical offset added to every box.
+
+        Returns:
+        - WordBoxes: Words of the page; empty words are skipped.
+        """
+        columns = {name: array(typecode) for name, typecode in COLUMNS}
+        offsets = array('I', (0,))
+        blob = bytearray()
+
+        for row in tsv.splitlines():
+            # level, page, block, paragraph, line, word, left, top, width, height, confidence, text
+            fields = row.split('\t', 11)
+            if len(fields) < 12 or fields[0] != '5' or not fields[11].strip():
+                continue
+            columns['block'].append(int(fields[2]))
+            columns['paragraph'].append(int(fields[3]))
+            columns['line'].append(int(fields[4]))
+            columns['left'].append(int(fields[6]) + left)
+            columns['top'].append(int(fields[7]) + top)
+            columns['width'].append(int(fields[8]))
+            columns['height'].append(int(fields[9]))
+            columns['confidence'].append(float(fields[10]))
+            blob += fields[11].strip().encode('utf-8')
+            offsets.append(len(blob))
+
+        return cls({name: np.frombuffer(column, dtype=column.typecode) for name, column in columns.items()},
+                   np.frombuffer(offsets, dtype=np.uint32), blob)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        Join results, renumbering blocks so they stay unique.
+
+        Parameters:
+        - parts (list): WordBoxes in reading order, for example one per text region.
+
+        Returns:
+        - WordBoxes: All words of the parts.
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls()
+
+        columns = {name: np.concatenate([getattr(part, name) for part in parts]) for name, _ in COLUMNS}
+        block_base = 0
+        blob_base = 0
+        blocks = []
+        offsets = [np.zeros(1, dtype=np.uint32)]
+        for part in parts:
+            blocks.append(part.block + block_base)
+            block_base += int(part.block.max()) + 1
+            offsets.append(part.offsets[1:] + blob_base)
+            blob_base += len(part.blob)
+        columns['block'] = np.concatenate(blocks)
+
+        return cls(columns, np.concatenate(offsets), b''.join(part.blob for part in parts))
+
+    def word(self, index):
+        """Text of a single word."""
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def text(self):
+        """
+        Plain text with words joined into lines and paragraphs separated by blank lines.
+
+        Returns:
+        - str: Text in the layout of tesseract's plain text output.
+        """
+        if not len(self):
+            return ""
+
+        lines = []
+        words = []
+        previous = None
+        for index in range(len(self)):
+            position = (self.block[index], self.paragraph[index], self.line[index])
+            if previous is not None and position != previous:
+                lines.append(" ".join(words))
+                words = []
+                if position[:2] != previous[:2]:
+                    lines.append("")
+            words.append(self.word(index))
+            previous = position
+        lines.append(" ".join(words))
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        """
+        Columnar JSON-serializable form.
+
+        Returns:
+        - dict: 'words' with the word texts and one list per numeric column.
+        """
+        data = {"words": [self.word(index) for index in range(len(self))]}
+        for name, typecode in COLUMNS:
+            column = getattr(self, name)
+            data[name] = column.astype(np.float64).round(2).tolist() if typecode == 'f' else column.tolist()
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        """Rebuild a result from its columnar JSON form."""
+        encoded = [word.encode('utf-8') for word in data.get("words", ())]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(word) for word in encoded], dtype=np.uint32)
+        return cls({name: data.get(name, ()) for name, _ in COLUMNS}, offsets, b''.join(encoded))
+
+    def to_bytes(self):
+        """
+        Compact binary form.
+
+        A 16-byte header (magic 'OCRW', version, word count, text size) is followed by every
+        column of COLUMNS in order as little-endian int32 or float32, the word count + 1 uint32
+        text offsets and the UTF-8 text.
+
+        Returns:
+        - bytes: Encoded result.
+        """
+        chunks = [_HEADER.pack(_MAGIC, _VERSION, len(self), len(self.blob))]
+        for name, typecode in COLUMNS:
+            chunks.append(getattr(self, name).astype('<i4' if typecode == 'i' else '<f4').tobytes())
+        chunks.append(self.offsets.astype('<u4').tobytes())
+        chunks.append(self.blob)
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a result from its binary form, raising ValueError if it is malformed."""
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated word box data")
+        magic, version, count, blob_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not word box data of a supported version")
+        if len(data) != _HEADER.size + 4 * (len(COLUMNS) * count + count + 1) + blob_size:
+            raise ValueError("Truncated word box data")
+
+        position = _HEADER.size
+        columns = {}
+        for name, typecode in COLUMNS:
+            columns[name] = np.frombuffer(data, dtype='<i4' if typecode == 'i' else '<f4', count=count, offset=position)
+            position += 4 * count
+        offsets = np.frombuffer(data, dtype='<u4', count=count + 1, offset=position)
+        position += 4 * (count + 1)
+        return cls(columns, offsets, data[position:])
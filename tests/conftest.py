@@ -0,0 +1,90 @@
+import io
+import os
+import stat
+import sys
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+PROJECT_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_PATH))
+
+# Stand-in for the tesseract binary: answers the version and language queries pytesseract makes, and "recognizes"
+# an image as HELLO followed by a digest of its bytes, so different images give different, predictable text
+FAKE_TESSERACT = '''#!{python}
+import hashlib
+import sys
+
+args = sys.argv[1:]
+if '--version' in args:
+    print('tesseract 5.3.0')
+    sys.exit(0)
+if '--list-langs' in args:
+    print('List of available languages in "/fake" (2):')
+    print('deu')
+    print('eng')
+    sys.exit(0)
+
+source, output = args[0], args[1]
+with open(source, 'rb') as image:
+    digest = hashlib.md5(image.read()).hexdigest()[:8]
+if any('tessedit_create_tsv=1' in arg for arg in args) or args[-1] == 'tsv':
+    with open(output + '.tsv', 'w') as result:
+        result.write('level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext\\n')
+        result.write('5\\t1\\t1\\t1\\t1\\t1\\t10\\t10\\t50\\t20\\t95.5\\tHELLO\\n')
+        result.write('5\\t1\\t1\\t1\\t1\\t2\\t70\\t10\\t50\\t20\\t90.0\\t' + digest + '\\n')
+else:
+    with open(output + '.txt', 'w') as result:
+        result.write('HELLO ' + digest + '\\n')
+'''
+
+
+@pytest.fixture(scope='session')
+def fake_tesseract(tmp_path_factory):
+    """Put the fake tesseract first on PATH for the whole session."""
+    directory = tmp_path_factory.mktemp('bin')
+    executable = directory / 'tesseract'
+    executable.write_text(FAKE_TESSERACT.format(python=sys.executable))
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    path = os.environ.get('PATH', '')
+    os.environ['PATH'] = f"{directory}{os.pathsep}{path}"
+    yield executable
+    os.environ['PATH'] = path
+
+
+def make_png(seed=0, size=(60, 120)):
+    """Encode a small grayscale PNG whose bytes differ for every seed."""
+    image = np.full(size, 255, np.uint8)
+    cv2.putText(image, str(seed), (5, size[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def make_zip(members):
+    """Build a ZIP archive in memory from (name, bytes) pairs."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server(fake_tesseract, tmp_path, monkeypatch):
+    """OCRServer running OCR in-process on the fake tesseract, with its files under a temporary directory."""
+    from src.OCRServer.OCRServer import OCRServer
+
+    monkeypatch.chdir(tmp_path)
+    ocr_server = OCRServer(cache_size=64, cache_directory='', ocr_workers=0, warm_up=False,
+                           archive_directory=str(tmp_path / 'archive'), max_upload_bytes=1024 * 1024)
+    ocr_server.app.config['WTF_CSRF_ENABLED'] = False
+    yield ocr_server
+    ocr_server.shutdown()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from src.AdmissionController.AdmissionController import AdmissionController, AdmissionRejected
+from src.Deadline.Deadline import Deadline, DeadlineExceeded
+
+
+def test_deadline_counts_from_its_start():
+    deadline = Deadline(10, start=time.time() - 4)
+    assert 5.5 < deadline.remaining() <= 6
+    assert not deadline.expired()
+    assert deadline.timeout(2) == 2
+
+
+def test_expired_deadline_raises():
+    deadline = Deadline(1, start=time.time() - 2)
+    assert deadline.expired()
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check('OCR')
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout()
+
+
+def test_check_margin_counts_as_past_the_deadline():
+    deadline = Deadline(0.5)
+    deadline.check('OCR')
+    with pytest.raises(DeadlineExceeded):
+        deadline.check('OCR', margin=1)
+
+
+def test_deadline_must_be_positive():
+    with pytest.raises(ValueError):
+        Deadline(0)
+
+
+def rejection(controller, client='client', deadline=None):
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(client, deadline)
+    return rejected.value
+
+
+def test_client_limit_applies_per_client():
+    controller = AdmissionController(capacity=4, max_per_client=2)
+    tickets = [controller.admit('a'), controller.admit('a')]
+    assert rejection(controller, 'a').reason == 'client_limit'
+    assert controller.admit('b') is not None
+
+    tickets[0].release()
+    tickets[0].release()
+    assert controller.in_flight('a') == 1
+    assert controller.admit('a') is not None
+
+
+def test_requests_within_capacity_are_admitted_with_any_deadline():
+    controller = AdmissionController(capacity=2, min_deadline=0.05)
+    assert controller.estimated_wait() == 0
+    controller.admit('a', Deadline(0.1))
+    controller.admit('b', Deadline(0.1))
+    assert controller.in_flight() == 2
+
+
+def test_deadline_shorter_than_the_wait_is_refused_as_busy():
+    controller = AdmissionController(capacity=1, average_seconds=2.0)
+    controller.admit('a')
+    assert controller.estimated_wait() == 2.0
+
+    rejected = rejection(controller, deadline=Deadline(1))
+    assert rejected.reason == 'deadline'
+    assert rejected.retry_after >= 1
+    assert controller.admit('c', Deadline(10)) is not None
+
+
+def test_deadline_below_the_minimum_is_refused_as_too_short():
+    controller = AdmissionController(capacity=4, min_deadline=0.05)
+    rejected = rejection(controller, deadline=Deadline(0.0001))
+    assert rejected.reason == 'deadline_too_short'
+    assert rejected.retry_after is None
+    assert 'too short' in str(rejected)
+
+
+def test_deadline_passed_before_admission_is_refused_as_expired():
+    controller = AdmissionController(capacity=4)
+    rejected = rejection(controller, deadline=Deadline(1, start=time.time() - 2))
+    assert rejected.reason == 'deadline_expired'
+    assert rejected.retry_after is None
+    assert controller.in_flight() == 0
+
+
+def test_release_updates_the_average_service_time():
+    controller = AdmissionController(capacity=1, average_seconds=10.0)
+    controller.admit('a').release()
+    controller.admit('a').release(record=False)
+    controller.admit('a')
+    assert controller.estimated_wait() < 10.0 * 0.9
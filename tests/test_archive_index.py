@@ -0,0 +1,72 @@
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import PROJECT_PATH, make_png
+from src.ArchiveIndex.ArchiveIndex import ArchiveIndex
+from src.ArchiveWriter.ArchiveWriter import ArchiveWriter
+from src.OCRUtility.OCRUtility import UploadBuffer
+
+
+def upload(seed):
+    data = make_png(seed)
+    return UploadBuffer(f"scan{seed}.png", f"{seed:032x}", len(data), data=bytearray(data))
+
+
+@pytest.fixture
+def archive_directory(tmp_path):
+    return tmp_path / 'archive'
+
+
+@pytest.fixture
+def index(archive_directory):
+    return ArchiveIndex(str(archive_directory / 'archive_index.sqlite3'), str(archive_directory))
+
+
+def write(archive_directory, index, count):
+    writer = ArchiveWriter(str(archive_directory), index=index)
+    for seed in range(count):
+        assert writer.submit(upload(seed), f"scan{seed}.png", {'extracted_text': f"text {seed}"}, token=f"token{seed}")
+    return writer
+
+
+def test_written_uploads_are_found_by_hash_token_and_time(archive_directory, index):
+    started = time.time()
+    writer = write(archive_directory, index, 3)
+    assert writer.flush(timeout=10)
+
+    found = index.find(hash_value=f"{1:032x}")
+    assert [item["token"] for item in found] == ['token1']
+    assert index.read(found[0]) == make_png(1)
+    assert json.loads(index.read(found[0], 'result'))["result"] == {'extracted_text': 'text 1'}
+
+    assert index.find(token='token2')[0]["filename"] == 'scan2.png'
+    assert len(index.find(start=started - 1, end=time.time() + 1)) == 3
+    assert index.find(start=time.time() + 60) == []
+    writer.close()
+
+
+def test_rebuild_script_recreates_the_index(archive_directory, index, tmp_path):
+    writer = write(archive_directory, index, 3)
+    writer.close()
+    database = tmp_path / 'rebuilt.sqlite3'
+
+    completed = subprocess.run([sys.executable, str(PROJECT_PATH / 'scripts' / 'rebuild_archive_index.py'),
+                                str(archive_directory), '--database', str(database)],
+                               capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr
+    assert 'Indexed 3 uploads' in completed.stderr
+
+    rebuilt = ArchiveIndex(str(database), str(archive_directory))
+    found = rebuilt.find(token='token0')
+    assert len(found) == 1
+    assert rebuilt.read(found[0]) == make_png(0)
+
+
+def test_rebuild_script_fails_for_a_missing_directory(tmp_path):
+    completed = subprocess.run([sys.executable, str(PROJECT_PATH / 'scripts' / 'rebuild_archive_index.py'),
+                                str(tmp_path / 'missing')], capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 1
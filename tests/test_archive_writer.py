@@ -0,0 +1,78 @@
+import json
+import zipfile
+
+import pytest
+
+from conftest import make_png
+from src.ArchiveIndex.ArchiveIndex import ArchiveIndex
+from src.ArchiveWriter.ArchiveWriter import ArchiveWriter
+from src.OCRUtility.OCRUtility import UploadBuffer
+
+
+def upload(seed):
+    data = make_png(seed)
+    return UploadBuffer(f"scan{seed}.png", f"{seed:032x}", len(data), data=bytearray(data))
+
+
+@pytest.fixture
+def archive_directory(tmp_path):
+    return tmp_path / 'archive'
+
+
+def test_batches_are_appended_to_one_archive_per_window(archive_directory):
+    writer = ArchiveWriter(str(archive_directory), batch_size=2)
+    for seed in range(5):
+        assert writer.submit(upload(seed), f"scan{seed}.png", {'extracted_text': f"text {seed}"})
+    writer.close()
+
+    archives = list(archive_directory.rglob('*.zip'))
+    assert len(archives) == 1
+    with zipfile.ZipFile(archives[0]) as archive:
+        names = archive.namelist()
+        assert len(names) == 10
+        image = next(name for name in names if name.endswith('scan3.png'))
+        assert archive.read(image) == make_png(3)
+        result = json.loads(archive.read(image.rsplit('/', 1)[0] + '/result.json'))
+        assert result["result"] == {'extracted_text': 'text 3'}
+    assert writer.stats()["written"] == 5
+
+
+def test_members_are_readable_before_the_archive_is_completed(archive_directory):
+    index = ArchiveIndex(str(archive_directory / 'archive_index.sqlite3'), str(archive_directory))
+    writer = ArchiveWriter(str(archive_directory), index=index, idle_close=60)
+    for seed in range(2):
+        writer.submit(upload(seed), f"scan{seed}.png", token=f"token{seed}")
+    assert writer.flush(timeout=10)
+
+    # The central directory is not written yet, but the indexed local headers are
+    for item in index.find():
+        assert index.read(item) == make_png(int(item["hash"], 16))
+    writer.close()
+
+    archives = list(archive_directory.rglob('*.zip'))
+    assert len(zipfile.ZipFile(archives[0]).namelist()) == 4
+
+
+def test_byte_bound_drops_uploads_beyond_the_budget(archive_directory):
+    size = len(make_png(0))
+    writer = ArchiveWriter(str(archive_directory), max_queued_bytes=int(size * 1.5), policy='drop')
+    # Without the writer thread the first entry stays queued
+    writer._ensure_thread = lambda: None
+    assert writer.submit(upload(0), 'a.png')
+    assert not writer.submit(upload(1), 'b.png')
+    stats = writer.stats()
+    assert stats["dropped"] == 1
+    assert stats["queued_bytes"] == size
+
+
+def test_spooled_uploads_are_handed_over_to_the_writer(archive_directory, tmp_path):
+    spooled = tmp_path / 'upload.png'
+    spooled.write_bytes(make_png(9))
+    buffer = UploadBuffer('scan9.png', f"{9:032x}", spooled.stat().st_size, path=str(spooled))
+
+    writer = ArchiveWriter(str(archive_directory))
+    assert writer.submit(buffer, 'scan9.png')
+    assert buffer.path is None
+    writer.close()
+    assert not spooled.exists()
+    assert list(tmp_path.glob('*.archive')) == []
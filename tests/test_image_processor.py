@@ -0,0 +1,35 @@
+import io
+
+from conftest import make_png
+from src.ImageProcessor.ImageProcessor import ImageProcessor
+from src.OCRCache.OCRCache import OCRCache
+
+
+def test_decode_resolution_is_part_of_the_settings():
+    assert "max_decode_side" not in ImageProcessor().settings()
+    assert ImageProcessor(target_dpi=300).settings()["max_decode_side"] == round(300 * 11.7)
+    assert (OCRCache.make_key('abc', ImageProcessor(target_dpi=300).settings())
+            != OCRCache.make_key('abc', ImageProcessor(target_dpi=150).settings()))
+
+
+def test_changing_target_dpi_misses_the_cache(fake_tesseract, tmp_path, monkeypatch):
+    from src.OCRServer.OCRServer import OCRServer
+
+    monkeypatch.chdir(tmp_path)
+    data = make_png(1)
+
+    def post(target_dpi):
+        server = OCRServer(cache_size=64, cache_directory=str(tmp_path / 'cache'), ocr_workers=0, warm_up=False,
+                           target_dpi=target_dpi, archive_index=False)
+        server.app.config['WTF_CSRF_ENABLED'] = False
+        try:
+            response = server.app.test_client().post('/process_image', data={'image': (io.BytesIO(data), 'a.png')},
+                                                     content_type='multipart/form-data')
+            return response.get_json()["cached"]
+        finally:
+            server.shutdown()
+
+    assert post(None) is False
+    assert post(None) is True
+    assert post(100) is False
+    assert post(100) is True
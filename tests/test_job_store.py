@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.JobQueue.JobQueue import JobQueue, JobStore, QueueFull
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite3'))
+
+
+def test_job_moves_from_queued_to_running_to_done(store):
+    store.create('job', 'a.png')
+    assert store.get('job')["status"] == 'queued'
+
+    store.mark_running('job')
+    job = store.get('job')
+    assert job["status"] == 'running'
+    assert job["started"] is not None
+
+    store.mark_done('job', {'extracted_text': 'HELLO'})
+    job = store.get('job')
+    assert job["status"] == 'done'
+    assert job["result"] == {'extracted_text': 'HELLO'}
+    assert job["finished"] >= job["started"]
+
+
+def test_failed_job_keeps_its_error(store):
+    store.create('job', 'a.png')
+    store.mark_failed('job', 'broken image')
+    job = store.get('job')
+    assert (job["status"], job["error"], job["result"]) == ('failed', 'broken image', None)
+
+
+def test_restart_fails_incomplete_jobs_and_purge_drops_old_ones(store):
+    store.create('queued', None)
+    store.create('running', None)
+    store.mark_running('running')
+    store.create('done', None)
+    store.mark_done('done', {})
+
+    assert store.fail_incomplete('restarted') == 2
+    assert store.get('running')["error"] == 'restarted'
+    assert store.get('done')["status"] == 'done'
+
+    assert store.purge(older_than=-1) == 3
+    assert store.get('done') is None
+
+
+def test_unknown_job_is_none(store):
+    assert store.get('missing') is None
+
+
+def test_queue_runs_jobs_and_refuses_when_full(store):
+    release = threading.Event()
+
+    def handler(payload):
+        release.wait(5)
+        if payload == 'fail':
+            raise ValueError('bad payload')
+        return {'payload': payload}
+
+    jobs = JobQueue(handler, store, max_queued=1, workers=1)
+    running = jobs.submit('first')
+    while jobs.get(running)["status"] != 'running':
+        time.sleep(0.01)
+    failing = jobs.submit('fail')
+    with pytest.raises(QueueFull) as refused:
+        jobs.submit('third')
+    assert refused.value.retry_after >= 1
+
+    release.set()
+    deadline = time.time() + 5
+    while jobs.get(failing)["status"] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.01)
+    assert jobs.get(running)["result"] == {'payload': 'first'}
+    assert jobs.get(failing)["error"] == 'bad payload'
+
+
+def test_exited_worker_fails_only_its_own_unfinished_jobs(store):
+    store.create('mine', None)
+    store.create('running', None)
+    store.mark_running('running')
+    store.create('done', None)
+    store.mark_done('done', {})
+
+    assert store.fail_owned(os.getpid() + 1, 'worker exited') == 0
+    assert store.fail_owned(os.getpid(), 'worker exited') == 2
+    assert store.get('mine')["status"] == 'failed'
+    assert store.get('running')["error"] == 'worker exited'
+    assert store.get('done')["status"] == 'done'
+
+
+def test_store_adds_owner_column_to_old_databases(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, "
+                           "created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT)")
+    store = JobStore(path)
+    store.create('job', None)
+    assert store.fail_owned(os.getpid(), 'worker exited') == 1
@@ -0,0 +1,92 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from src.NearDuplicateIndex.NearDuplicateIndex import NearDuplicateIndex
+
+SETTINGS = {'lang': 'eng'}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / 'near.sqlite3'), hash_size=16, max_distance=10)
+
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_fingerprint_survives_rescaling(index):
+    rng = np.random.default_rng(0)
+    page = cv2.GaussianBlur(rng.integers(0, 256, (400, 300), dtype=np.uint8), (31, 31), 0)
+    smaller = cv2.resize(page, (240, 320), interpolation=cv2.INTER_AREA)
+    distance = bin(index.fingerprint(page) ^ index.fingerprint(smaller)).count('1')
+    assert distance <= index.max_distance
+
+
+def test_find_returns_closest_match_within_distance(index):
+    base = random.Random(1).getrandbits(256)
+    index.add(base, SETTINGS, 'exact')
+    index.add(flip(base, range(0, 40, 8)), SETTINGS, 'five_bits')
+
+    assert index.find(base, SETTINGS) == ('exact', 0)
+    assert index.find(flip(base, [3, 100]), SETTINGS) == ('exact', 2)
+
+
+def test_find_respects_the_distance_bound_exactly(index):
+    base = random.Random(2).getrandbits(256)
+    index.add(base, SETTINGS, 'key')
+    # Bits spread over the fingerprint, so every chunk differs once the distance is over the limit
+    assert index.find(flip(base, range(0, 250, 25)), SETTINGS) == ('key', 10)
+    assert index.find(flip(base, range(0, 253, 23)), SETTINGS) is None
+
+
+def test_find_never_matches_unrelated_fingerprints(index):
+    rng = random.Random(3)
+    for number in range(500):
+        index.add(rng.getrandbits(256), SETTINGS, f"key{number}")
+    assert all(index.find(rng.getrandbits(256), SETTINGS) is None for _ in range(50))
+
+
+def test_find_is_scoped_to_settings_and_honours_remove(index):
+    base = random.Random(4).getrandbits(256)
+    index.add(base, SETTINGS, 'key')
+    assert index.find(base, {'lang': 'deu'}) is None
+
+    index.remove('key')
+    assert index.find(base, SETTINGS) is None
+
+
+def test_shared_margins_do_not_crowd_every_bucket(index):
+    # Pages with identical top and bottom rows differ only in their middle rows
+    rng = random.Random(5)
+    for number in range(300):
+        index.add(rng.getrandbits(128) << 64, SETTINGS, f"key{number}")
+    target = rng.getrandbits(128) << 64
+    chunks = index._chunks(target)
+    connection = index._connection()
+    sizes = [connection.execute("SELECT COUNT(*) FROM fingerprint_chunks WHERE position = ? AND value = ?",
+                                (position, value)).fetchone()[0] for position, value in enumerate(chunks)]
+    assert max(sizes) < 30
+
+
+def test_crowded_buckets_are_read_up_to_the_candidate_limit(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'near.sqlite3'), hash_size=8, max_distance=4, max_candidates=5)
+    for number in range(50):
+        index.add(0, SETTINGS, f"old{number}")
+    index.add(1, SETTINGS, 'newest')
+    # Every bucket holds all 51 entries; only the newest few of each are compared
+    assert index.find(1, SETTINGS) == ('newest', 0)
+
+
+def test_index_is_rebuilt_for_another_layout(tmp_path):
+    path = str(tmp_path / 'near.sqlite3')
+    base = random.Random(6).getrandbits(256)
+    NearDuplicateIndex(path, max_distance=10).add(base, SETTINGS, 'key')
+
+    reopened = NearDuplicateIndex(path, max_distance=4)
+    assert reopened.find(flip(base, [0, 1, 2]), SETTINGS) == ('key', 3)
@@ -0,0 +1,73 @@
+import os
+
+from src.OCRCache.OCRCache import OCRCache
+
+
+def test_make_key_depends_on_content_and_settings():
+    key = OCRCache.make_key('abc', {'lang': 'eng'})
+    assert key == OCRCache.make_key('abc', {'lang': 'eng'})
+    assert key != OCRCache.make_key('abd', {'lang': 'eng'})
+    assert key != OCRCache.make_key('abc', {'lang': 'deu'})
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = OCRCache(max_entries=2, cache_directory=None)
+    cache.put('a', 'text a')
+    cache.put('b', 'text b')
+    assert cache.get('a') == 'text a'
+
+    cache.put('c', 'text c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'text a'
+    assert cache.get('c') == 'text c'
+    stats = cache.stats()
+    assert stats["memory_evictions"] == 1
+    assert stats["memory_entries"] == 2
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart_and_promotes_to_memory(tmp_path):
+    directory = str(tmp_path / 'cache')
+    OCRCache(max_entries=4, cache_directory=directory).put('a' * 64, {'words': ['x']})
+
+    cache = OCRCache(max_entries=4, cache_directory=directory)
+    assert cache.get('a' * 64) == {'words': ['x']}
+    assert cache.get('a' * 64) == {'words': ['x']}
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_files_over_limit(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = OCRCache(max_entries=1, cache_directory=directory, max_disk_bytes=400)
+    keys = [f"{index:02d}" + 'f' * 62 for index in range(8)]
+    for index, key in enumerate(keys):
+        cache.put(key, 'x' * 40)
+        path = cache._disk_path(key)
+        os.utime(path, (index, index))
+
+    stats = cache.stats()
+    assert stats["disk_evictions"] > 0
+    assert stats["disk_bytes"] <= 400
+    # The newest entry is kept on disk, the oldest one is gone
+    assert cache._read_disk(keys[-1]) == 'x' * 40
+    assert cache._read_disk(keys[0]) is None
+
+
+def test_disabled_tiers_cache_nothing():
+    cache = OCRCache(max_entries=0, cache_directory='')
+    cache.put('a', 'text')
+    assert cache.get('a') is None
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def test_first_write_after_restart_counts_the_new_file_once(tmp_path):
+    directory = str(tmp_path / 'cache')
+    OCRCache(cache_directory=directory).put('a' * 64, 'x' * 100)
+
+    cache = OCRCache(cache_directory=directory)
+    cache.put('b' * 64, 'y' * 100)
+    on_disk = sum(os.path.getsize(path) for path in cache._iter_disk_files())
+    assert cache.stats()["disk_bytes"] == on_disk
@@ -0,0 +1,24 @@
+import cv2
+import numpy as np
+import pytest
+
+from conftest import make_png
+from src.OCREngine.OCREngine import OCREngine, tesserocr_available
+from src.WordBoxes.WordBoxes import WordBoxes
+
+
+@pytest.fixture
+def engine(fake_tesseract):
+    ocr_engine = OCREngine(workers=1, job_timeout=30)
+    yield ocr_engine
+    ocr_engine.shutdown()
+
+
+@pytest.mark.skipif(tesserocr_available(), reason="workers use the resident tesserocr model")
+def test_workers_fall_back_to_the_tesseract_binary(engine):
+    image = cv2.imdecode(np.frombuffer(make_png(1), np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    assert engine.extract_text(image).startswith('HELLO ')
+    words = engine.extract_text(image, words=True)
+    assert isinstance(words, WordBoxes)
+    assert len(engine.pools()) == 1
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import json
+import time
+
+from conftest import make_png, make_zip
+from src.WordBoxes.WordBoxes import WordBoxes
+
+
+def post_image(client, data, name='scan.png', endpoint='/process_image', **fields):
+    fields['image'] = (io.BytesIO(data), name)
+    return client.post(endpoint, data=fields, content_type='multipart/form-data')
+
+
+def test_process_image_runs_ocr_then_serves_the_cache(client):
+    data = make_png(1)
+    first = post_image(client, data)
+    assert first.status_code == 200
+    assert first.get_json()["cached"] is False
+    # The fake tesseract names the image it was given; a preprocessed copy, not the upload itself
+    assert first.get_json()["extracted_text"].startswith('HELLO ')
+
+    second = post_image(client, data)
+    assert second.get_json()["cached"] is True
+    assert second.get_json()["extracted_text"] == first.get_json()["extracted_text"]
+
+
+def test_failed_extractions_are_not_cached(client):
+    broken = b'\x89PNG\r\n\x1a\n' + bytes(64)
+    for _ in range(2):
+        response = post_image(client, broken)
+        assert response.get_json()["cached"] is False
+        assert response.get_json()["extracted_text"].startswith('Error processing image')
+    assert client.get('/cache/stats').get_json()["memory_entries"] == 0
+
+
+def test_jobs_are_queued_and_polled(client):
+    response = post_image(client, make_png(7), endpoint='/jobs')
+    assert response.status_code == 202
+    result_url = response.get_json()["result_url"]
+
+    deadline = time.time() + 20
+    result = client.get(result_url)
+    while result.status_code == 202 and time.time() < deadline:
+        time.sleep(0.05)
+        result = client.get(result_url)
+    assert result.status_code == 200
+    assert result.get_json()["extracted_text"].startswith('HELLO ')
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+def test_uploads_are_checked_before_ocr(client):
+    assert post_image(client, b'just some text, not an image', name='notes.txt').status_code == 415
+    assert post_image(client, make_png()[:16] + bytes(2 * 1024 * 1024)).status_code == 413
+
+
+def test_process_batch_reports_rejected_zip_members(client):
+    archive = make_zip([('a.png', make_png(5)), ('notes.txt', b'not an image')])
+    response = client.post('/process_batch', content_type='multipart/form-data', data={
+        'images': [(io.BytesIO(make_png(6)), 'single.png'), (io.BytesIO(archive), 'pages.zip')]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    results = {line["filename"]: line for line in lines if "filename" in line}
+    assert results['single.png']["status"] == 'success'
+    assert results['a.png']["status"] == 'success'
+    assert results['notes.txt']["status"] == 'error'
+    assert lines[-1] == {"status": "complete", "processed": 2, "errors": 1}
+
+
+def test_metrics_count_the_upload_stage(client):
+    post_image(client, make_png(9))
+    metrics = client.get('/metrics').data.decode()
+    assert 'ocr_stage_seconds_count{stage="upload"} 1' in metrics
+
+
+def test_word_output_as_json_and_binary(client):
+    data = make_png(2)
+    words = post_image(client, data, output='words').get_json()["words"]
+    assert words["words"][0] == 'HELLO'
+    assert words["left"] == [10, 70]
+
+    response = client.post('/process_image', data={'image': (io.BytesIO(data), 'scan.png'), 'output': 'words'},
+                           headers={'Accept': WordBoxes.MIMETYPE})
+    assert response.mimetype == WordBoxes.MIMETYPE
+    assert WordBoxes.from_bytes(response.data).word(0) == 'HELLO'
+    assert client.post('/process_image', data={'output': 'pdf'}).status_code == 400
+
+
+def test_archived_uploads_are_found_by_token(server, client):
+    data = make_png(8)
+    token = post_image(client, data).get_json()["archive_token"]
+    assert server.archive_writer.flush(timeout=10)
+
+    uploads = client.get('/archive', query_string={'token': token}).get_json()["uploads"]
+    assert len(uploads) == 1
+    assert uploads[0]["hash"] == hashlib.md5(data).hexdigest()
+    assert client.get('/archive', query_string={'start': 'yesterday'}).status_code == 400
+
+
+def test_invalid_and_too_short_deadlines(client):
+    assert post_image(client, make_png(3), deadline='soon').status_code == 400
+    response = post_image(client, make_png(3), deadline='0.0001')
+    assert response.status_code == 400
+    assert 'too short' in response.get_json()["message"]
+    assert 'Retry-After' not in response.headers
+    assert post_image(client, make_png(3), deadline='30').status_code == 200
+
+
+def test_client_limit_answers_429(server, client):
+    server.admission.max_per_client = 1
+    ticket = server.admission.admit('127.0.0.1')
+    try:
+        response = post_image(client, make_png(4))
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+    finally:
+        ticket.release()
+    assert post_image(client, make_png(4)).status_code == 200
+    assert server.admission.in_flight() == 0
+
+
+def test_demo_goes_through_admission_control(server, client):
+    server.admission.max_per_client = 1
+    ticket = server.admission.admit('127.0.0.1')
+    try:
+        response = client.post('/demo', data={'image': (io.BytesIO(make_png(10)), 'scan.png')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 429
+    finally:
+        ticket.release()
+
+    response = client.post('/demo', data={'image': (io.BytesIO(make_png(10)), 'scan.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert b'HELLO' in response.data
@@ -0,0 +1,21 @@
+import os
+
+from src.PreforkServer.PreforkServer import PreforkServer
+
+
+def test_master_reports_every_reaped_worker():
+    lost = []
+    server = PreforkServer(app=None, workers=1, on_worker_lost=lost.append)
+    ready_read, ready_write = os.pipe()
+    os.close(ready_write)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    server._workers[pid] = (server._generation, 0, ready_read)
+    # A stopping master reaps without starting replacements
+    server._stopping = True
+
+    os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+    server._reap_workers()
+    assert lost == [pid]
+    assert server._workers == {}
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from conftest import make_png, make_zip
+from src.OCRUtility.OCRUtility import IMAGE_FORMATS, OCRUtility, UploadSink
+
+
+def fill(sink, data, chunk_size=7):
+    for start in range(0, len(data), chunk_size):
+        sink.write(data[start:start + chunk_size])
+    sink.seek(0)
+    return sink
+
+
+def test_sink_hashes_and_keeps_small_uploads_in_memory(tmp_path):
+    data = make_png()
+    upload = fill(UploadSink(str(tmp_path), allowed_formats=IMAGE_FORMATS), data).to_upload('a.png')
+    assert upload.data == data
+    assert upload.path is None
+    assert upload.size == len(data)
+    assert upload.hash_value == hashlib.md5(data).hexdigest()
+
+
+def test_sink_spools_large_uploads_and_removes_unclaimed_files(tmp_path):
+    data = make_png(size=(400, 400))
+    sink = fill(UploadSink(str(tmp_path), spool_threshold=100, filename='a.png'), data)
+    upload = sink.to_upload()
+    assert sink.closed
+    assert upload.data is None
+    with open(upload.path, 'rb') as spooled:
+        assert spooled.read() == data
+    upload.cleanup()
+
+    sink = fill(UploadSink(str(tmp_path), spool_threshold=100, filename='b.png'), data)
+    sink.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_sink_rejects_uploads_over_the_limit(tmp_path):
+    sink = UploadSink(str(tmp_path), spool_threshold=10, max_bytes=100)
+    with pytest.raises(RequestEntityTooLarge):
+        fill(sink, make_png())
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('data', [b'hello world, plain text', b'%PDF-1.7\n' + bytes(20), b'GIF'])
+def test_sink_rejects_formats_outside_the_allowed_ones(tmp_path, data):
+    with pytest.raises(UnsupportedMediaType):
+        fill(UploadSink(str(tmp_path), allowed_formats=IMAGE_FORMATS), data)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (b'\xff\xd8\xff\xe0' + bytes(8), 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n' + bytes(4), 'png'),
+    (b'II*\x00' + bytes(8), 'tiff'),
+    (b'RIFF\x00\x00\x00\x00WEBP', 'webp'),
+    (b'P5\n', 'pnm'),
+    (b'PK\x03\x04' + bytes(8), 'zip'),
+    (b'plain text', None),
+])
+def test_sniff_format(header, expected):
+    assert OCRUtility.sniff_format(header) == expected
+
+
+def batch(tmp_path, files, spool_threshold=8 * 1024 * 1024, **limits):
+    storages = [FileStorage(io.BytesIO(data), filename=name) for name, data in files]
+    return list(OCRUtility.iter_batch_uploads(storages, str(tmp_path), spool_threshold, **limits))
+
+
+def test_batch_expands_zip_members(tmp_path):
+    image = make_png(1)
+    uploads = batch(tmp_path, [('single.png', make_png(2)), ('pages.zip', make_zip([('dir/', b''), ('a.png', image)]))])
+    assert [upload.filename for upload in uploads] == ['single.png', 'a.png']
+    assert uploads[1].data == image
+    assert all(upload.error is None for upload in uploads)
+
+
+def test_batch_reports_non_image_and_oversized_members(tmp_path):
+    archive = make_zip([('notes.txt', b'not an image at all'), ('big.png', make_png()[:16] + bytes(5000)),
+                        ('ok.png', make_png())])
+    uploads = batch(tmp_path, [('pages.zip', archive)], max_member_bytes=4000)
+    errors = {upload.filename: upload.error for upload in uploads}
+    assert 'Unsupported upload format' in errors['notes.txt']
+    assert 'exceeds the limit' in errors['big.png']
+    assert errors['ok.png'] is None
+
+
+def test_batch_refuses_archives_with_too_many_members(tmp_path):
+    archive = make_zip([(f"{index}.png", make_png(index)) for index in range(4)])
+    with pytest.raises(RequestEntityTooLarge):
+        batch(tmp_path, [('pages.zip', archive)], max_members=3)
+
+
+def test_batch_refuses_archives_expanding_beyond_the_total_limit(tmp_path):
+    # Zeros compress to almost nothing, so the archive itself stays tiny
+    archive = make_zip([('a.png', make_png()[:16] + bytes(200000)), ('b.png', make_png()[:16] + bytes(200000))])
+    assert len(archive) < 5000
+    with pytest.raises(RequestEntityTooLarge):
+        batch(tmp_path, [('bomb.zip', archive)], max_total_bytes=300000)
+
+
+def test_spooled_batch_members_do_not_keep_files_open(tmp_path):
+    archive = make_zip([(f"{index}.png", make_png(index, size=(200, 200))) for index in range(20)])
+    before = len(os.listdir('/proc/self/fd'))
+    uploads = batch(tmp_path, [('pages.zip', archive)], spool_threshold=100)
+    assert all(upload.path for upload in uploads)
+    assert len(os.listdir('/proc/self/fd')) <= before + 1
+    for upload in uploads:
+        upload.cleanup()
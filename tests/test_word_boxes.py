@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from src.WordBoxes.WordBoxes import COLUMNS, WordBoxes
+
+TSV = (
+    "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+    "1\t1\t0\t0\t0\t0\t0\t0\t640\t480\t-1\t\n"
+    "5\t1\t1\t1\t1\t1\t10\t12\t40\t18\t96.5\tHello\n"
+    "5\t1\t1\t1\t1\t2\t55\t12\t48\t18\t91.25\twörld\n"
+    "5\t1\t2\t1\t1\t1\t10\t60\t30\t18\t80\tNext\n"
+)
+
+
+def assert_same(left, right):
+    assert len(left) == len(right)
+    assert [left.word(index) for index in range(len(left))] == [right.word(index) for index in range(len(right))]
+    for name, _ in COLUMNS:
+        np.testing.assert_array_equal(getattr(left, name), getattr(right, name))
+
+
+def test_from_tsv_keeps_words_only():
+    words = WordBoxes.from_tsv(TSV)
+    assert len(words) == 3
+    assert words.word(1) == 'wörld'
+    assert words.left.tolist() == [10, 55, 10]
+    assert words.block.tolist() == [1, 1, 2]
+
+
+def test_binary_round_trip():
+    words = WordBoxes.from_tsv(TSV)
+    payload = words.to_bytes()
+    assert payload[:4] == b'OCRW'
+    assert_same(WordBoxes.from_bytes(payload), words)
+
+
+def test_binary_round_trip_of_empty_result():
+    empty = WordBoxes()
+    assert len(WordBoxes.from_bytes(empty.to_bytes())) == 0
+
+
+def test_json_round_trip():
+    words = WordBoxes.from_tsv(TSV)
+    assert_same(WordBoxes.from_json(words.to_json()), words)
+
+
+@pytest.mark.parametrize('payload', [b'', b'OCRW', b'XXXX' + bytes(12)])
+def test_from_bytes_rejects_malformed_data(payload):
+    with pytest.raises(ValueError):
+        WordBoxes.from_bytes(payload)
+
+
+def test_from_bytes_rejects_truncated_data():
+    payload = WordBoxes.from_tsv(TSV).to_bytes()
+    with pytest.raises(ValueError):
+        WordBoxes.from_bytes(payload[:-1])